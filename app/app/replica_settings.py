@@ -0,0 +1,16 @@
+"""
+Settings with a read replica, for tests and local runs.
+
+The ``replica`` alias connects to the default database, as a test mirror
+in tests, so the routing can be checked without setting up replication:
+
+    python manage.py test --settings=app.replica_settings
+"""
+from app.settings import *  # noqa: F401,F403
+
+DATABASES['replica'] = {  # noqa: F405
+    **DATABASES['default'],  # noqa: F405
+    'TEST': {'MIRROR': 'default'},
+}
+
+READ_REPLICAS = {**READ_REPLICAS, 'ALIASES': ['replica']}  # noqa: F405
@@ -21,12 +21,23 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-9oa=kg@#i5!1hheouoprppyb@xib5-r$2un)u#)0vu7v7(&+9j'
+SECRET_KEY = os.environ.get(
+    'SECRET_KEY',
+    'django-insecure-9oa=kg@#i5!1hheouoprppyb@xib5-r$2un)u#)0vu7v7(&+9j',
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DEBUG also keeps every SQL query of a request in memory.
+DEBUG = bool(int(os.environ.get('DEBUG', 0)))
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    host for host in os.environ.get('ALLOWED_HOSTS', '').split(',') if host
+]
+
+# Addresses that may scrape /internal/metrics/ without credentials.
+INTERNAL_IPS = [
+    ip for ip in os.environ.get('INTERNAL_IPS', '').split(',') if ip
+]
 
 
 # Application definition
@@ -47,6 +58,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,9 +101,85 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'PORT': os.environ.get('DB_PORT', ''),
+        # Seconds a connection is reused across requests, 0 closes it after
+        # each request.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # Test reused connections before each request, see core.signals.
+        'CONN_HEALTH_CHECKS': bool(
+            int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1))
+        ),
+        # PgBouncer in transaction pooling mode hands each transaction to
+        # any server connection, so cursors and prepared statements cannot
+        # outlive it.
+        'DISABLE_SERVER_SIDE_CURSORS': bool(
+            int(os.environ.get('DB_PGBOUNCER', 0))
+        ),
     }
 }
 
+# Read replicas of the default database, see core.routers. Each host of
+# DB_REPLICA_HOSTS gets a replicaN alias with the default's other settings.
+for index, host in enumerate(
+    filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1,
+):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+READ_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    'PIN_SECONDS': int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5)),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# The local memory default is per process, point CACHE_BACKEND at a shared
+# backend (e.g. memcached) when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Rendered instrument list pages, see instrument.cache.
+INSTRUMENT_LIST_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': int(os.environ.get('INSTRUMENT_LIST_CACHE_TIMEOUT', 300)),
+}
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+# New passwords use the first hasher. Logging in with a password hashed by
+# another one, or with other parameters, rehashes it with the first.
+
+PASSWORD_HASHERS = os.environ.get(
+    'PASSWORD_HASHERS',
+    'user.hashers.Argon2PasswordHasher,'
+    'user.hashers.ScryptPasswordHasher,'
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher,'
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+).split(',')
+
+# Concurrent password hash computations per process, see user.hashers.
+PASSWORD_HASHING = {
+    'MAX_CONCURRENT': int(
+        os.environ.get('PASSWORD_HASHING_MAX_CONCURRENT', 2)
+    ),
+    'TIMEOUT': float(os.environ.get('PASSWORD_HASHING_TIMEOUT', 5)),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -140,6 +228,44 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'user.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
 }
 
+# Cache of token -> user lookups, see user.authentication.
+TOKEN_AUTH_CACHE = {
+    'TIMEOUT': int(os.environ.get('TOKEN_AUTH_CACHE_TIMEOUT', 30)),
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_MAX_SIZE', 10000)),
+    'CACHE_ALIAS': os.environ.get('TOKEN_AUTH_CACHE_ALIAS') or None,
+}
+
+# Connection pool of the async views, per server process.
+ASYNC_DB_POOL = {
+    'MIN_SIZE': int(os.environ.get('ASYNC_DB_POOL_MIN_SIZE', 2)),
+    'MAX_SIZE': int(os.environ.get('ASYNC_DB_POOL_MAX_SIZE', 20)),
+    'TIMEOUT': float(os.environ.get('ASYNC_DB_POOL_TIMEOUT', 30)),
+}
 
+# Per-request timings, Server-Timing headers and sampled profiles of slow
+# requests, see core.profiling.
+PROFILING = {
+    'SERVER_TIMING': bool(int(os.environ.get('PROFILING_SERVER_TIMING', 1))),
+    'SAMPLE_RATE': float(os.environ.get('PROFILING_SAMPLE_RATE', 0)),
+    'SLOW_MS': float(os.environ.get('PROFILING_SLOW_MS', 500)),
+    'PROFILE_DIR': os.environ.get('PROFILING_PROFILE_DIR') or None,
+    'PROFILER': os.environ.get('PROFILING_PROFILER', 'cprofile'),
+}
+
+# Calibration reminders sent by manage.py run_due_scheduler, see
+# core.scheduler and core.notifications for the backends.
+DUE_SCHEDULER = {
+    'BACKEND': os.environ.get(
+        'DUE_SCHEDULER_BACKEND',
+        'core.notifications.ConsoleBackend',
+    ),
+    'LEAD_DAYS': int(os.environ.get('DUE_SCHEDULER_LEAD_DAYS', 7)),
+    'INTERVAL': float(os.environ.get('DUE_SCHEDULER_INTERVAL', 60)),
+}
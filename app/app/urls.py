@@ -21,6 +21,8 @@ from drf_spectacular.views import (
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
@@ -31,4 +33,10 @@ urlpatterns = [
     ),
     path('api/user/', include('user.urls')),
     path('api/instrument/', include('instrument.urls')),
+    path('api/async/instrument/', include('instrument.async_urls')),
+    path(
+        'internal/metrics/',
+        MetricsView.as_view(),
+        name='internal-metrics',
+    ),
 ]
@@ -45,5 +45,31 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class InstrumentStatsAdmin(admin.ModelAdmin):
+    """Read only admin pages for the maintained instrument statistics."""
+    ordering = ['user', 'type']
+    list_display = ['user', 'type', 'count', 'earliest_next_check']
+    list_select_related = ['user']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class DueNotificationAdmin(admin.ModelAdmin):
+    """Admin pages to follow the calibration reminders."""
+    ordering = ['-id']
+    list_display = ['user', 'instrument_id', 'next_check', 'state', 'sent_at']
+    list_filter = ['state']
+    list_select_related = ['user']
+
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Instrument)
+admin.site.register(models.InstrumentStats, InstrumentStatsAdmin)
+admin.site.register(models.DueNotification, DueNotificationAdmin)
@@ -0,0 +1,154 @@
+"""
+Non-blocking database reads for async views.
+
+Django 3.2 has no async ORM. Querysets are still built with the ORM, but
+on PostgreSQL their SQL is run with psycopg 3's async driver, so waiting
+on the database never blocks the event loop or a worker thread. Other
+backends fall back to running the queryset in a thread.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import DEFAULT_DB_ALIAS, connections
+from psycopg import AsyncConnection
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+
+
+DEFAULTS = {
+    # Connections kept open by each server process.
+    'MIN_SIZE': 2,
+    # Upper bound of concurrent queries per server process.
+    'MAX_SIZE': 20,
+    # Seconds a request waits for a free connection before failing.
+    'TIMEOUT': 30,
+}
+
+_pools = {}
+
+
+def get_config():
+    """Return the ASYNC_DB_POOL settings merged with the defaults."""
+    return {**DEFAULTS, **getattr(settings, 'ASYNC_DB_POOL', {})}
+
+
+def get_conninfo(alias=DEFAULT_DB_ALIAS):
+    """Return a libpq connection string for the ``alias`` database."""
+    params = connections[alias].get_connection_params()
+    params['dbname'] = params.pop('database')
+    return make_conninfo(**{
+        name: value for name, value in params.items()
+        if value not in (None, '')
+    })
+
+
+async def configure(connection):
+    """Match the session settings Django uses for its connections."""
+    await connection.execute("SET TIME ZONE 'UTC'")
+
+
+def get_connection_kwargs(alias=DEFAULT_DB_ALIAS):
+    """Return the psycopg connection options for ``alias``."""
+    kwargs = {'autocommit': True}
+    settings_dict = connections[alias].settings_dict
+    if settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        # Behind PgBouncer's transaction pooling, as for Django's cursors.
+        kwargs['prepare_threshold'] = None
+    return kwargs
+
+
+async def open_pool(alias=DEFAULT_DB_ALIAS):
+    """Open the connection pool of ``alias`` on the running event loop."""
+    if connections[alias].vendor != 'postgresql' or alias in _pools:
+        return
+    config = get_config()
+    pool = AsyncConnectionPool(
+        get_conninfo(alias),
+        min_size=config['MIN_SIZE'],
+        max_size=config['MAX_SIZE'],
+        timeout=config['TIMEOUT'],
+        kwargs=get_connection_kwargs(alias),
+        configure=configure,
+        open=False,
+    )
+    _pools[alias] = pool
+    await pool.open()
+
+
+async def close_pools():
+    """Close every pool opened by ``open_pool``."""
+    pools = list(_pools.values())
+    _pools.clear()
+    await asyncio.gather(*(pool.close() for pool in pools))
+
+
+async def _execute(alias, sql, params):
+    pool = _pools.get(alias)
+    if pool is not None:
+        async with pool.connection() as connection:
+            cursor = await connection.execute(sql, params)
+            return await cursor.fetchall()
+
+    # Without a pool, e.g. outside an ASGI server, connect per query.
+    connection = await AsyncConnection.connect(
+        get_conninfo(alias),
+        **get_connection_kwargs(alias),
+    )
+    async with connection:
+        await configure(connection)
+        cursor = await connection.execute(sql, params)
+        return await cursor.fetchall()
+
+
+async def fetch(queryset):
+    """Return the rows of a ``values()`` ``queryset`` as dicts."""
+    alias = queryset.db
+    if connections[alias].vendor != 'postgresql':
+        return await sync_to_async(list)(queryset)
+
+    compiler = queryset.query.get_compiler(alias)
+    try:
+        sql, params = compiler.as_sql()
+    except EmptyResultSet:
+        return []
+    rows = await _execute(alias, sql, params)
+    converters = compiler.get_converters([
+        column for column, _, _ in compiler.select[:compiler.col_count]
+    ])
+    if converters:
+        rows = compiler.apply_converters(rows, converters)
+
+    query = queryset.query
+    names = [
+        *query.extra_select,
+        *query.values_select,
+        *query.annotation_select,
+    ]
+    return [dict(zip(names, row)) for row in rows]
+
+
+class PoolLifespan:
+    """ASGI middleware that opens and closes the pools with the server.
+
+    Django 3.2 does not handle the ASGI lifespan protocol itself.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'lifespan':
+            return await self.application(scope, receive, send)
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                for alias in connections:
+                    await open_pool(alias)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await close_pools()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
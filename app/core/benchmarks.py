@@ -0,0 +1,204 @@
+"""
+Helpers shared by the benchmark management commands.
+"""
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core.models import CalibrationEvent, Instrument
+
+
+TYPES = [
+    'CONTROL VALVE',
+    'PRESSURE TRANSMITTER',
+    'FLOW TRANSMITTER',
+    'LEVEL TRANSMITTER',
+    'TEMPERATURE ELEMENT',
+    'ANALYZER',
+]
+MANUFACTURERS = ['EMERSON', 'YOKOGAWA', 'ENDRESS+HAUSER', 'ABB', 'SIEMENS']
+INTERVALS = [30, 90, 180, 365, 730]
+
+
+def create_benchmark_user(email):
+    """Create and return a throwaway user that owns benchmark rows."""
+    return get_user_model().objects.create_user(
+        email=email,
+        password=None,
+        name='Benchmark',
+    )
+
+
+def build_instrument(user, i):
+    """Return an unsaved instrument with deterministic, varied values."""
+    epoch = timezone.make_aware(datetime(2020, 1, 1))
+    return Instrument(
+        user=user,
+        tag=f'{i % 90 + 10}-{"FTVP"[i % 4]}T-{i:07d}',
+        unit=str(1000 + i % 50 * 100),
+        description=f'Benchmark instrument {i}',
+        type=TYPES[i % len(TYPES)],
+        manufacturer=MANUFACTURERS[i % len(MANUFACTURERS)],
+        serial_no=f'SN{i:010d}',
+        interval=INTERVALS[i % len(INTERVALS)],
+        last_checked=epoch + timedelta(hours=i % 40000),
+        notes='',
+        link='',
+    )
+
+
+def seed_instruments(user, count, batch_size=10000, start=0):
+    """Insert ``count`` instruments for ``user`` in batches."""
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        Instrument.objects.bulk_create(
+            build_instrument(user, start + created + n) for n in range(size)
+        )
+        created += size
+
+    return created
+
+
+def seed_calibration_events(user, count, batch_size=10000):
+    """Insert ``count`` events, one hour apart, over ``user``'s instruments.
+
+    The newest is an hour old, so they fill the most recent partitions.
+    """
+    ids = list(Instrument.objects.filter(
+        user=user,
+    ).order_by('id').values_list('id', flat=True))
+    now = timezone.now()
+    created = 0
+    while ids and created < count:
+        size = min(batch_size, count - created)
+        CalibrationEvent.objects.bulk_create(
+            CalibrationEvent(
+                user=user,
+                instrument_id=ids[n % len(ids)],
+                checked_at=now - timedelta(hours=n + 1),
+                result=CalibrationEvent.PASS,
+                as_found=n % 100,
+                as_left=n % 100,
+                technician='Benchmark',
+            )
+            for n in range(created, created + size)
+        )
+        created += size
+
+    return created
+
+
+def time_call(func, repeat=5):
+    """Call ``func`` ``repeat`` times and return timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return timings
+
+
+def percentile(values, pct):
+    """Return the ``pct`` percentile of ``values`` (nearest rank)."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def median(values):
+    """Return the median of ``values``."""
+    return statistics.median(values)
+
+
+async def _read_response(reader):
+    """Read one HTTP/1.1 response and return its status code."""
+    status_line = await reader.readuntil(b'\r\n')
+    headers = {}
+    while True:
+        line = await reader.readuntil(b'\r\n')
+        if line == b'\r\n':
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    return int(status_line.split()[1]), headers
+
+
+async def _client(url, headers, deadline, timeout, results):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    request = (
+        f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+        + ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+        + '\r\n'
+    ).encode()
+
+    writer = None
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(
+                    parts.hostname,
+                    parts.port or 80,
+                )
+            writer.write(request)
+            status, response_headers = await asyncio.wait_for(
+                _read_response(reader),
+                timeout,
+            )
+        except (
+            OSError,
+            asyncio.IncompleteReadError,
+            asyncio.TimeoutError,
+            ValueError,
+        ) as exc:
+            name = 'timeouts' if isinstance(exc, asyncio.TimeoutError) \
+                else 'errors'
+            results[name] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.1)
+            continue
+        results['latencies'].append((time.perf_counter() - start) * 1000)
+        results['statuses'][status] = results['statuses'].get(status, 0) + 1
+        if response_headers.get('connection') == 'close':
+            writer.close()
+            writer = None
+
+    if writer is not None:
+        writer.close()
+
+
+async def http_load(url, headers, connections, duration, timeout=10):
+    """Send GET ``url`` over ``connections`` keep-alive connections.
+
+    Every connection sends its next request as soon as the previous one is
+    answered, for ``duration`` seconds. Responses slower than ``timeout``
+    seconds are abandoned and their connection reopened. Returns the
+    latencies in milliseconds, the count of each status code and the
+    numbers of timeouts and connection errors.
+    """
+    results = {'latencies': [], 'statuses': {}, 'timeouts': 0, 'errors': 0}
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(
+        _client(url, headers, deadline, timeout, results)
+        for _ in range(connections)
+    ))
+    return results
@@ -0,0 +1,89 @@
+"""
+Database expressions shared by models and migrations.
+"""
+from datetime import timedelta
+
+from django.db import models
+
+
+class AddDays(models.Func):
+    """Add a whole number of days to a datetime inside the database."""
+    arity = 2
+    output_field = models.DateTimeField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # Backends with a native interval type, e.g. Oracle.
+        lhs, rhs = self.get_source_expressions()
+        period = models.ExpressionWrapper(
+            rhs * timedelta(days=1),
+            output_field=models.DurationField(),
+        )
+        return compiler.compile(
+            models.ExpressionWrapper(
+                lhs + period,
+                output_field=models.DateTimeField(),
+            )
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler,
+            connection,
+            template="(%(expressions)s * INTERVAL '1 day')",
+            arg_joiner=' + ',
+            **extra_context,
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite stores durations as microseconds, see DurationField.
+        return super().as_sql(
+            compiler,
+            connection,
+            template="django_format_dtdelta('+', %(expressions)s)",
+            arg_joiner=', 86400000000 * ',
+            **extra_context,
+        )
+
+
+class EpochSeconds(models.Func):
+    """Seconds since 1970-01-01 UTC of a datetime, as a float."""
+    arity = 1
+    output_field = models.FloatField()
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        # EXTRACT returns numeric since PostgreSQL 14, date_part a float.
+        return super().as_sql(
+            compiler,
+            connection,
+            template="date_part('epoch', %(expressions)s)",
+            **extra_context,
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # Julian day 2440587.5 is the Unix epoch.
+        return super().as_sql(
+            compiler,
+            connection,
+            template='((julianday(%(expressions)s) - 2440587.5) * 86400.0)',
+            **extra_context,
+        )
+
+
+def next_check_for(last_checked, interval):
+    """Return the due date for values or expressions of both fields."""
+    if not any(
+        hasattr(value, 'resolve_expression')
+        for value in (last_checked, interval)
+    ):
+        return last_checked + timedelta(days=interval)
+
+    if not hasattr(last_checked, 'resolve_expression'):
+        last_checked = models.Value(
+            last_checked,
+            output_field=models.DateTimeField(),
+        )
+    if not hasattr(interval, 'resolve_expression'):
+        interval = models.Value(interval, output_field=models.IntegerField())
+
+    return AddDays(last_checked, interval)
@@ -0,0 +1,125 @@
+"""
+Django command to benchmark the API against the committed baselines.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from core import regression
+
+
+class Command(BaseCommand):
+    """Send every API scenario and compare with core/api_baselines.json."""
+
+    help = (
+        'Seed instruments, send every API scenario and compare the query '
+        'counts, p50/p99 latency and peak allocations with the baselines.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='1000,10000,100000',
+            help='Comma separated instrument counts to seed.',
+        )
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument(
+            '--scenarios',
+            help='Comma separated scenario names, default all.',
+        )
+        parser.add_argument(
+            '--update',
+            action='store_true',
+            help='Write the results as the new baselines.',
+        )
+        parser.add_argument(
+            '--latency-tolerance',
+            type=float,
+            default=1.0,
+            help='Allowed relative latency increase, 1.0 is twice as slow.',
+        )
+        parser.add_argument(
+            '--alloc-tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed relative increase of the peak allocations.',
+        )
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        scenarios = regression.SCENARIOS
+        if options['scenarios']:
+            names = options['scenarios'].split(',')
+            scenarios = [s for s in scenarios if s.name in names]
+        tolerances = {
+            'p50_ms': options['latency_tolerance'],
+            'p99_ms': options['latency_tolerance'],
+            'alloc_kib': options['alloc_tolerance'],
+        }
+        baselines = regression.load_baselines()
+        queries = baselines['queries'].setdefault(connection.vendor, {})
+        performance = baselines['performance'].setdefault(
+            connection.vendor, {},
+        )
+
+        problems = []
+        previous = {}
+        for size in [int(n) for n in options['sizes'].split(',')]:
+            self.stdout.write(f'{size} instruments, {options["users"]} users')
+            fixture = regression.Fixture(size, options['users'])
+            try:
+                results = {}
+                for scenario in scenarios:
+                    result = regression.measure(
+                        scenario,
+                        fixture,
+                        options['repeat'],
+                    )
+                    results[scenario.name] = result
+                    self.stdout.write(
+                        f'  {scenario.name:<28} '
+                        f'{result["queries"] if scenario.counted else "-":>3}'
+                        f' queries  p50 {result["p50_ms"]:9.2f} ms  '
+                        f'p99 {result["p99_ms"]:9.2f} ms  '
+                        f'{result["alloc_kib"]:9.1f} KiB  '
+                        f'calibration {result["calibration_ms"]:6.2f} ms'
+                    )
+            finally:
+                fixture.delete()
+
+            for name, result in results.items():
+                if name in previous and \
+                        result['queries'] != previous[name]['queries']:
+                    problems.append(
+                        f'{name}: {result["queries"]} queries at {size} '
+                        f'instruments, {previous[name]["queries"]} below',
+                    )
+            previous = results
+
+            sized = performance.setdefault(str(size), {})
+            for name, result in results.items():
+                if options['update']:
+                    if result['queries'] is not None:
+                        queries[name] = result['queries']
+                    sized[name] = {
+                        metric: result[metric]
+                        for metric in [*tolerances, 'calibration_ms']
+                    }
+                else:
+                    problems += regression.compare(
+                        name,
+                        result,
+                        queries.get(name),
+                        sized.get(name),
+                        tolerances,
+                    )
+
+        if problems:
+            raise CommandError('Regressions:\n' + '\n'.join(problems))
+        if options['update']:
+            regression.save_baselines(baselines)
+            self.stdout.write(self.style.SUCCESS('Baselines updated.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
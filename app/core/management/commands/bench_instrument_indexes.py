@@ -0,0 +1,175 @@
+"""
+Django command to check the instrument API queries use indexes.
+"""
+import json
+import re
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core import benchmarks
+from instrument.summary import due_counts
+from instrument.views import InstrumentViewSet
+
+
+INDEXED_NODES = {'Index Scan', 'Index Only Scan', 'Bitmap Index Scan'}
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (TABLE )?core_instrument\b')
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded rows at the end of a run."""
+
+
+def get_view_queryset(user, action, params=None):
+    """Return the queryset ``InstrumentViewSet`` uses for ``user``.
+
+    With ``params`` the view's filter backends are applied to it as for a
+    request with that query string.
+    """
+    request = Request(APIRequestFactory().get('/', params))
+    request.user = user
+    view = InstrumentViewSet(request=request, action=action, kwargs={})
+    view.format_kwarg = None
+    queryset = view.get_queryset()
+    if params is not None:
+        queryset = view.filter_queryset(queryset)
+    return queryset
+
+
+def walk_plan(node):
+    """Yield every node of a PostgreSQL JSON plan."""
+    yield node
+    for child in node.get('Plans', []):
+        yield from walk_plan(child)
+
+
+def check_plan(queryset):
+    """Return the EXPLAIN output for ``queryset`` and whether it is indexed."""
+    if connection.vendor == 'postgresql':
+        raw = queryset.explain(format='json')
+        plan = json.loads(raw)[0]['Plan']
+        nodes = [
+            node for node in walk_plan(plan)
+            if node.get('Relation Name') == 'core_instrument'
+            or node['Node Type'] == 'Bitmap Index Scan'
+        ]
+        indexed = bool(nodes) and all(
+            node['Node Type'] in INDEXED_NODES | {'Bitmap Heap Scan'}
+            for node in nodes
+        )
+        summary = ', '.join(
+            f"{node['Node Type']} using {node.get('Index Name', '-')}"
+            for node in nodes
+        )
+        return summary, indexed
+
+    raw = queryset.explain()
+    return raw.replace('\n', '; '), not SQLITE_FULL_SCAN.search(raw)
+
+
+class Command(BaseCommand):
+    """Seed instruments and EXPLAIN the instrument viewset queries."""
+
+    help = (
+        'Seed instruments and assert the instrument API queries are '
+        'answered with index scans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=10,
+            help='Spread the rows over this many users.',
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the seeded rows instead of rolling them back.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            with transaction.atomic():
+                failures = self.run(options)
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError(
+                'Queries not served by an index: ' + ', '.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('All queries use indexes.'))
+
+    def run(self, options):
+        """Seed the rows, then time and EXPLAIN each query."""
+        run_id = uuid.uuid4().hex[:8]
+        users = [
+            benchmarks.create_benchmark_user(f'bench-{run_id}-{n}@example.com')
+            for n in range(options['users'])
+        ]
+        per_user = options['rows'] // len(users)
+        self.stdout.write(
+            f'Seeding {per_user * len(users)} instruments '
+            f'for {len(users)} users...'
+        )
+        for n, user in enumerate(users):
+            benchmarks.seed_instruments(user, per_user, start=n * per_user)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE core_instrument')
+
+        user = users[0]
+        queryset = get_view_queryset(user, 'list')
+        middle = queryset.values_list('id', flat=True)[per_user // 2]
+        sample = get_view_queryset(user, 'retrieve').get(pk=middle)
+
+        def filtered(**params):
+            return get_view_queryset(user, 'list', params)[:101]
+
+        queries = {
+            'list first page': queryset[:101],
+            'list deep page': queryset.filter(id__lt=middle)[:101],
+            'detail': get_view_queryset(user, 'retrieve').filter(pk=middle),
+            'tag lookup': queryset.filter(tag=sample.tag)[:101],
+            'serial lookup': queryset.filter(serial_no=sample.serial_no),
+            'due before': queryset.filter(
+                next_check__lt=sample.next_check,
+            ).order_by('next_check')[:101],
+            'type filter': filtered(
+                type=sample.type,
+                manufacturer=sample.manufacturer,
+            ),
+            'tag prefix': filtered(tag=sample.tag[:6]),
+            'due summary': due_counts(
+                get_view_queryset(user, 'summary'),
+                sample.next_check,
+            ),
+        }
+        if connection.vendor == 'postgresql':
+            # SQLite has no index for substring matches.
+            queries['search'] = filtered(search=sample.tag[-5:])
+
+        failures = []
+        for name, query in queries.items():
+            summary, indexed = check_plan(query)
+            timings = benchmarks.time_call(
+                lambda: list(query.all()), repeat=options['repeat'],
+            )
+            style = self.style.SUCCESS if indexed else self.style.ERROR
+            self.stdout.write(style(
+                f'{name:<16} {benchmarks.median(timings):8.2f} ms  {summary}'
+            ))
+            if not indexed:
+                failures.append(name)
+
+        return failures
@@ -0,0 +1,28 @@
+"""
+Django command to create the monthly calibration event partitions ahead.
+"""
+from django.core.management.base import BaseCommand
+
+from core import partitions
+
+
+class Command(BaseCommand):
+    """Create the partitions of the coming months, see core.partitions."""
+
+    help = (
+        'Create the monthly partitions of the calibration events from this '
+        'month to --months ahead, and for the months of rows left in the '
+        'default partition. Does nothing off PostgreSQL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=3)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        created = partitions.ensure_partitions(months=options['months'])
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(created)} calibration event partitions created.'
+        ))
@@ -0,0 +1,19 @@
+"""
+Django command to rebuild the instrument statistics table.
+"""
+from django.core.management.base import BaseCommand
+
+from core import stats
+
+
+class Command(BaseCommand):
+    """Django command to recompute InstrumentStats from the instruments."""
+
+    help = 'Rebuild the per-user instrument statistics from scratch.'
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        buckets = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {buckets} instrument stats buckets.'
+        ))
@@ -0,0 +1,62 @@
+"""
+Django command to send calibration reminders for instruments coming due.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+
+from core import scheduler
+
+
+class Command(BaseCommand):
+    """Run the due scheduler, see core.scheduler."""
+
+    help = (
+        'Queue reminders for the instruments coming due since the last '
+        'run and send them, one per user. Runs in a loop unless --once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run once and exit.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Seconds between runs, default DUE_SCHEDULER INTERVAL.',
+        )
+        parser.add_argument(
+            '--since',
+            help='Scan again from this ISO 8601 date and time.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        interval = options['interval']
+        if interval is None:
+            interval = scheduler.get_config()['INTERVAL']
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f'Invalid --since {options["since"]}.')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            scheduler.rewind(since)
+
+        backend = scheduler.get_backend()
+        while True:
+            done = scheduler.run_once(backend=backend)
+            if any(done.values()) or options['once']:
+                self.stdout.write(', '.join(
+                    f'{count} {name}' for name, count in done.items()
+                ))
+            if options['once']:
+                break
+            # Long running, so follow CONN_MAX_AGE as requests do.
+            close_old_connections()
+            time.sleep(interval)
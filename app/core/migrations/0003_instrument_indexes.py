@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_instrument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['user', '-id'], name='core_instr_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['user', 'tag'], name='core_instr_user_tag_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['user', 'serial_no'], name='core_instr_user_serial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['user', 'last_checked'], name='core_instr_user_checked_idx'),
+        ),
+        migrations.AlterField(
+            model_name='instrument',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
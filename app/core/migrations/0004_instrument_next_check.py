@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+from core.expressions import next_check_for
+
+
+def populate_next_check(apps, schema_editor):
+    Instrument = apps.get_model('core', 'Instrument')
+    Instrument.objects.using(schema_editor.connection.alias).update(
+        next_check=next_check_for(
+            models.F('last_checked'),
+            models.F('interval'),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_instrument_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instrument',
+            name='next_check',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_next_check, migrations.RunPython.noop),
+    ]
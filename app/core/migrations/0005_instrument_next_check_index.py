@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_instrument_next_check'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='instrument',
+            name='next_check',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.RemoveIndex(
+            model_name='instrument',
+            name='core_instr_user_checked_idx',
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['user', 'next_check'], name='core_instr_user_next_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_instrument_next_check_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instrument',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='core_instr_user_updated_idx'),
+        ),
+    ]
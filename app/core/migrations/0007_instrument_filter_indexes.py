@@ -0,0 +1,50 @@
+from django.db import migrations, models
+
+
+# Expressions match the SQL of the icontains lookups used by ?search=.
+TRIGRAM_INDEXES = {
+    'core_instr_tag_trgm_idx': 'UPPER("tag"::text)',
+    'core_instr_description_trgm_idx': 'UPPER("description"::text)',
+    'core_instr_notes_trgm_idx': 'UPPER("notes"::text)',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, expression in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "core_instrument" '
+            f'USING gin ({expression} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_instrument_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['user', 'tag'], name='core_instr_user_tag_like_idx', opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['user', 'type', 'manufacturer'], name='core_instr_user_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['user', 'manufacturer'], name='core_instr_user_manuf_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_instrument_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['user', 'type', 'manufacturer'], include=('next_check',), name='core_instr_user_summary_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='instrument',
+            name='core_instr_user_type_idx',
+        ),
+    ]
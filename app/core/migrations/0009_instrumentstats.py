@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def rebuild_stats(apps, schema_editor):
+    Instrument = apps.get_model('core', 'Instrument')
+    InstrumentStats = apps.get_model('core', 'InstrumentStats')
+    rows = Instrument.objects.order_by().values('user_id', 'type').annotate(
+        count=models.Count('id'),
+        earliest_next_check=models.Min('next_check'),
+    )
+    InstrumentStats.objects.bulk_create(
+        (InstrumentStats(**row) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0008_instrument_summary_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstrumentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(max_length=30)),
+                ('count', models.PositiveIntegerField()),
+                ('earliest_next_check', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='instrument_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'instrument stats',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='instrumentstats',
+            constraint=models.UniqueConstraint(fields=('user', 'type'), name='core_instrstats_user_type_uniq'),
+        ),
+        migrations.RunPython(rebuild_stats, migrations.RunPython.noop),
+    ]
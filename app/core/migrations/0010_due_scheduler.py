@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_instrumentstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DueNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('instrument_id', models.BigIntegerField()),
+                ('next_check', models.DateTimeField()),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('skipped', 'Skipped'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SchedulerWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_check', models.DateTimeField()),
+                ('instrument_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['next_check', 'id'], name='core_instr_next_check_idx'),
+        ),
+        migrations.AddField(
+            model_name='duenotification',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='due_notifications', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='duenotification',
+            index=models.Index(condition=models.Q(('state', 'pending')), fields=['user', 'id'], name='core_duenotif_pending_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='duenotification',
+            constraint=models.UniqueConstraint(fields=('instrument_id', 'next_check'), name='core_duenotif_instr_next_uniq'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# The primary key of a partitioned table must include the partition key.
+CREATE_PARTITIONED_TABLE = [
+    '''
+    CREATE TABLE core_calibrationevent (
+        id bigserial NOT NULL,
+        checked_at timestamp with time zone NOT NULL,
+        result varchar(10) NOT NULL,
+        as_found numeric(16, 6) NULL,
+        as_left numeric(16, 6) NULL,
+        technician varchar(255) NOT NULL,
+        notes text NOT NULL,
+        created_at timestamp with time zone NOT NULL,
+        instrument_id bigint NOT NULL,
+        user_id bigint NOT NULL,
+        CONSTRAINT core_calibrationevent_pkey PRIMARY KEY (id, checked_at),
+        CONSTRAINT core_calibrationevent_user_id_fk_core_user_id
+            FOREIGN KEY (user_id) REFERENCES core_user (id)
+            DEFERRABLE INITIALLY DEFERRED
+    ) PARTITION BY RANGE (checked_at)
+    ''',
+    'CREATE TABLE core_calibrationevent_default '
+    'PARTITION OF core_calibrationevent DEFAULT',
+    'CREATE INDEX core_calev_instr_checked_idx '
+    'ON core_calibrationevent (instrument_id, checked_at DESC)',
+    'CREATE INDEX core_calev_user_checked_idx '
+    'ON core_calibrationevent (user_id, checked_at DESC)',
+]
+
+
+def create_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.create_model(apps.get_model('core', 'CalibrationEvent'))
+        return
+
+    # Only the default partition, so the schema does not depend on when
+    # this runs. The monthly ones are created by
+    # manage.py create_calibration_partitions, see core.partitions.
+    for statement in CREATE_PARTITIONED_TABLE:
+        schema_editor.execute(statement)
+
+
+def drop_table(apps, schema_editor):
+    schema_editor.delete_model(apps.get_model('core', 'CalibrationEvent'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_due_scheduler'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='CalibrationEvent',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('checked_at', models.DateTimeField()),
+                        ('result', models.CharField(choices=[('pass', 'Pass'), ('fail', 'Fail'), ('adjusted', 'Adjusted')], max_length=10)),
+                        ('as_found', models.DecimalField(blank=True, decimal_places=6, max_digits=16, null=True)),
+                        ('as_left', models.DecimalField(blank=True, decimal_places=6, max_digits=16, null=True)),
+                        ('technician', models.CharField(max_length=255)),
+                        ('notes', models.TextField(blank=True)),
+                        ('created_at', models.DateTimeField(auto_now_add=True)),
+                        ('instrument', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='calibration_events', to='core.instrument')),
+                        ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='calibration_events', to=settings.AUTH_USER_MODEL)),
+                    ],
+                ),
+                migrations.AddIndex(
+                    model_name='calibrationevent',
+                    index=models.Index(fields=['instrument', '-checked_at'], name='core_calev_instr_checked_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='calibrationevent',
+                    index=models.Index(fields=['user', '-checked_at'], name='core_calev_user_checked_idx'),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_table, drop_table),
+    ]
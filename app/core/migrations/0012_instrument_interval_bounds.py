@@ -0,0 +1,17 @@
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_calibrationevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='instrument',
+            name='interval',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(36500)]),
+        ),
+    ]
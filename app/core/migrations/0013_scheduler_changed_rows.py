@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_instrument_interval_bounds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedulerwatermark',
+            name='changed_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='schedulerwatermark',
+            name='changed_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['updated_at', 'id'], name='core_instr_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_duenotification_next_attempt_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='instrument',
+            name='core_instr_user_next_idx',
+        ),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['user', 'next_check', 'id'], name='core_instr_user_next_idx'),
+        ),
+    ]
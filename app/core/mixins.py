@@ -0,0 +1,25 @@
+"""
+Mixins for the API views.
+"""
+from rest_framework.permissions import SAFE_METHODS
+
+from core import routers
+
+
+class ReadReplicaMixin:
+    """Read from the replicas in safe-method requests of a DRF view.
+
+    Writes in any request pin the user to the primary, see core.routers.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with routers.routing():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            routers.read_from_replica(
+                request.user.pk,
+                replica=request.method in SAFE_METHODS,
+            )
@@ -2,14 +2,24 @@
 Database models.
 """
 from django.conf import settings
-from datetime import timedelta
-from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import connections, models
+from django.db.models import sql
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 
+from core import stats
+from core.expressions import next_check_for
+
+
+# Longest calibration interval in days, longer ones would push next_check
+# past the largest datetime.
+MAX_INTERVAL_DAYS = 36500
+
 
 class UserManager(BaseUserManager):
     """Manager for users."""
@@ -46,11 +56,146 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class InstrumentQuerySet(models.QuerySet):
+    """Queryset that keeps next_check and the statistics in sync.
+
+    Bulk writes bypass ``save()`` and the model signals.
+    """
+
+    def update(self, **kwargs):
+        """Update rows and recompute next_check in the same statement.
+
+        The statistics of every touched bucket are refreshed. A ``type``
+        given as an expression is not followed to its new buckets.
+        """
+        kwargs.setdefault('updated_at', timezone.now())
+        if 'last_checked' in kwargs or 'interval' in kwargs:
+            kwargs['next_check'] = next_check_for(
+                kwargs.get('last_checked', models.F('last_checked')),
+                kwargs.get('interval', models.F('interval')),
+            )
+
+        buckets = set()
+        if stats.STATS_FIELDS & set(kwargs):
+            buckets = set(
+                self.order_by().values_list('user_id', 'type').distinct()
+            )
+            new_type = kwargs.get('type')
+            if isinstance(new_type, str):
+                buckets |= {(user_id, new_type) for user_id, _ in buckets}
+
+        rows = super().update(**kwargs)
+        stats.mark_stale(buckets)
+        return rows
+
+    def create_counted(self, **kwargs):
+        """Create an instrument and count it in its statistics bucket.
+
+        On PostgreSQL both are one ``INSERT`` statement returning only the
+        id, elsewhere this is ``create()``. Like the bulk writes it then
+        bypasses ``save()`` and the model signals, so it is meant for the
+        create API alone. Validation is left to the callers as with
+        ``save()``.
+
+        The statement takes the advisory lock of the bucket before it
+        counts the instrument, so a concurrent ``stats.refresh()`` either
+        runs first and is added to, or waits and sees the instrument.
+        """
+        self._for_write = True
+        connection = connections[self.db]
+        if connection.vendor != 'postgresql':
+            return self.create(**kwargs)
+
+        obj = self.model(**kwargs)
+        obj.set_next_check()
+        obj._prepare_related_fields_for_save(operation_name='save')
+        meta = self.model._meta
+        fields = [
+            field for field in meta.local_concrete_fields
+            if field is not meta.auto_field or obj.pk is not None
+        ]
+        query = sql.InsertQuery(self.model)
+        query.insert_values(fields, [obj])
+        compiler = query.get_compiler(using=self.db)
+        # Only what the statistics upsert reads, the outer query returns
+        # the id alone.
+        compiler.returning_fields = [
+            meta.pk,
+            meta.get_field('user'),
+            meta.get_field('type'),
+            meta.get_field('next_check'),
+        ]
+        [(insert_sql, params)] = compiler.as_sql()
+
+        stats_table = connection.ops.quote_name(
+            InstrumentStats._meta.db_table,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH instrument AS ({insert_sql}), counted AS ('
+                f'INSERT INTO {stats_table} AS stats '
+                f'(user_id, type, count, earliest_next_check, updated_at) '
+                f'SELECT user_id, type, 1, next_check, %s FROM instrument '
+                f'CROSS JOIN LATERAL (SELECT pg_advisory_xact_lock('
+                f'{stats.LOCK_KEY_SQL})) AS bucket_lock '
+                f'ON CONFLICT (user_id, type) DO UPDATE SET '
+                f'count = stats.count + 1, '
+                f'earliest_next_check = LEAST('
+                f'stats.earliest_next_check, '
+                f'EXCLUDED.earliest_next_check), '
+                f'updated_at = EXCLUDED.updated_at'
+                f') SELECT id FROM instrument',
+                (*params, obj.updated_at),
+            )
+            obj.pk = cursor.fetchone()[0]
+
+        obj._state.adding = False
+        obj._state.db = self.db
+        obj.loaded_type = obj.type
+        return obj
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Create instruments with next_check filled in."""
+        objs = list(objs)
+        for obj in objs:
+            obj.set_next_check()
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        stats.mark_stale((obj.user_id, obj.type) for obj in objs)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        """Update instruments, including next_check when it changes."""
+        objs = list(objs)
+        fields = list(fields)
+        if {'last_checked', 'interval'} & set(fields):
+            for obj in objs:
+                obj.set_next_check()
+            fields.append('next_check')
+        now = timezone.now()
+        for obj in objs:
+            obj.updated_at = now
+        fields.append('updated_at')
+
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        if stats.STATS_FIELDS & set(fields):
+            stats.mark_stale({
+                (obj.user_id, bucket_type) for obj in objs
+                for bucket_type in (obj.type, obj.loaded_type)
+                if bucket_type is not None
+            })
+        for obj in objs:
+            obj.loaded_type = obj.type
+        return rows
+
+
 class Instrument(models.Model):
     """Recipe object."""
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.PROTECT,
+        # Covered by the leading column of the composite indexes below.
+        db_index=False,
     )
     tag = models.CharField(max_length=255)
     unit = models.CharField(max_length=10)
@@ -58,16 +203,268 @@ class Instrument(models.Model):
     type = models.CharField(max_length=30)
     manufacturer = models.CharField(max_length=100)
     serial_no = models.CharField(max_length=30)
-    interval = models.IntegerField()
+    interval = models.IntegerField(validators=[
+        MinValueValidator(1),
+        MaxValueValidator(MAX_INTERVAL_DAYS),
+    ])
     created_at = models.DateTimeField(auto_now_add=True)
     last_checked = models.DateTimeField()
     notes = models.TextField(blank=True)
     link = models.CharField(max_length=255, blank=True)
+    next_check = models.DateTimeField(editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = InstrumentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-id'],
+                name='core_instr_user_id_idx',
+            ),
+            models.Index(
+                fields=['user', 'tag'],
+                name='core_instr_user_tag_idx',
+            ),
+            # Serves tag prefix filters, LIKE cannot use the index above
+            # under a non C collation.
+            models.Index(
+                fields=['user', 'tag'],
+                name='core_instr_user_tag_like_idx',
+                opclasses=['int8_ops', 'varchar_pattern_ops'],
+            ),
+            # Covers the grouped due summary with an index only scan.
+            models.Index(
+                fields=['user', 'type', 'manufacturer'],
+                name='core_instr_user_summary_idx',
+                include=['next_check'],
+            ),
+            models.Index(
+                fields=['user', 'manufacturer'],
+                name='core_instr_user_manuf_idx',
+            ),
+            models.Index(
+                fields=['user', 'serial_no'],
+                name='core_instr_user_serial_idx',
+            ),
+            # Tie-broken by id for the cursor pages, see instrument.pagination.
+            models.Index(
+                fields=['user', 'next_check', 'id'],
+                name='core_instr_user_next_idx',
+            ),
+            # Covers the per-user count/max(id)/max(updated_at) validators.
+            models.Index(
+                fields=['user', 'updated_at', 'id'],
+                name='core_instr_user_updated_idx',
+            ),
+            # Walked in order by the due scheduler, see core.scheduler.
+            models.Index(
+                fields=['next_check', 'id'],
+                name='core_instr_next_check_idx',
+            ),
+            models.Index(
+                fields=['updated_at', 'id'],
+                name='core_instr_updated_idx',
+            ),
+        ]
+
+    # Type the row had in the database, to find the bucket it left.
+    loaded_type = None
 
     def __str__(self):
         return self.tag
 
-    @property
-    def next_check(self):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_type = instance.__dict__.get('type')
+        return instance
+
+    def set_next_check(self):
         """Υπολογίζει την ημερομηνία για το επόμενο check."""
-        return self.last_checked + timedelta(days=self.interval)
+        self.next_check = next_check_for(self.last_checked, self.interval)
+
+    def save(self, *args, **kwargs):
+        """Save the instrument with an up to date next_check.
+
+        Partial saves write next_check and updated_at too, the ETags, the
+        list cache and the due scheduler rely on updated_at.
+        """
+        self.set_next_check()
+        update_fields = kwargs.get('update_fields')
+        if update_fields:
+            kwargs['update_fields'] = {
+                *update_fields,
+                'next_check',
+                'updated_at',
+            }
+
+        return super().save(*args, **kwargs)
+
+
+class InstrumentStats(models.Model):
+    """Instrument count and earliest next check of a user and type.
+
+    Maintained from the instrument writes so dashboards read one row per
+    bucket instead of scanning the instruments.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='instrument_stats',
+        # Covered by the leading column of the unique constraint.
+        db_index=False,
+    )
+    type = models.CharField(max_length=30)
+    count = models.PositiveIntegerField()
+    earliest_next_check = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'instrument stats'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'type'],
+                name='core_instrstats_user_type_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} {self.type}'
+
+
+class SchedulerWatermark(models.Model):
+    """Positions of the due scheduler in the instruments.
+
+    Instruments at or before ``(next_check, instrument_id)`` have been
+    queued for a notification, as have those written at or before
+    ``(changed_at, changed_id)`` that were coming due then.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    next_check = models.DateTimeField()
+    instrument_id = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField(null=True)
+    changed_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} {self.next_check.isoformat()}'
+
+
+class DueNotification(models.Model):
+    """A calibration reminder queued or sent for an instrument.
+
+    The instrument is referenced by id only so deleting instruments does
+    not cascade into this table. Reminders of deleted instruments, or of
+    instruments checked since they were queued, are skipped on delivery.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    SKIPPED = 'skipped'
+    FAILED = 'failed'
+    STATES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (SKIPPED, 'Skipped'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='due_notifications',
+        db_index=False,
+    )
+    instrument_id = models.BigIntegerField()
+    next_check = models.DateTimeField()
+    state = models.CharField(max_length=10, choices=STATES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # When a failed notification may be retried, none before a failure.
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Queuing the same due date twice, e.g. on a rescan, is a no-op.
+            models.UniqueConstraint(
+                fields=['instrument_id', 'next_check'],
+                name='core_duenotif_instr_next_uniq',
+            ),
+        ]
+        indexes = [
+            # The delivery queue, claimed in user order.
+            models.Index(
+                fields=['user', 'id'],
+                name='core_duenotif_pending_idx',
+                condition=models.Q(state='pending'),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.instrument_id} {self.next_check.isoformat()}'
+
+
+class CalibrationEvent(models.Model):
+    """A check of an instrument, appended and never changed.
+
+    On PostgreSQL the table is range partitioned by month on
+    ``checked_at``, see core.partitions. Its primary key is then
+    ``(id, checked_at)``, ids stay unique as they come from one sequence.
+    Events outlive their instrument, which is referenced without a
+    foreign key constraint.
+    """
+    PASS = 'pass'
+    FAIL = 'fail'
+    ADJUSTED = 'adjusted'
+    RESULTS = [
+        (PASS, 'Pass'),
+        (FAIL, 'Fail'),
+        (ADJUSTED, 'Adjusted'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='calibration_events',
+        db_index=False,
+    )
+    instrument = models.ForeignKey(
+        Instrument,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='calibration_events',
+        db_index=False,
+    )
+    checked_at = models.DateTimeField()
+    result = models.CharField(max_length=10, choices=RESULTS)
+    as_found = models.DecimalField(
+        max_digits=16,
+        decimal_places=6,
+        null=True,
+        blank=True,
+    )
+    as_left = models.DecimalField(
+        max_digits=16,
+        decimal_places=6,
+        null=True,
+        blank=True,
+    )
+    technician = models.CharField(max_length=255)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['instrument', '-checked_at'],
+                name='core_calev_instr_checked_idx',
+            ),
+            models.Index(
+                fields=['user', '-checked_at'],
+                name='core_calev_user_checked_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.instrument_id} {self.checked_at.isoformat()}'
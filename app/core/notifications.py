@@ -0,0 +1,98 @@
+"""
+Delivery backends of the calibration reminders.
+
+``core.scheduler`` hands a backend one user and the instruments coming due
+for them. The backend is chosen with ``DUE_SCHEDULER['BACKEND']`` and
+built with ``DUE_SCHEDULER['OPTIONS']``, like Django's email backends.
+A backend raises to have the reminder retried on the next run.
+"""
+import json
+import sys
+import threading
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.utils.module_loading import import_string
+
+
+def get_backend(path, options=None):
+    """Return an instance of the backend class at ``path``."""
+    return import_string(path)(**(options or {}))
+
+
+def describe(instrument):
+    """Return the fields of ``instrument`` a reminder shows."""
+    return {
+        'id': instrument.id,
+        'tag': instrument.tag,
+        'type': instrument.type,
+        'unit': instrument.unit,
+        'next_check': instrument.next_check.isoformat(),
+    }
+
+
+class BaseBackend:
+    """Send the reminder of one user."""
+
+    def __init__(self, **options):
+        pass
+
+    def send(self, user, instruments):
+        raise NotImplementedError
+
+
+class ConsoleBackend(BaseBackend):
+    """Write reminders to a stream, stdout by default."""
+
+    def __init__(self, stream=None, **options):
+        super().__init__(**options)
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def send(self, user, instruments):
+        lines = [f'{user.email}: {len(instruments)} instruments coming due']
+        lines += [
+            f'  {instrument.tag} ({instrument.type}) '
+            f'due {instrument.next_check:%Y-%m-%d}'
+            for instrument in instruments
+        ]
+        with self.lock:
+            self.stream.write('\n'.join(lines) + '\n')
+            self.stream.flush()
+
+
+class FileBackend(BaseBackend):
+    """Append one JSON line per reminder to the file at ``path``."""
+
+    def __init__(self, path, **options):
+        super().__init__(**options)
+        self.path = path
+        self.lock = threading.Lock()
+
+    def send(self, user, instruments):
+        line = json.dumps({
+            'user': user.email,
+            'instruments': [describe(item) for item in instruments],
+        })
+        with self.lock, open(self.path, 'a') as file:
+            file.write(line + '\n')
+
+
+class EmailBackend(BaseBackend):
+    """Email reminders through Django's ``EMAIL_BACKEND``."""
+
+    def __init__(
+        self, subject='Instruments coming due for calibration',
+        from_email=None, **options,
+    ):
+        super().__init__(**options)
+        self.subject = subject
+        self.from_email = from_email or settings.DEFAULT_FROM_EMAIL
+
+    def send(self, user, instruments):
+        body = '\n'.join(
+            f'{instrument.tag} ({instrument.type}), unit {instrument.unit}: '
+            f'due {instrument.next_check:%Y-%m-%d}'
+            for instrument in instruments
+        )
+        send_mail(self.subject, body, self.from_email, [user.email])
@@ -0,0 +1,149 @@
+"""
+Monthly partitions of the calibration events table on PostgreSQL.
+
+``core_calibrationevent`` is range partitioned on ``checked_at``, one
+partition per calendar month in UTC. Reads of recent events only scan the
+partitions of their months, however long the history gets, and old months
+can be detached or dropped without touching the rest.
+
+A default partition takes rows no monthly partition covers yet, so writes
+never fail when maintenance is late. ``ensure_partitions`` creates the
+partitions of the coming months and of every month with rows in the
+default partition, e.g. backfilled history, moving those rows into them.
+Run it after migrating and ahead of time with ``manage.py
+create_calibration_partitions``.
+"""
+from datetime import datetime, timezone
+
+from django.db import connection as default_connection, transaction
+
+
+TABLE = 'core_calibrationevent'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def month_start(value):
+    """Return the start of the UTC month of ``value``."""
+    value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(start, months):
+    """Return the month start ``months`` after the month start ``start``."""
+    index = start.year * 12 + start.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(start):
+    """Return the name of the partition of the month starting at ``start``."""
+    return f'{TABLE}_p{start:%Y%m}'
+
+
+def is_partitioned(connection=default_connection):
+    """Return whether the events table is partitioned on ``connection``."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table '
+            'WHERE partrelid = to_regclass(%s)',
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection=default_connection):
+    """Return the names of the monthly partitions, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s) '
+            'AND child.relname <> %s ORDER BY child.relname',
+            [TABLE, DEFAULT_PARTITION],
+        )
+        return [name for name, in cursor.fetchall()]
+
+
+def create_partition(start, connection=default_connection):
+    """Create and attach the partition of the month starting at ``start``.
+
+    Rows of that month in the default partition are moved into it, in the
+    same transaction. The default partition is locked first, so no row of
+    the month can land in it between the move and the attach. Returns
+    False when the partition exists already.
+    """
+    name = partition_name(start)
+    end = add_months(start, 1)
+    quote = connection.ops.quote_name
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s)', [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+        # ATTACH takes this lock anyway, taking it before the move keeps
+        # out the inserts in between. The other partitions stay readable.
+        cursor.execute(
+            f'LOCK TABLE {quote(DEFAULT_PARTITION)} IN ACCESS EXCLUSIVE MODE'
+        )
+        # Created by another process while this one waited for the lock.
+        cursor.execute('SELECT to_regclass(%s)', [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+        cursor.execute(
+            f'CREATE TABLE {quote(name)} (LIKE {quote(TABLE)} '
+            f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} '
+            f'WHERE checked_at >= %s AND checked_at < %s RETURNING *) '
+            f'INSERT INTO {quote(name)} SELECT * FROM moved',
+            [start, end],
+        )
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+    return True
+
+
+def default_months(connection=default_connection):
+    """Return the month starts spanned by the rows of the default partition.
+
+    The months run from the oldest to the newest row, empty when it holds
+    none.
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT min(checked_at), max(checked_at) '
+            f'FROM {quote(DEFAULT_PARTITION)}'
+        )
+        oldest, newest = cursor.fetchone()
+    if oldest is None:
+        return []
+    months = [month_start(oldest)]
+    while months[-1] < month_start(newest):
+        months.append(add_months(months[-1], 1))
+    return months
+
+
+def ensure_partitions(months=3, now=None, connection=default_connection):
+    """Create the partitions from this month to ``months`` months ahead.
+
+    The partitions of the months spanned by the rows of the default
+    partition are created as well and the rows moved into them. Returns
+    the names of the partitions created, none when the table is not
+    partitioned.
+    """
+    if not is_partitioned(connection):
+        return []
+    start = month_start(now or datetime.now(timezone.utc))
+    wanted = {add_months(start, offset) for offset in range(months + 1)}
+    wanted.update(default_months(connection))
+    created = []
+    for month in sorted(wanted):
+        if create_partition(month, connection):
+            created.append(partition_name(month))
+    return created
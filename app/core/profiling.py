@@ -0,0 +1,409 @@
+"""
+Per-request profiling of the API.
+
+``ProfilingMiddleware`` times every request and splits the time into SQL,
+serializer and render time. The split is sent back in a ``Server-Timing``
+header and aggregated per view into histograms the metrics endpoint
+exposes in the Prometheus text format. A sample of the requests can run
+under cProfile or pyinstrument, the profiles of slow ones are written to
+``PROFILE_DIR``.
+
+The histograms live in the memory of each process, like the list cache
+and password hashing counters, so every worker is scraped on its own.
+"""
+import asyncio
+import cProfile
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.serializers import BaseSerializer
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    # Fraction of the requests run under the profiler.
+    'SAMPLE_RATE': 0.0,
+    # Sampled requests slower than this many ms are written to PROFILE_DIR.
+    'SLOW_MS': 500,
+    'PROFILE_DIR': None,
+    # 'cprofile' or 'pyinstrument'.
+    'PROFILER': 'cprofile',
+}
+
+# Upper bounds of the histogram buckets.
+SECONDS_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216,
+)
+
+# Histogram name, help and buckets of each field of ``Timings``.
+HISTOGRAMS = {
+    'total': (
+        'api_request_duration_seconds',
+        'Time spent in the request, middleware included.',
+        SECONDS_BUCKETS,
+    ),
+    'sql': (
+        'api_sql_duration_seconds',
+        'Time spent executing SQL.',
+        SECONDS_BUCKETS,
+    ),
+    'queries': (
+        'api_sql_queries',
+        'SQL statements executed.',
+        QUERIES_BUCKETS,
+    ),
+    'serializer': (
+        'api_serializer_duration_seconds',
+        'Time spent building serializer data.',
+        SECONDS_BUCKETS,
+    ),
+    'render': (
+        'api_render_duration_seconds',
+        'Time spent rendering the response.',
+        SECONDS_BUCKETS,
+    ),
+    'bytes': (
+        'api_response_bytes',
+        'Size of the response body, streaming responses excluded.',
+        BYTES_BUCKETS,
+    ),
+}
+
+_timings = ContextVar('profiling_timings', default=None)
+_lock = threading.Lock()
+_histograms = {}
+_profiler_lock = threading.Lock()
+
+
+def get_config():
+    """Return the PROFILING settings merged with the defaults."""
+    return {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+
+
+class Timings:
+    """Where the time of one request went, in seconds."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = 0.0
+        self.sql = 0.0
+        self.queries = 0
+        self.serializer = 0.0
+        self.render = 0.0
+        self.bytes = None
+        self.depth = 0
+
+    def server_timing(self):
+        """Return the value of the Server-Timing header."""
+        return ', '.join([
+            f'sql;dur={self.sql * 1000:.2f};desc="{self.queries} queries"',
+            f'serializer;dur={self.serializer * 1000:.2f}',
+            f'render;dur={self.render * 1000:.2f}',
+            f'total;dur={self.total * 1000:.2f}',
+        ])
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's ``name``.
+
+    Nested blocks are only counted once, by the outermost one.
+    """
+    timings = _timings.get()
+    if timings is None or timings.depth:
+        yield
+        return
+    timings.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.depth -= 1
+        setattr(
+            timings,
+            name,
+            getattr(timings, name) + time.perf_counter() - start,
+        )
+
+
+def _serializer_data(fget):
+    def data(self):
+        with timed('serializer'):
+            return fget(self)
+    return property(data)
+
+
+def install():
+    """Time ``.data`` of every serializer.
+
+    ``Serializer.data`` and ``ListSerializer.data`` both build it in
+    ``BaseSerializer.data``, nested serializers only in its call.
+    """
+    if not getattr(BaseSerializer.data, 'profiled', False):
+        BaseSerializer.data = _serializer_data(BaseSerializer.data.fget)
+        BaseSerializer.data.fget.profiled = True
+
+
+def _execute_sql(execute, sql, params, many, context):
+    timings = _timings.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if timings is not None:
+            timings.sql += time.perf_counter() - start
+            timings.queries += 1
+
+
+def _wrap_connections():
+    """Count the SQL of this thread's connections in the current request.
+
+    The wrapper stays installed, it only counts while a request's timings
+    are set in the context, so installing it again is a no-op.
+    """
+    for connection in connections.all():
+        if _execute_sql not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_execute_sql)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observations."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def record(view, method, timings):
+    """Add the timings of a request to the histograms of its view."""
+    with _lock:
+        for field, (name, _, buckets) in HISTOGRAMS.items():
+            value = getattr(timings, field)
+            if value is None:
+                continue
+            key = (name, view, method)
+            if key not in _histograms:
+                _histograms[key] = Histogram(buckets)
+            _histograms[key].observe(value)
+
+
+def reset_metrics():
+    """Reset the histograms of this process."""
+    with _lock:
+        _histograms.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_histograms():
+    """Return the histograms in the Prometheus text format."""
+    with _lock:
+        snapshot = {
+            key: (histogram.buckets, list(histogram.counts),
+                  histogram.sum, histogram.count)
+            for key, histogram in _histograms.items()
+        }
+
+    lines = []
+    for name, help_text, _ in HISTOGRAMS.values():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (key, view, method), (buckets, counts, total, count) in sorted(
+            snapshot.items(),
+        ):
+            if key != name:
+                continue
+            labels = f'view="{_label(view)}",method="{_label(method)}"'
+            cumulative = 0
+            for bound, bucket_count in zip([*buckets, '+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(
+                    f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}',
+                )
+            lines.append(f'{name}_sum{{{labels}}} {_number(total)}')
+            lines.append(f'{name}_count{{{labels}}} {count}')
+    return lines
+
+
+def render_counters(name, help_text, counters):
+    """Return ``counters`` as one Prometheus counter labelled by key."""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+    for key, value in sorted(counters.items()):
+        lines.append(f'{name}{{event="{_label(key)}"}} {value}')
+    return lines
+
+
+class Profile:
+    """A cProfile or pyinstrument profile of one request."""
+
+    def __init__(self, profiler):
+        if profiler == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise ImproperlyConfigured(
+                    'PROFILING PROFILER pyinstrument requires pyinstrument.',
+                )
+            self.profiler = Profiler()
+            self.suffix = 'html'
+        elif profiler == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.suffix = 'prof'
+        else:
+            raise ImproperlyConfigured(
+                f'Unknown PROFILING PROFILER {profiler}.',
+            )
+
+    def start(self):
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+
+    def stop(self):
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+
+    def save(self, directory, view, elapsed):
+        """Write the profile to ``directory``, return its path."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        name = ''.join(
+            char if char.isalnum() or char in '-_' else '-' for char in view
+        )
+        path = directory / (
+            f'{time.strftime("%Y%m%dT%H%M%S")}-{name}-'
+            f'{elapsed * 1000:.0f}ms.{self.suffix}'
+        )
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.dump_stats(path)
+        else:
+            path.write_text(self.profiler.output_html())
+        return path
+
+
+@contextmanager
+def sampled_profile(config):
+    """Run the block under a profiler for a sample of the requests.
+
+    Yields the profile, or None when the request is not sampled. Only one
+    request of a process is profiled at a time, profilers do not nest.
+    """
+    if not config['PROFILE_DIR'] or random.random() >= config['SAMPLE_RATE'] \
+            or not _profiler_lock.acquire(blocking=False):
+        yield None
+        return
+    try:
+        profile = Profile(config['PROFILER'])
+        profile.start()
+        try:
+            yield profile
+        finally:
+            profile.stop()
+    finally:
+        _profiler_lock.release()
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """Measure each request, see the module docstring.
+
+    It goes first in MIDDLEWARE so the other middleware is measured too.
+    Under ASGI the sync views run in the thread of ``sync_to_async``,
+    whose connections are wrapped from that thread before the request is
+    passed on. The async views query through core.asyncdb, not Django
+    connections, so their SQL time is part of the view time.
+    """
+
+    def __call__(self, request):
+        config = get_config()
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self._acall(request, config)
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        timings = Timings()
+        token = _timings.set(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_execute_sql),
+                    )
+                profile = stack.enter_context(sampled_profile(config))
+                response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        self.finish(request, response, timings, config)
+        if profile is not None and timings.total * 1000 >= config['SLOW_MS']:
+            profile.save(config['PROFILE_DIR'], self.view_name(request),
+                         timings.total)
+        return response
+
+    async def _acall(self, request, config):
+        if not config['ENABLED']:
+            return await self.get_response(request)
+
+        await sync_to_async(_wrap_connections, thread_sensitive=True)()
+        timings = Timings()
+        token = _timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        self.finish(request, response, timings, config)
+        return response
+
+    def process_template_response(self, request, response):
+        """Time the rendering of DRF and template responses."""
+        timings = _timings.get()
+        if timings is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                timings.render += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def view_name(self, request):
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match else 'unresolved'
+
+    def finish(self, request, response, timings, config):
+        """Record the request and add its Server-Timing header."""
+        timings.total = time.perf_counter() - timings.start
+        if not response.streaming:
+            timings.bytes = len(response.content)
+        record(self.view_name(request), request.method, timings)
+        if config['SERVER_TIMING']:
+            response['Server-Timing'] = timings.server_timing()
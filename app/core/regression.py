@@ -0,0 +1,489 @@
+"""
+Query count, latency and allocation regression harness for the API.
+
+Every route of ``app.urls`` outside the admin has at least one scenario.
+A scenario sends the same request repeatedly as a token authenticated
+user of a seeded fixture. The query counts are exact and must not depend
+on the fixture size, the timings and allocations get a tolerance. All of
+them are compared with the baselines committed in ``api_baselines.json``,
+see the ``bench_api`` command and ``core.tests.test_api_regression``.
+
+Each scenario also records the time of a fixed CPU bound workload,
+``calibrate()``, run just before it. Latency baselines are scaled by the
+ratio of the current calibration to the recorded one, so a slower CI
+runner or a busy laptop does not read as a regression.
+"""
+import io
+import json
+import time
+import tracemalloc
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import benchmarks, partitions
+from core.models import Instrument
+
+
+BASELINES_PATH = Path(__file__).with_name('api_baselines.json')
+PASSWORD = 'bench-password-123'
+# Statements of the test transaction wrapping, not of the code under test.
+IGNORED_SQL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+BATCH = 100
+CALIBRATION_PAYLOAD = [
+    {'id': i, 'tag': f'{i:07d}', 'values': list(range(i % 20))}
+    for i in range(2000)
+]
+
+
+class Fixture:
+    """Users and instruments the scenarios run against."""
+
+    def __init__(self, size, users=10):
+        """Seed ``size`` instruments and events spread over ``users`` users.
+
+        The first user is the one scenarios authenticate as.
+        """
+        tag = uuid.uuid4().hex[:12]
+        # The partitions a deployment has, see create_calibration_partitions.
+        partitions.ensure_partitions()
+        self.users = []
+        per_user = max(size // users, 1)
+        for index in range(users):
+            email = f'bench-{tag}-{index}@example.com'
+            if index:
+                user = benchmarks.create_benchmark_user(email)
+            else:
+                user = get_user_model().objects.create_user(
+                    email=email,
+                    password=PASSWORD,
+                    name='Benchmark',
+                )
+            benchmarks.seed_instruments(user, per_user, start=index * per_user)
+            benchmarks.seed_calibration_events(user, per_user)
+            self.users.append(user)
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE core_instrument')
+                cursor.execute('ANALYZE core_calibrationevent')
+        self.user = self.users[0]
+        self.client = self.token_client(self.user)
+        staff = benchmarks.create_benchmark_user(
+            f'bench-{tag}-staff@example.com',
+        )
+        staff.is_staff = True
+        staff.save(update_fields=['is_staff'])
+        self.staff_client = self.token_client(staff)
+        self.tag = tag
+        self.counter = 0
+        self.instrument_ids = list(Instrument.objects.filter(
+            user=self.user,
+        ).order_by('id').values_list('id', flat=True)[:BATCH])
+        self.instrument_id = self.instrument_ids[0]
+
+    def token_client(self, user):
+        """Return an API client authenticated with a token of ``user``."""
+        client = APIClient()
+        token = Token.objects.create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def next(self):
+        """Return a number unique within the fixture."""
+        self.counter += 1
+        return self.counter
+
+    def create_instruments(self, count):
+        """Create ``count`` instruments for the user, return their ids."""
+        start = 10 ** 8 + self.next() * BATCH
+        benchmarks.seed_instruments(self.user, count, start=start)
+        return list(Instrument.objects.filter(
+            user=self.user,
+        ).order_by('-id').values_list('id', flat=True)[:count])
+
+    def delete(self):
+        """Delete the seeded rows."""
+        Instrument.objects.filter(user__in=self.users).delete()
+        get_user_model().objects.filter(
+            email__startswith=f'bench-{self.tag}-',
+        ).delete()
+
+
+def instrument_payload(i):
+    """Return an instrument as sent to the API."""
+    instrument = benchmarks.build_instrument(None, i)
+    return {
+        'tag': instrument.tag,
+        'unit': instrument.unit,
+        'description': instrument.description,
+        'type': instrument.type,
+        'manufacturer': instrument.manufacturer,
+        'serial_no': instrument.serial_no,
+        'interval': instrument.interval,
+        'last_checked': instrument.last_checked.isoformat(),
+    }
+
+
+def calibration_payload(fixture):
+    """Return a batch of events checking the user's first instruments."""
+    checked_at = timezone.now() - timedelta(minutes=1)
+    return [
+        {
+            'instrument': pk,
+            'checked_at': checked_at.isoformat(),
+            'result': 'pass',
+            'as_found': '10.020000',
+            'as_left': '10.000000',
+            'technician': 'Benchmark',
+        }
+        for pk in fixture.instrument_ids
+    ]
+
+
+def import_file(fixture):
+    """Return an upload of a CSV file of new instruments."""
+    lines = ['tag,unit,description,type,manufacturer,serial_no,interval,'
+             'last_checked,notes,link']
+    for i in range(BATCH):
+        row = instrument_payload(fixture.next())
+        lines.append(','.join(str(value) for value in row.values()) + ',,')
+    upload = io.BytesIO('\n'.join(lines).encode())
+    upload.name = 'instruments.csv'
+    return {'file': upload}
+
+
+def next_page(fixture):
+    """Return the query parameters of the second list page."""
+    params = {'page_size': 10}
+    res = fixture.client.get(reverse('instrument:instrument-list'), params)
+    query = parse_qs(urlsplit(res.json()['next']).query)
+    params['cursor'] = query['cursor'][0]
+    return params
+
+
+class Scenario:
+    """One request to a route.
+
+    ``data`` and ``kwargs`` may be callables taking the fixture, called
+    before each request so that writes do not collide. ``cached`` keeps the
+    cache between requests, it is cleared otherwise. ``staff`` sends them
+    as a staff user.
+    """
+
+    def __init__(
+        self, name, route, method='get', kwargs=None, data=None,
+        format=None, status=None, cached=False, repeat=None,
+        counted=True, staff=False,
+    ):
+        self.name = name
+        self.route = route
+        self.method = method
+        self.kwargs = kwargs
+        self.data = data
+        self.format = format
+        self.status = status
+        self.cached = cached
+        # Upper bound on the repetitions of slow scenarios.
+        self.repeat = repeat
+        # Async views read over their own connections, not counted.
+        self.counted = counted
+        self.staff = staff
+
+    def build(self, fixture):
+        """Return the path and the data of the next request."""
+        kwargs = self.kwargs(fixture) if callable(self.kwargs) \
+            else self.kwargs
+        data = self.data(fixture) if callable(self.data) else self.data
+        return reverse(self.route, kwargs=kwargs), data
+
+
+def detail(fixture):
+    """Return the URL kwargs of a seeded instrument."""
+    return {'pk': fixture.instrument_id}
+
+
+def new_detail(fixture):
+    """Return the URL kwargs of a new instrument."""
+    return {'pk': fixture.create_instruments(1)[0]}
+
+
+SCENARIOS = [
+    Scenario('api-schema', 'api-schema'),
+    Scenario('api-docs', 'api-docs'),
+    Scenario(
+        'user-create', 'user:create', 'post',
+        data=lambda fixture: {
+            'email': f'bench-{fixture.tag}-new{fixture.next()}@example.com',
+            'password': PASSWORD,
+            'name': 'Benchmark',
+        },
+        status=201,
+    ),
+    Scenario(
+        'user-token', 'user:token', 'post',
+        data=lambda fixture: {
+            'email': fixture.user.email,
+            'password': PASSWORD,
+        },
+    ),
+    Scenario('user-me', 'user:me'),
+    Scenario(
+        'user-me-update', 'user:me', 'patch',
+        data={'name': 'Benchmark'},
+        format='json',
+    ),
+    Scenario('instrument-root', 'instrument:api-root'),
+    Scenario('instrument-list', 'instrument:instrument-list'),
+    Scenario(
+        'instrument-list-cached', 'instrument:instrument-list',
+        cached=True,
+    ),
+    Scenario(
+        'instrument-list-next-page', 'instrument:instrument-list',
+        data=next_page,
+    ),
+    Scenario(
+        'instrument-list-filtered', 'instrument:instrument-list',
+        data={
+            'type': 'ANALYZER',
+            'search': 'instrument 1',
+            'ordering': 'next_check',
+            'fields': 'id,tag,next_check',
+        },
+    ),
+    Scenario(
+        'instrument-create', 'instrument:instrument-list', 'post',
+        data=lambda fixture: instrument_payload(fixture.next()),
+        format='json',
+        status=201,
+    ),
+    Scenario(
+        'instrument-detail', 'instrument:instrument-detail',
+        kwargs=detail,
+    ),
+    Scenario(
+        'instrument-update', 'instrument:instrument-detail', 'patch',
+        kwargs=detail,
+        data={'interval': 90, 'notes': 'Benchmark'},
+        format='json',
+    ),
+    Scenario(
+        'instrument-delete', 'instrument:instrument-detail', 'delete',
+        kwargs=new_detail,
+        status=204,
+    ),
+    Scenario('instrument-summary', 'instrument:instrument-summary'),
+    Scenario('instrument-analytics', 'instrument:instrument-analytics'),
+    Scenario(
+        'instrument-bulk-create', 'instrument:instrument-bulk', 'post',
+        data=lambda fixture: [
+            instrument_payload(fixture.next()) for _ in range(BATCH)
+        ],
+        format='json',
+        status=201,
+        repeat=10,
+    ),
+    Scenario(
+        'instrument-bulk-update', 'instrument:instrument-bulk', 'patch',
+        data=lambda fixture: [
+            {'id': pk, 'interval': 60}
+            for pk in fixture.create_instruments(BATCH)
+        ],
+        format='json',
+        repeat=10,
+    ),
+    Scenario(
+        'instrument-bulk-delete', 'instrument:instrument-bulk', 'delete',
+        data=lambda fixture: fixture.create_instruments(BATCH),
+        format='json',
+        repeat=10,
+    ),
+    Scenario(
+        'instrument-import', 'instrument:instrument-import-file', 'post',
+        data=import_file,
+        format='multipart',
+        status=201,
+        repeat=10,
+    ),
+    Scenario(
+        'instrument-export', 'instrument:instrument-export',
+        data={'file_format': 'csv'},
+        repeat=5,
+    ),
+    Scenario(
+        'async-instrument-list', 'instrument-async:instrument-list',
+        counted=False,
+    ),
+    Scenario(
+        'async-instrument-detail', 'instrument-async:instrument-detail',
+        kwargs=detail,
+        counted=False,
+    ),
+    Scenario(
+        'async-instrument-summary', 'instrument-async:instrument-summary',
+        counted=False,
+    ),
+    Scenario('calibration-list', 'instrument:calibration-list'),
+    Scenario(
+        'calibration-list-instrument', 'instrument:calibration-list',
+        data=lambda fixture: {'instrument': fixture.instrument_id},
+    ),
+    Scenario(
+        'calibration-create', 'instrument:calibration-list', 'post',
+        data=calibration_payload,
+        format='json',
+        status=201,
+        repeat=10,
+    ),
+    Scenario('internal-metrics', 'internal-metrics', staff=True),
+]
+
+
+def iter_routes(patterns=None, namespace=None):
+    """Yield the names of the URL patterns, with their namespaces."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            inner = pattern.namespace or namespace
+            if pattern.namespace and namespace:
+                inner = f'{namespace}:{pattern.namespace}'
+            yield from iter_routes(pattern.url_patterns, inner)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield f'{namespace}:{pattern.name}' if namespace \
+                else pattern.name
+
+
+def api_routes():
+    """Return the route names the scenarios must cover."""
+    return {
+        route for route in iter_routes()
+        if not route.startswith('admin:')
+    }
+
+
+def send(scenario, fixture):
+    """Send the scenario's next request, return its time and queries."""
+    path, data = scenario.build(fixture)
+    if not scenario.cached:
+        cache.clear()
+    connection = connections[DEFAULT_DB_ALIAS]
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        kwargs = {'format': scenario.format} if scenario.format else {}
+        client = fixture.staff_client if scenario.staff else fixture.client
+        res = getattr(client, scenario.method)(path, data, **kwargs)
+        if res.streaming:
+            b''.join(res.streaming_content)
+        elapsed = (time.perf_counter() - start) * 1000
+
+    expected = scenario.status or 200
+    if res.status_code != expected:
+        raise AssertionError(
+            f'{scenario.name}: {res.status_code} instead of {expected}',
+        )
+    count = sum(
+        1 for query in queries.captured_queries
+        if not query['sql'].startswith(IGNORED_SQL)
+    )
+    return elapsed, count
+
+
+def count_queries(scenario, fixture):
+    """Return the queries of the scenario's request, after a warm up."""
+    send(scenario, fixture)
+    return send(scenario, fixture)[1]
+
+
+def calibrate(repeat=30):
+    """Return the median time of a fixed CPU bound workload in ms."""
+    def workload():
+        sorted(
+            json.loads(json.dumps(CALIBRATION_PAYLOAD)),
+            key=lambda row: row['tag'],
+        )
+
+    return round(benchmarks.median(benchmarks.time_call(workload, repeat)), 2)
+
+
+def measure(scenario, fixture, repeat):
+    """Return the queries, p50, p99 and peak allocations of a scenario."""
+    repeat = min(repeat, scenario.repeat or repeat)
+    calibration = calibrate()
+    send(scenario, fixture)
+    timings = []
+    counts = set()
+    for _ in range(repeat):
+        elapsed, count = send(scenario, fixture)
+        timings.append(elapsed)
+        counts.add(count)
+
+    tracemalloc.start()
+    try:
+        send(scenario, fixture)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'queries': max(counts) if scenario.counted else None,
+        'p50_ms': round(benchmarks.percentile(timings, 50), 2),
+        'p99_ms': round(benchmarks.percentile(timings, 99), 2),
+        'alloc_kib': round(peak / 1024, 1),
+        'calibration_ms': calibration,
+    }
+
+
+def load_baselines(path=BASELINES_PATH):
+    """Return the committed baselines."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {'queries': {}, 'performance': {}}
+
+
+def save_baselines(baselines, path=BASELINES_PATH):
+    """Write ``baselines`` sorted, so diffs stay readable."""
+    with open(path, 'w') as file:
+        json.dump(baselines, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def compare(name, result, queries, performance, tolerances):
+    """Return the regressions of ``result`` against its baselines.
+
+    ``tolerances`` maps ``p50_ms``, ``p99_ms`` and ``alloc_kib`` to the
+    allowed relative increase. Query counts must match exactly.
+    """
+    performance = performance or {}
+    scale = 1.0
+    if performance.get('calibration_ms'):
+        scale = result['calibration_ms'] / performance['calibration_ms']
+    problems = []
+    if result['queries'] is not None and queries is not None \
+            and result['queries'] != queries:
+        problems.append(
+            f'{name}: {result["queries"]} queries, baseline {queries}',
+        )
+    for metric, tolerance in tolerances.items():
+        baseline = performance.get(metric)
+        if baseline and metric.endswith('_ms'):
+            baseline = round(baseline * scale, 2)
+        if baseline and result[metric] > baseline * (1 + tolerance):
+            problems.append(
+                f'{name}: {metric} {result[metric]}, baseline {baseline} '
+                f'+{tolerance:.0%}',
+            )
+    return problems
@@ -0,0 +1,117 @@
+"""
+Database routing to read replicas.
+
+Everything goes to the ``default`` primary database unless a request
+opted in with ``read_from_replica``, as ``ReadReplicaMixin`` views do for
+safe methods. The first write of a request routes its remaining reads
+back to the primary, and the user's reads stay there for ``PIN_SECONDS``
+so they always see their own writes despite replication lag.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+
+DEFAULTS = {
+    # Database aliases of the replicas, reads are spread over them.
+    'ALIASES': [],
+    # Seconds a user's reads stay on the primary after they wrote. Keep it
+    # above the replication lag.
+    'PIN_SECONDS': 5,
+    # Django cache remembering recent writers, shared between processes
+    # when it is.
+    'CACHE_ALIAS': 'default',
+}
+
+_routing = ContextVar('db_routing', default=None)
+
+
+def get_config():
+    """Return the READ_REPLICAS settings merged with the defaults."""
+    return {**DEFAULTS, **getattr(settings, 'READ_REPLICAS', {})}
+
+
+def _pin_key(user_id):
+    return f'db-primary-pin:{user_id}'
+
+
+def pin(user_id):
+    """Route the reads of ``user_id`` to the primary for a while."""
+    config = get_config()
+    caches[config['CACHE_ALIAS']].set(
+        _pin_key(user_id),
+        True,
+        config['PIN_SECONDS'],
+    )
+
+
+def is_pinned(user_id):
+    """Return whether ``user_id`` wrote within the pin period."""
+    cache = caches[get_config()['CACHE_ALIAS']]
+    return bool(cache.get(_pin_key(user_id)))
+
+
+class Routing:
+    """Routing state of one request."""
+
+    def __init__(self):
+        self.user_id = None
+        self.replica = None
+        self.wrote = False
+
+
+@contextmanager
+def routing():
+    """Track the routing of the request handled in the block."""
+    token = _routing.set(Routing())
+    try:
+        yield _routing.get()
+    finally:
+        _routing.reset(token)
+
+
+def read_from_replica(user_id, replica=True):
+    """Route the reads of the current request of ``user_id``.
+
+    With ``replica`` the reads go to a random replica unless the user is
+    pinned to the primary. Either way a write pins the user.
+    """
+    state = _routing.get()
+    if state is None:
+        return
+    state.user_id = user_id
+    aliases = get_config()['ALIASES']
+    if replica and aliases and not state.wrote and not is_pinned(user_id):
+        state.replica = random.choice(aliases)
+
+
+class ReplicaRouter:
+    """Send the reads of opted-in requests to the read replicas."""
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        return state.replica if state is not None else None
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None and not state.wrote:
+            state.wrote = True
+            state.replica = None
+            if state.user_id is not None:
+                pin(state.user_id)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_config()['ALIASES']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_config()['ALIASES']:
+            return False
+        return None
@@ -0,0 +1,318 @@
+"""
+Calibration reminders for the instruments coming due.
+
+The scheduler walks the instruments in ``(next_check, id)`` order from a
+persisted watermark, so each run reads only the rows that came within
+``LEAD_DAYS`` of their next check since the last one. They are queued as
+``DueNotification`` rows, then delivered in batches with one reminder per
+user through the configured backend, see core.notifications.
+
+Several workers can run at once. The watermark row and the queued
+notifications are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED``, so
+one worker scans while the others deliver disjoint batches. Delivery is at
+least once: a worker dying after a send and before its commit leaves the
+batch to be sent again.
+
+Instruments created, imported or edited with a next check already behind
+the watermark, e.g. overdue or given a shorter interval, are found by a
+second watermark over ``(updated_at, id)``. Writes are read ``CHANGE_LAG``
+seconds after their ``updated_at`` so they have committed, a transaction
+open for longer than that can still be missed. ``run_due_scheduler
+--since`` moves the first watermark back, notifications already queued
+are not repeated.
+"""
+import logging
+from datetime import timedelta
+from itertools import groupby
+from operator import attrgetter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from core import notifications
+from core.models import DueNotification, Instrument, SchedulerWatermark
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'core.notifications.ConsoleBackend',
+    'OPTIONS': {},
+    # Days before its next check an instrument is reminded of.
+    'LEAD_DAYS': 7,
+    # Instruments scanned, or notifications delivered, per transaction.
+    'BATCH_SIZE': 500,
+    # Failed deliveries of a notification before it is given up.
+    'MAX_ATTEMPTS': 5,
+    # Seconds before a failed notification is retried, doubled on each
+    # further failure.
+    'RETRY_SECONDS': 60,
+    # Seconds the worker sleeps between runs.
+    'INTERVAL': 60,
+    # Seconds after their updated_at written instruments are scanned, keep
+    # it above the longest write transaction.
+    'CHANGE_LAG': 60,
+}
+
+WATERMARK = 'due'
+
+
+def get_config():
+    """Return the DUE_SCHEDULER settings merged with the defaults."""
+    return {**DEFAULTS, **getattr(settings, 'DUE_SCHEDULER', {})}
+
+
+def get_backend():
+    """Return the configured delivery backend."""
+    config = get_config()
+    return notifications.get_backend(config['BACKEND'], config['OPTIONS'])
+
+
+def rewind(since):
+    """Move the watermark back to ``since`` to scan again from there."""
+    SchedulerWatermark.objects.update_or_create(
+        name=WATERMARK,
+        defaults={'next_check': since, 'instrument_id': 0},
+    )
+
+
+def _queue(rows):
+    """Queue notifications for ``(instrument_id, user_id, next_check)``."""
+    DueNotification.objects.bulk_create(
+        [
+            DueNotification(
+                instrument_id=instrument_id,
+                user_id=user_id,
+                next_check=next_check,
+            )
+            for instrument_id, user_id, next_check, *_ in rows
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _claim_watermark():
+    """Lock and return the watermark, None when another worker holds it."""
+    return SchedulerWatermark.objects.select_for_update(
+        skip_locked=True,
+    ).filter(name=WATERMARK).first()
+
+
+def queue_due(now=None):
+    """Queue notifications for the instruments newly coming due.
+
+    Instruments written since the last run are queued as well when they
+    are due within the lead time, including overdue ones. A new watermark
+    starts at ``now``, instruments overdue before the first run are not
+    reminded of. Returns the number of instruments queued, 0 when another
+    worker holds the watermark.
+    """
+    config = get_config()
+    now = now or timezone.now()
+    horizon = now + timedelta(days=config['LEAD_DAYS'])
+    SchedulerWatermark.objects.get_or_create(
+        name=WATERMARK,
+        defaults={'next_check': now, 'changed_at': now},
+    )
+    return _queue_coming_due(config, horizon) + _queue_changed(
+        config,
+        horizon,
+        until=now - timedelta(seconds=config['CHANGE_LAG']),
+    )
+
+
+def _queue_coming_due(config, horizon):
+    """Queue the instruments from the watermark up to ``horizon``."""
+    queued = 0
+    while True:
+        with transaction.atomic():
+            watermark = _claim_watermark()
+            if watermark is None:
+                return queued
+
+            rows = list(Instrument.objects.filter(
+                Q(next_check__gt=watermark.next_check)
+                | Q(
+                    next_check=watermark.next_check,
+                    id__gt=watermark.instrument_id,
+                ),
+                next_check__lte=horizon,
+            ).order_by('next_check', 'id').values_list(
+                'id', 'user_id', 'next_check',
+            )[:config['BATCH_SIZE']])
+            if not rows:
+                return queued
+
+            _queue(rows)
+            watermark.instrument_id, _, watermark.next_check = rows[-1]
+            watermark.save(update_fields=[
+                'instrument_id',
+                'next_check',
+                'updated_at',
+            ])
+            queued += len(rows)
+
+        if len(rows) < config['BATCH_SIZE']:
+            return queued
+
+
+def _queue_changed(config, horizon, until):
+    """Queue the instruments written up to ``until`` due by ``horizon``.
+
+    Due dates already queued, e.g. by the first watermark, are skipped.
+    """
+    queued = 0
+    while True:
+        with transaction.atomic():
+            watermark = _claim_watermark()
+            if watermark is None:
+                return queued
+            if watermark.changed_at is None:
+                # Written by a version without the second watermark.
+                watermark.changed_at = until
+                watermark.save(update_fields=['changed_at', 'updated_at'])
+                return queued
+
+            rows = list(Instrument.objects.filter(
+                Q(updated_at__gt=watermark.changed_at)
+                | Q(
+                    updated_at=watermark.changed_at,
+                    id__gt=watermark.changed_id,
+                ),
+                updated_at__lte=until,
+                next_check__lte=horizon,
+            ).exclude(
+                Exists(DueNotification.objects.filter(
+                    instrument_id=OuterRef('id'),
+                    next_check=OuterRef('next_check'),
+                )),
+            ).order_by('updated_at', 'id').values_list(
+                'id', 'user_id', 'next_check', 'updated_at',
+            )[:config['BATCH_SIZE']])
+
+            _queue(rows)
+            if len(rows) < config['BATCH_SIZE']:
+                if until > watermark.changed_at:
+                    watermark.changed_at, watermark.changed_id = until, 0
+            else:
+                watermark.changed_id, *_, watermark.changed_at = rows[-1]
+            watermark.save(update_fields=[
+                'changed_at',
+                'changed_id',
+                'updated_at',
+            ])
+            queued += len(rows)
+
+        if len(rows) < config['BATCH_SIZE']:
+            return queued
+
+
+def _claim_notifications(config, now):
+    """Lock and return a batch of pending notifications of whole users.
+
+    The batch is extended by the remaining rows of its last user, so a
+    user whose rows straddle ``BATCH_SIZE`` still gets one reminder.
+    Returns the batch and whether it was full.
+    """
+    pending = DueNotification.objects.select_for_update(
+        skip_locked=True,
+    ).filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lt=now),
+        state=DueNotification.PENDING,
+    ).order_by('user_id', 'id')
+    claimed = list(pending[:config['BATCH_SIZE']])
+    full = len(claimed) == config['BATCH_SIZE']
+    if full:
+        last = claimed[-1]
+        claimed += pending.filter(user_id=last.user_id, id__gt=last.id)
+    return claimed, full
+
+
+def deliver(backend=None, now=None):
+    """Send the queued notifications, one reminder per user.
+
+    Returns the number of notifications sent, skipped and failed. Failed
+    notifications are retried after ``RETRY_SECONDS``, doubled on each
+    further failure, while the later users are still delivered to.
+    """
+    config = get_config()
+    backend = backend or get_backend()
+    now = now or timezone.now()
+    counts = {'sent': 0, 'skipped': 0, 'failed': 0}
+    while True:
+        with transaction.atomic():
+            claimed, full = _claim_notifications(config, now)
+            if not claimed:
+                return counts
+
+            instruments = Instrument.objects.in_bulk(
+                {notification.instrument_id for notification in claimed},
+            )
+            users = get_user_model().objects.in_bulk(
+                {notification.user_id for notification in claimed},
+            )
+            done = {
+                DueNotification.SENT: [],
+                DueNotification.SKIPPED: [],
+            }
+            failed = []
+            for user_id, group in groupby(claimed, attrgetter('user_id')):
+                due = []
+                for notification in group:
+                    instrument = instruments.get(notification.instrument_id)
+                    if getattr(instrument, 'next_check', None) \
+                            == notification.next_check:
+                        due.append((notification, instrument))
+                    else:
+                        done[DueNotification.SKIPPED].append(notification.id)
+                if not due:
+                    continue
+
+                try:
+                    backend.send(
+                        users[user_id],
+                        [instrument for _, instrument in due],
+                    )
+                except Exception:
+                    logger.exception('Reminder to user %s failed', user_id)
+                    failed += [notification for notification, _ in due]
+                else:
+                    done[DueNotification.SENT] += [
+                        notification.id for notification, _ in due
+                    ]
+
+            sent_at = timezone.now()
+            for state, ids in done.items():
+                if ids:
+                    DueNotification.objects.filter(id__in=ids).update(
+                        state=state,
+                        sent_at=sent_at,
+                    )
+                    counts[state] += len(ids)
+            for attempts, group in groupby(
+                sorted(failed, key=attrgetter('attempts')),
+                attrgetter('attempts'),
+            ):
+                DueNotification.objects.filter(
+                    id__in=[notification.id for notification in group],
+                ).update(
+                    attempts=attempts + 1,
+                    next_attempt_at=now + timedelta(
+                        seconds=config['RETRY_SECONDS'] * 2 ** attempts,
+                    ),
+                    state=DueNotification.FAILED
+                    if attempts + 1 >= config['MAX_ATTEMPTS']
+                    else DueNotification.PENDING,
+                )
+            counts['failed'] += len(failed)
+
+        if not full:
+            return counts
+
+
+def run_once(now=None, backend=None):
+    """Queue and deliver the reminders due now, return what was done."""
+    return {'queued': queue_due(now), **deliver(backend, now)}
@@ -0,0 +1,50 @@
+"""
+Signal handlers for the core app.
+"""
+from django.core.signals import request_started
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import stats
+from core.models import Instrument
+
+
+def buckets_of(instance):
+    """Return the buckets ``instance`` is in and was loaded from."""
+    return {
+        (instance.user_id, bucket_type)
+        for bucket_type in (instance.type, instance.loaded_type)
+        if bucket_type is not None
+    }
+
+
+@receiver(post_save, sender=Instrument)
+def instrument_saved(sender, instance, **kwargs):
+    """Refresh the statistics of the buckets the instrument left or joined."""
+    stats.mark_stale(buckets_of(instance))
+    instance.loaded_type = instance.type
+
+
+@receiver(post_delete, sender=Instrument)
+def instrument_deleted(sender, instance, **kwargs):
+    """Refresh the statistics of the bucket the instrument left."""
+    stats.mark_stale(buckets_of(instance))
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    """Close persistent connections that stopped working between requests.
+
+    Django 3.2 reuses a connection kept by CONN_MAX_AGE without testing it,
+    so a database or PgBouncer restart fails the next request on each
+    worker. Databases with CONN_HEALTH_CHECKS are pinged first instead and
+    reconnect on first use if needed.
+    """
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if not connection.settings_dict.get('CONN_HEALTH_CHECKS'):
+            continue
+        if not connection.is_usable():
+            connection.close()
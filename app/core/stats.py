@@ -0,0 +1,119 @@
+"""
+Maintenance of the per-user instrument statistics table.
+"""
+import threading
+
+from django.db import connections, router, transaction
+from django.db.models import Count, Min
+
+
+# Instrument fields that move a row between buckets or change its due date.
+STATS_FIELDS = frozenset({'type', 'last_checked', 'interval', 'next_check'})
+
+# Advisory lock of a (user_id, type) bucket, in Python and over a row with
+# user_id and type columns in SQL.
+LOCK_KEY = 'instrument-stats:{}:{}'
+LOCK_KEY_SQL = (
+    "hashtextextended('instrument-stats:' || user_id || ':' || type, 0)"
+)
+
+_pending = threading.local()
+
+
+def _pending_buckets():
+    if not hasattr(_pending, 'buckets'):
+        _pending.buckets = set()
+    return _pending.buckets
+
+
+def mark_stale(buckets):
+    """Refresh the ``(user_id, type)`` buckets when the transaction commits.
+
+    Buckets marked several times in one transaction are refreshed once.
+    Outside a transaction the refresh runs immediately.
+    """
+    buckets = set(buckets)
+    if buckets:
+        _pending_buckets().update(buckets)
+        transaction.on_commit(flush)
+
+
+def flush():
+    """Refresh every bucket marked stale so far."""
+    pending = _pending_buckets()
+    buckets = set(pending)
+    pending.clear()
+    if buckets:
+        refresh(buckets)
+
+
+def _lock_buckets(connection, buckets):
+    """Hold off other refreshes of ``buckets`` until the transaction ends.
+
+    A stats row may not exist yet, so take transaction level advisory
+    locks on PostgreSQL rather than locking the rows. They are taken in
+    one statement and in a fixed order, so refreshes cannot deadlock.
+    SQLite serializes writers already.
+    """
+    if connection.vendor != 'postgresql' or not buckets:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock(hashtextextended(key, 0)) '
+            'FROM unnest(%s::text[]) AS key',
+            [[LOCK_KEY.format(*bucket) for bucket in sorted(buckets)]],
+        )
+
+
+def refresh(buckets):
+    """Recompute the statistics of ``buckets`` from the instruments.
+
+    Each bucket is one aggregate over the (user, type) index, so the cost
+    depends on the size of the bucket rather than of the table. The bucket
+    is locked before the aggregate is read, so concurrent refreshes write
+    in turn and the last one sees the instruments committed by the others.
+    """
+    from core.models import Instrument, InstrumentStats
+
+    using = router.db_for_write(InstrumentStats)
+    with transaction.atomic(using=using):
+        _lock_buckets(connections[using], buckets)
+        for user_id, type_ in sorted(buckets):
+            state = Instrument.objects.using(using).filter(
+                user_id=user_id,
+                type=type_,
+            ).aggregate(
+                count=Count('id'),
+                earliest_next_check=Min('next_check'),
+            )
+            if state['count']:
+                InstrumentStats.objects.using(using).update_or_create(
+                    user_id=user_id,
+                    type=type_,
+                    defaults=state,
+                )
+            else:
+                InstrumentStats.objects.using(using).filter(
+                    user_id=user_id,
+                    type=type_,
+                ).delete()
+
+
+def rebuild():
+    """Replace the statistics table with a fresh aggregate of instruments.
+
+    Returns the number of buckets written.
+    """
+    from core.models import Instrument, InstrumentStats
+
+    rows = Instrument.objects.order_by().values('user_id', 'type').annotate(
+        count=Count('id'),
+        earliest_next_check=Min('next_check'),
+    )
+    with transaction.atomic():
+        InstrumentStats.objects.all().delete()
+        created = InstrumentStats.objects.bulk_create(
+            (InstrumentStats(**row) for row in rows.iterator()),
+            batch_size=1000,
+        )
+    return len(created)
@@ -0,0 +1,45 @@
+"""
+Query count regression tests for every API route.
+
+Update core/api_baselines.json with ``manage.py bench_api --update`` when
+a change of query count is intended.
+"""
+from django.db import connection
+from django.test import TransactionTestCase
+
+from core import regression
+from user.authentication import clear_token_cache
+
+
+class ApiRegressionTests(TransactionTestCase):
+    """Rows are committed so on-commit work is counted as in production."""
+
+    def setUp(self):
+        clear_token_cache()
+
+    def test_every_route_has_a_scenario(self):
+        """Test no API route is left out of the benchmarks."""
+        covered = {scenario.route for scenario in regression.SCENARIOS}
+
+        self.assertEqual(regression.api_routes() - covered, set())
+
+    def test_query_counts(self):
+        """Test query counts match the baselines at any fixture size."""
+        baselines = regression.load_baselines()['queries'].get(
+            connection.vendor,
+        )
+        if not baselines:
+            self.skipTest(f'no {connection.vendor} baselines')
+
+        counts = []
+        for size in (40, 400):
+            fixture = regression.Fixture(size, users=2)
+            counts.append({
+                scenario.name: regression.count_queries(scenario, fixture)
+                for scenario in regression.SCENARIOS if scenario.counted
+            })
+
+        for name, count in counts[0].items():
+            with self.subTest(scenario=name):
+                self.assertEqual(count, baselines.get(name))
+                self.assertEqual(counts[1][name], count, 'grows with rows')
@@ -0,0 +1,57 @@
+"""
+Tests for the persistent database connection health checks.
+"""
+from unittest.mock import MagicMock, patch
+
+from django.core.signals import request_started
+from django.test import SimpleTestCase
+
+
+def mock_connection(usable=True, in_atomic_block=False, health_checks=True):
+    """Return a mock persistent database connection."""
+    connection = MagicMock(in_atomic_block=in_atomic_block)
+    connection.settings_dict = {'CONN_HEALTH_CHECKS': health_checks}
+    connection.is_usable.return_value = usable
+    return connection
+
+
+@patch('core.signals.connections')
+class ConnectionHealthCheckTests(SimpleTestCase):
+
+    def send_request_started(self, mock_connections, *connections):
+        mock_connections.all.return_value = list(connections)
+        request_started.send(sender=self.__class__)
+
+    def test_broken_connection_closed(self, mock_connections):
+        """Test an unusable connection is closed at request start."""
+        connection = mock_connection(usable=False)
+        self.send_request_started(mock_connections, connection)
+
+        connection.close.assert_called_once()
+
+    def test_usable_connection_kept(self, mock_connections):
+        """Test a working connection is reused."""
+        connection = mock_connection()
+        self.send_request_started(mock_connections, connection)
+
+        connection.is_usable.assert_called_once()
+        connection.close.assert_not_called()
+
+    def test_health_checks_disabled(self, mock_connections):
+        """Test connections are not pinged without CONN_HEALTH_CHECKS."""
+        connection = mock_connection(usable=False, health_checks=False)
+        self.send_request_started(mock_connections, connection)
+
+        connection.is_usable.assert_not_called()
+        connection.close.assert_not_called()
+
+    def test_closed_and_atomic_connections_skipped(self, mock_connections):
+        """Test unopened connections and open transactions are left alone."""
+        closed = mock_connection(usable=False)
+        closed.connection = None
+        atomic = mock_connection(usable=False, in_atomic_block=True)
+        self.send_request_started(mock_connections, closed, atomic)
+
+        for connection in (closed, atomic):
+            connection.is_usable.assert_not_called()
+            connection.close.assert_not_called()
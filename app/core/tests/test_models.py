@@ -1,9 +1,11 @@
 """
 Tests for models.
 """
-from datetime import datetime
+from datetime import datetime, timedelta
 
+from django.db.models import F
 from django.test import TestCase
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 from core import models
@@ -72,3 +74,110 @@ class ModelTests(TestCase):
         )
 
         self.assertEqual(str(instrument), instrument.tag)
+
+    def test_instrument_next_check_stored(self):
+        """Test next_check is stored and kept in sync on save."""
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123',
+        )
+        last_checked = timezone.make_aware(datetime(2021, 1, 1))
+        instrument = models.Instrument.objects.create(
+            user=user,
+            tag='11-FV-01',
+            unit='1100',
+            description='Sample instrument description.',
+            type='Sample type',
+            manufacturer='Sample manufacturer',
+            serial_no='serial123',
+            interval=30,
+            last_checked=last_checked,
+        )
+        instrument.refresh_from_db()
+        self.assertEqual(instrument.next_check, datetime(
+            2021, 1, 31, tzinfo=timezone.utc,
+        ))
+
+        instrument.interval = 10
+        instrument.save(update_fields=['interval'])
+        instrument.refresh_from_db()
+        self.assertEqual(
+            instrument.next_check,
+            last_checked + timedelta(days=10),
+        )
+
+    def test_instrument_partial_save_touches_updated_at(self):
+        """Test save(update_fields=...) moves updated_at forward."""
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123',
+        )
+        instrument = models.Instrument.objects.create(
+            user=user,
+            tag='11-FV-01',
+            interval=30,
+            last_checked=timezone.make_aware(datetime(2021, 1, 1)),
+        )
+        earlier = timezone.make_aware(datetime(2022, 1, 1))
+        models.Instrument.objects.filter(pk=instrument.pk).update(
+            updated_at=earlier,
+        )
+
+        instrument.tag = '11-FV-02'
+        instrument.save(update_fields=['tag'])
+
+        instrument.refresh_from_db()
+        self.assertEqual(instrument.tag, '11-FV-02')
+        self.assertGreater(instrument.updated_at, earlier)
+
+    def test_instrument_next_check_bulk_writes(self):
+        """Test next_check follows bulk_create, bulk_update and update."""
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123',
+        )
+        last_checked = timezone.make_aware(datetime(2021, 1, 1, 12, 30))
+        models.Instrument.objects.bulk_create([
+            models.Instrument(
+                user=user,
+                tag=f'11-FV-0{i}',
+                unit='1100',
+                description='Sample instrument description.',
+                type='Sample type',
+                manufacturer='Sample manufacturer',
+                serial_no='serial123',
+                interval=i + 1,
+                last_checked=last_checked,
+            )
+            for i in range(3)
+        ])
+        instruments = models.Instrument.objects.order_by('interval')
+        for instrument in instruments:
+            self.assertEqual(
+                instrument.next_check,
+                last_checked + timedelta(days=instrument.interval),
+            )
+
+        for instrument in instruments:
+            instrument.interval += 10
+        models.Instrument.objects.bulk_update(instruments, ['interval'])
+        for instrument in models.Instrument.objects.all():
+            self.assertEqual(
+                instrument.next_check,
+                last_checked + timedelta(days=instrument.interval),
+            )
+
+        new_checked = last_checked + timedelta(days=100)
+        models.Instrument.objects.update(last_checked=new_checked)
+        for instrument in models.Instrument.objects.all():
+            self.assertEqual(
+                instrument.next_check,
+                new_checked + timedelta(days=instrument.interval),
+            )
+
+        models.Instrument.objects.update(interval=F('interval') * 2)
+        for instrument in models.Instrument.objects.all():
+            self.assertEqual(
+                instrument.next_check,
+                new_checked + timedelta(days=instrument.interval),
+            )
@@ -0,0 +1,133 @@
+"""
+Tests for the monthly partitions of the calibration events.
+"""
+import io
+from datetime import datetime, timedelta, timezone
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from core import partitions
+from core.models import CalibrationEvent, Instrument
+
+
+def create_event(checked_at):
+    """Create and return an event of a new user and instrument."""
+    user = get_user_model().objects.create_user(
+        email=f'user-{checked_at:%Y%m%d%H%M%S}@example.com',
+    )
+    instrument = Instrument.objects.create(
+        user=user,
+        tag='10-PT-0001',
+        type='PRESSURE TRANSMITTER',
+        interval=30,
+        last_checked=checked_at,
+    )
+    return CalibrationEvent.objects.create(
+        user=user,
+        instrument=instrument,
+        checked_at=checked_at,
+        result=CalibrationEvent.PASS,
+        technician='J. Smith',
+    )
+
+
+def stored_in(event):
+    """Return the name of the partition holding ``event``."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT tableoid::regclass::text FROM core_calibrationevent '
+            'WHERE id = %s',
+            [event.id],
+        )
+        return cursor.fetchone()[0]
+
+
+class MonthTests(TestCase):
+
+    def test_months(self):
+        """Test month starts and partition names are in UTC."""
+        start = partitions.month_start(
+            datetime(2024, 12, 31, 23, tzinfo=timezone(timedelta(hours=-5))),
+        )
+
+        self.assertEqual(start, datetime(2025, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(
+            partitions.add_months(start, 13),
+            datetime(2026, 2, 1, tzinfo=timezone.utc),
+        )
+        self.assertEqual(
+            partitions.partition_name(start),
+            'core_calibrationevent_p202501',
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+class PartitionTests(TestCase):
+
+    def test_events_stored_in_month_partition(self):
+        """Test events of this month land in its partition."""
+        now = datetime.now(timezone.utc)
+        partitions.ensure_partitions(months=0, now=now)
+
+        event = create_event(now)
+
+        self.assertEqual(
+            stored_in(event),
+            partitions.partition_name(partitions.month_start(now)),
+        )
+
+    def test_new_partition_takes_default_rows(self):
+        """Test creating a partition moves its rows out of the default."""
+        later = partitions.add_months(
+            partitions.month_start(datetime.now(timezone.utc)), 12,
+        )
+        event = create_event(later + timedelta(days=3))
+        self.assertEqual(stored_in(event), partitions.DEFAULT_PARTITION)
+
+        created = partitions.ensure_partitions(months=0, now=later)
+
+        self.assertEqual(created, [partitions.partition_name(later)])
+        self.assertEqual(stored_in(event), partitions.partition_name(later))
+        self.assertEqual(partitions.ensure_partitions(months=0, now=later), [])
+
+    def test_backfilled_months_get_partitions(self):
+        """Test history in the default partition is given its months."""
+        now = datetime.now(timezone.utc)
+        oldest = partitions.add_months(partitions.month_start(now), -25)
+        events = [
+            create_event(oldest + timedelta(days=2)),
+            create_event(partitions.add_months(oldest, 2)),
+        ]
+        self.assertEqual(partitions.default_months(), [
+            partitions.add_months(oldest, offset) for offset in range(3)
+        ])
+
+        created = partitions.ensure_partitions(months=0, now=now)
+
+        self.assertEqual(created[:3], [
+            partitions.partition_name(partitions.add_months(oldest, offset))
+            for offset in range(3)
+        ])
+        self.assertEqual(
+            [stored_in(event) for event in events],
+            [created[0], created[2]],
+        )
+        self.assertEqual(partitions.default_months(), [])
+
+    def test_command(self):
+        """Test create_calibration_partitions reports what it created."""
+        out = io.StringIO()
+
+        call_command('create_calibration_partitions', '--months', '4',
+                     stdout=out)
+
+        month = partitions.add_months(
+            partitions.month_start(datetime.now(timezone.utc)), 4,
+        )
+        self.assertIn(partitions.partition_name(month), out.getvalue())
+        self.assertIn(partitions.partition_name(month),
+                      partitions.list_partitions())
@@ -0,0 +1,195 @@
+"""
+Tests for the profiling middleware and the metrics endpoint.
+"""
+import pstats
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import (
+    AsyncClient,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import profiling
+from core.models import Instrument
+
+
+INSTRUMENTS_URL = reverse('instrument:instrument-list')
+METRICS_URL = reverse('internal-metrics')
+
+
+def create_user(**params):
+    return get_user_model().objects.create_user(
+        email='user@example.com',
+        password='testpass123',
+        **params,
+    )
+
+
+def server_timing(response):
+    """Return the Server-Timing metrics of ``response`` by name."""
+    metrics = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class ProfilingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        profiling.reset_metrics()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Instrument.objects.create(
+            user=self.user,
+            tag='10-PT-0001',
+            interval=30,
+            last_checked=timezone.make_aware(datetime(2023, 1, 1)),
+        )
+
+    def test_server_timing(self):
+        """Test responses break their time down in Server-Timing."""
+        res = self.client.get(INSTRUMENTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        metrics = server_timing(res)
+        self.assertEqual(
+            set(metrics),
+            {'sql', 'serializer', 'render', 'total'},
+        )
+        self.assertNotEqual(metrics['sql']['desc'], '"0 queries"')
+        self.assertGreater(float(metrics['render']['dur']), 0)
+        self.assertGreaterEqual(
+            float(metrics['total']['dur']),
+            float(metrics['sql']['dur']),
+        )
+
+    async def test_server_timing_asgi(self):
+        """Test SQL of sync views is counted under the ASGI handler."""
+        token = await sync_to_async(Token.objects.create)(user=self.user)
+        # AsyncClient sends its extra arguments as headers by name.
+        res = await AsyncClient().get(
+            INSTRUMENTS_URL,
+            AUTHORIZATION=f'Token {token.key}',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        metrics = server_timing(res)
+        self.assertNotEqual(metrics['sql']['desc'], '"0 queries"')
+        self.assertGreater(float(metrics['sql']['dur']), 0)
+
+    @override_settings(PROFILING={'SERVER_TIMING': False})
+    def test_server_timing_disabled(self):
+        """Test the header can be turned off."""
+        res = self.client.get(INSTRUMENTS_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_metrics_per_view(self):
+        """Test the histograms are labelled with the view name."""
+        self.client.get(INSTRUMENTS_URL)
+        self.user.is_staff = True
+        self.user.save()
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        labels = 'view="instrument:instrument-list",method="GET"'
+        self.assertIn(f'api_sql_queries_bucket{{{labels},le="+Inf"}} 1', body)
+        self.assertIn(
+            f'api_request_duration_seconds_count{{{labels}}} 1',
+            body,
+        )
+        self.assertIn('# TYPE api_response_bytes histogram', body)
+        self.assertIn('instrument_list_cache_events_total{event="hits"}', body)
+        self.assertIn('password_hashing_events_total{event="rejected"}', body)
+
+    def test_metrics_not_public(self):
+        """Test other users and addresses cannot read the metrics."""
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(INTERNAL_IPS=['127.0.0.1'])
+    def test_metrics_internal_ips(self):
+        """Test scrapers from INTERNAL_IPS need no credentials."""
+        res = APIClient().get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_slow_requests_profiled(self):
+        """Test sampled requests over SLOW_MS leave a profile on disk."""
+        with tempfile.TemporaryDirectory() as directory:
+            config = {'SAMPLE_RATE': 1, 'SLOW_MS': 0, 'PROFILE_DIR': directory}
+            with override_settings(PROFILING=config):
+                self.client.get(INSTRUMENTS_URL)
+
+            paths = list(Path(directory).iterdir())
+            self.assertEqual(len(paths), 1)
+            self.assertIn('instrument-instrument-list', paths[0].name)
+            self.assertTrue(pstats.Stats(str(paths[0])).total_calls)
+
+    def test_fast_requests_not_profiled(self):
+        """Test sampled requests under SLOW_MS are discarded."""
+        with tempfile.TemporaryDirectory() as directory:
+            config = {
+                'SAMPLE_RATE': 1,
+                'SLOW_MS': 60000,
+                'PROFILE_DIR': directory,
+            }
+            with override_settings(PROFILING=config):
+                self.client.get(INSTRUMENTS_URL)
+
+            self.assertEqual(list(Path(directory).iterdir()), [])
+
+
+class HistogramTests(SimpleTestCase):
+
+    def setUp(self):
+        profiling.reset_metrics()
+
+    def test_buckets_are_cumulative(self):
+        """Test observations count in their bucket and every larger one."""
+        for total in (0.002, 0.002, 3):
+            timings = profiling.Timings()
+            timings.total = total
+            profiling.record('view', 'GET', timings)
+
+        lines = profiling.render_histograms()
+
+        labels = 'view="view",method="GET"'
+        name = 'api_request_duration_seconds'
+        self.assertIn(f'{name}_bucket{{{labels},le="0.001"}} 0', lines)
+        self.assertIn(f'{name}_bucket{{{labels},le="0.0025"}} 2', lines)
+        self.assertIn(f'{name}_bucket{{{labels},le="2.5"}} 2', lines)
+        self.assertIn(f'{name}_bucket{{{labels},le="+Inf"}} 3', lines)
+        self.assertIn(f'{name}_count{{{labels}}} 3', lines)
+        self.assertNotIn('api_response_bytes_count', '\n'.join(lines))
+
+    def test_timed_counts_nested_blocks_once(self):
+        """Test a block inside a timed block is not added twice."""
+        timings = profiling.Timings()
+        token = profiling._timings.set(timings)
+        try:
+            with profiling.timed('serializer'):
+                with profiling.timed('serializer'):
+                    pass
+        finally:
+            profiling._timings.reset(token)
+
+        self.assertGreater(timings.serializer, 0)
+        self.assertEqual(timings.depth, 0)
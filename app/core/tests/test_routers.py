@@ -0,0 +1,142 @@
+"""
+Tests for the read replica routing.
+
+The API tests need a ``replica`` database, run them on PostgreSQL with
+``--settings=app.replica_settings``. It mirrors the default database
+from its own connection, which does not see uncommitted test data, hence
+``TransactionTestCase``.
+"""
+from datetime import datetime
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, router
+from django.test import (
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import routers
+from core.models import Instrument
+
+
+INSTRUMENTS_URL = reverse('instrument:instrument-list')
+SUMMARY_URL = reverse('instrument:instrument-summary')
+EXPORT_URL = reverse('instrument:instrument-export')
+ME_URL = reverse('user:me')
+
+REPLICAS = {'ALIASES': ['replica'], 'PIN_SECONDS': 5}
+
+
+@override_settings(READ_REPLICAS=REPLICAS)
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_reads_default_outside_requests(self):
+        """Test reads outside an opted-in request use the primary."""
+        self.assertEqual(Instrument.objects.all().db, 'default')
+
+    def test_reads_replica(self):
+        """Test opted-in reads go to a replica."""
+        with routers.routing():
+            routers.read_from_replica(1)
+            self.assertEqual(Instrument.objects.all().db, 'replica')
+
+        self.assertEqual(Instrument.objects.all().db, 'default')
+
+    def test_unsafe_request_reads_default(self):
+        """Test requests not opting in read from the primary."""
+        with routers.routing():
+            routers.read_from_replica(1, replica=False)
+            self.assertEqual(Instrument.objects.all().db, 'default')
+
+    def test_write_pins_request_and_user(self):
+        """Test a write routes later reads of the user to the primary."""
+        with routers.routing():
+            routers.read_from_replica(1)
+            self.assertEqual(router.db_for_write(Instrument), 'default')
+            self.assertEqual(Instrument.objects.all().db, 'default')
+
+        self.assertTrue(routers.is_pinned(1))
+        self.assertFalse(routers.is_pinned(2))
+        with routers.routing():
+            routers.read_from_replica(1)
+            self.assertEqual(Instrument.objects.all().db, 'default')
+        with routers.routing():
+            routers.read_from_replica(2)
+            self.assertEqual(Instrument.objects.all().db, 'replica')
+
+    def test_no_replicas(self):
+        """Test reads use the primary when no replica is configured."""
+        with self.settings(READ_REPLICAS={'ALIASES': []}):
+            with routers.routing():
+                routers.read_from_replica(1)
+                self.assertEqual(Instrument.objects.all().db, 'default')
+
+    def test_no_migrations_on_replicas(self):
+        """Test replicas are never migrated."""
+        self.assertFalse(router.allow_migrate('replica', 'core'))
+        self.assertTrue(router.allow_migrate('default', 'core'))
+
+
+@skipUnless('replica' in settings.DATABASES, 'needs a replica database')
+class ReplicaApiTests(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        Instrument.objects.create(
+            user=self.user,
+            tag='11-FV-01',
+            unit='1100',
+            description='Sample instrument description.',
+            type='CONTROL VALVE',
+            manufacturer='EMERSON',
+            serial_no='serial123',
+            interval=30,
+            last_checked=timezone.make_aware(datetime(2021, 1, 1)),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_queries(self, method, url, data=None):
+        """Return the primary and replica queries of a request."""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            res = getattr(self.client, method)(url, data, format='json')
+            if res.streaming:
+                b''.join(res.streaming_content)
+        self.assertLess(res.status_code, 400)
+        return len(primary), len(replica)
+
+    def test_reads_from_replica(self):
+        """Test instrument and user reads are served by the replica."""
+        for url in (INSTRUMENTS_URL, SUMMARY_URL, EXPORT_URL):
+            primary, replica = self.get_queries('get', url)
+            self.assertEqual(primary, 0, url)
+            self.assertGreater(replica, 0, url)
+
+        res = self.client.get(INSTRUMENTS_URL)
+        self.assertEqual(len(res.json()['results']), 1)
+
+    def test_reads_own_writes(self):
+        """Test reads after a write are served by the primary."""
+        self.get_queries('patch', ME_URL, {'name': 'New Name'})
+
+        primary, replica = self.get_queries('get', INSTRUMENTS_URL)
+
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
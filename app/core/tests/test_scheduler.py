@@ -0,0 +1,356 @@
+"""
+Tests for the due scheduler and its notification backends.
+"""
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import scheduler
+from core.models import DueNotification, Instrument, SchedulerWatermark
+from core.notifications import BaseBackend, ConsoleBackend
+
+
+NOW = timezone.make_aware(datetime(2024, 3, 1, 12))
+
+
+def create_user(email='user@example.com'):
+    return get_user_model().objects.create_user(email=email)
+
+
+def create_instrument(user, due, tag='10-PT-0001'):
+    """Create an instrument whose next check is ``due``."""
+    return Instrument.objects.create(
+        user=user,
+        tag=tag,
+        type='PRESSURE TRANSMITTER',
+        interval=30,
+        last_checked=due - timedelta(days=30),
+    )
+
+
+class RecordingBackend(BaseBackend):
+    """Keep the reminders in memory."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.sent = []
+
+    def send(self, user, instruments):
+        self.sent.append((user.email, [i.tag for i in instruments]))
+
+
+class FailingBackend(BaseBackend):
+
+    def send(self, user, instruments):
+        raise ConnectionError('mail server down')
+
+
+class QueueDueTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+
+    def test_queues_instruments_coming_due(self):
+        """Test only instruments due within the lead time are queued."""
+        soon = create_instrument(self.user, NOW + timedelta(days=3))
+        create_instrument(self.user, NOW + timedelta(days=30), tag='later')
+        create_instrument(self.user, NOW - timedelta(days=1), tag='overdue')
+
+        queued = scheduler.queue_due(NOW)
+
+        self.assertEqual(queued, 1)
+        notification = DueNotification.objects.get()
+        self.assertEqual(notification.instrument_id, soon.id)
+        self.assertEqual(notification.user, self.user)
+        self.assertEqual(notification.next_check, soon.next_check)
+        self.assertEqual(notification.state, DueNotification.PENDING)
+
+    def test_runs_read_only_new_rows(self):
+        """Test the watermark keeps runs from queuing rows again."""
+        create_instrument(self.user, NOW + timedelta(days=3))
+        later = create_instrument(
+            self.user,
+            NOW + timedelta(days=30),
+            tag='later',
+        )
+        scheduler.queue_due(NOW)
+
+        self.assertEqual(scheduler.queue_due(NOW), 0)
+        self.assertEqual(scheduler.queue_due(NOW + timedelta(days=25)), 1)
+        watermark = SchedulerWatermark.objects.get()
+        self.assertEqual(watermark.next_check, later.next_check)
+        self.assertEqual(watermark.instrument_id, later.id)
+        self.assertEqual(DueNotification.objects.count(), 2)
+
+    @override_settings(DUE_SCHEDULER={'BATCH_SIZE': 2})
+    def test_batches_with_equal_due_dates(self):
+        """Test batches split rows sharing a next_check exactly once."""
+        due = NOW + timedelta(days=1)
+        for n in range(5):
+            create_instrument(self.user, due, tag=f'tag-{n}')
+
+        self.assertEqual(scheduler.queue_due(NOW), 5)
+        self.assertEqual(DueNotification.objects.count(), 5)
+
+    def test_rewind_does_not_repeat(self):
+        """Test scanning again queues missed rows only."""
+        create_instrument(self.user, NOW + timedelta(days=3))
+        create_instrument(self.user, NOW - timedelta(days=1), tag='overdue')
+        scheduler.queue_due(NOW)
+
+        scheduler.rewind(NOW - timedelta(days=10))
+        scheduler.queue_due(NOW)
+
+        self.assertEqual(DueNotification.objects.count(), 2)
+
+    @override_settings(DUE_SCHEDULER={'CHANGE_LAG': 0})
+    def test_queues_written_rows_already_due(self):
+        """Test rows written behind the watermark are queued once."""
+        start = timezone.now()
+        scheduler.queue_due()
+        overdue = create_instrument(self.user, start - timedelta(days=1))
+        later = create_instrument(
+            self.user,
+            start + timedelta(days=30),
+            tag='later',
+        )
+        soon = create_instrument(
+            self.user,
+            start + timedelta(days=3),
+            tag='soon',
+        )
+
+        self.assertEqual(scheduler.queue_due(), 2)
+        self.assertEqual(
+            set(DueNotification.objects.values_list(
+                'instrument_id', flat=True,
+            )),
+            {overdue.id, soon.id},
+        )
+        self.assertEqual(scheduler.queue_due(), 0)
+
+        later.interval = 1
+        later.save()
+        self.assertEqual(scheduler.queue_due(), 1)
+        self.assertTrue(
+            DueNotification.objects.filter(instrument_id=later.id).exists()
+        )
+
+    def test_written_rows_wait_for_the_lag(self):
+        """Test writes are scanned once they are CHANGE_LAG old."""
+        start = timezone.now()
+        scheduler.queue_due(start)
+        create_instrument(self.user, start - timedelta(days=1))
+
+        self.assertEqual(scheduler.queue_due(start), 0)
+        self.assertEqual(
+            scheduler.queue_due(start + timedelta(minutes=5)),
+            1,
+        )
+
+
+class DeliverTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+        self.backend = RecordingBackend()
+
+    def test_one_reminder_per_user(self):
+        """Test a user's instruments coming due are sent together."""
+        other = create_user('other@example.com')
+        create_instrument(self.user, NOW + timedelta(days=1), tag='a')
+        create_instrument(self.user, NOW + timedelta(days=2), tag='b')
+        create_instrument(other, NOW + timedelta(days=3), tag='c')
+
+        done = scheduler.run_once(NOW, self.backend)
+
+        self.assertEqual(
+            done,
+            {'queued': 3, 'sent': 3, 'skipped': 0, 'failed': 0},
+        )
+        self.assertEqual(sorted(self.backend.sent), [
+            ('other@example.com', ['c']),
+            ('user@example.com', ['a', 'b']),
+        ])
+        self.assertFalse(DueNotification.objects.exclude(
+            state=DueNotification.SENT,
+            sent_at__isnull=False,
+        ).exists())
+        self.assertEqual(scheduler.deliver(self.backend)['sent'], 0)
+
+    def test_checked_and_deleted_instruments_skipped(self):
+        """Test reminders are dropped once they are no longer due."""
+        checked = create_instrument(self.user, NOW + timedelta(days=1))
+        deleted = create_instrument(self.user, NOW + timedelta(days=2))
+        scheduler.queue_due(NOW)
+        checked.last_checked = NOW
+        checked.save()
+        deleted.delete()
+
+        done = scheduler.deliver(self.backend)
+
+        self.assertEqual(done, {'sent': 0, 'skipped': 2, 'failed': 0})
+        self.assertEqual(self.backend.sent, [])
+
+    @override_settings(DUE_SCHEDULER={'MAX_ATTEMPTS': 2})
+    def test_failed_reminders_retried(self):
+        """Test failures are retried after a backoff until MAX_ATTEMPTS."""
+        create_instrument(self.user, NOW + timedelta(days=1))
+        scheduler.queue_due(NOW)
+
+        with self.assertLogs('core.scheduler', 'ERROR'):
+            done = scheduler.deliver(FailingBackend(), NOW)
+
+        self.assertEqual(done['failed'], 1)
+        notification = DueNotification.objects.get()
+        self.assertEqual(notification.state, DueNotification.PENDING)
+        self.assertEqual(notification.attempts, 1)
+        self.assertEqual(
+            notification.next_attempt_at,
+            NOW + timedelta(seconds=60),
+        )
+        self.assertEqual(
+            scheduler.deliver(FailingBackend(), NOW)['failed'],
+            0,
+        )
+
+        with self.assertLogs('core.scheduler', 'ERROR'):
+            scheduler.deliver(FailingBackend(), NOW + timedelta(minutes=2))
+        notification.refresh_from_db()
+        self.assertEqual(notification.state, DueNotification.FAILED)
+        self.assertEqual(
+            scheduler.deliver(self.backend, NOW + timedelta(days=1))['sent'],
+            0,
+        )
+
+    @override_settings(DUE_SCHEDULER={'BATCH_SIZE': 1})
+    def test_failures_do_not_block_later_users(self):
+        """Test a failing user leaves the later users to be delivered."""
+        other = create_user('other@example.com')
+        create_instrument(self.user, NOW + timedelta(days=1))
+        create_instrument(other, NOW + timedelta(days=2), tag='other')
+        scheduler.queue_due(NOW)
+
+        class FailFirstUser(RecordingBackend):
+            def send(self, user, instruments):
+                if user.email == 'user@example.com':
+                    raise ConnectionError('mailbox full')
+                super().send(user, instruments)
+
+        backend = FailFirstUser()
+        with self.assertLogs('core.scheduler', 'ERROR'):
+            done = scheduler.deliver(backend, NOW)
+
+        self.assertEqual(done, {'sent': 1, 'skipped': 0, 'failed': 1})
+        self.assertEqual(backend.sent, [('other@example.com', ['other'])])
+
+    @override_settings(DUE_SCHEDULER={'BATCH_SIZE': 2})
+    def test_batches_claim_whole_users(self):
+        """Test a user whose rows straddle a batch gets one reminder."""
+        other = create_user('other@example.com')
+        for tag in 'abc':
+            create_instrument(self.user, NOW + timedelta(days=1), tag=tag)
+        create_instrument(other, NOW + timedelta(days=2), tag='d')
+        scheduler.queue_due(NOW)
+
+        done = scheduler.deliver(self.backend, NOW)
+
+        self.assertEqual(done, {'sent': 4, 'skipped': 0, 'failed': 0})
+        self.assertEqual(sorted(self.backend.sent), [
+            ('other@example.com', ['d']),
+            ('user@example.com', ['a', 'b', 'c']),
+        ])
+
+
+class BackendTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+        self.instrument = create_instrument(self.user, NOW)
+
+    def test_console_backend(self):
+        """Test the console backend lists the instruments."""
+        stream = io.StringIO()
+
+        ConsoleBackend(stream=stream).send(self.user, [self.instrument])
+
+        self.assertEqual(stream.getvalue(), (
+            'user@example.com: 1 instruments coming due\n'
+            '  10-PT-0001 (PRESSURE TRANSMITTER) due 2024-03-01\n'
+        ))
+
+    def test_command_with_file_backend(self):
+        """Test run_due_scheduler --once appends reminders to a file."""
+        create_instrument(self.user, timezone.now() + timedelta(days=1))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'reminders.jsonl')
+            config = {
+                'BACKEND': 'core.notifications.FileBackend',
+                'OPTIONS': {'path': path},
+            }
+            out = io.StringIO()
+            with override_settings(DUE_SCHEDULER=config):
+                call_command('run_due_scheduler', '--once', stdout=out)
+
+            with open(path) as file:
+                [line] = file.read().splitlines()
+
+        self.assertEqual(
+            out.getvalue(),
+            '1 queued, 1 sent, 0 skipped, 0 failed\n',
+        )
+        reminder = json.loads(line)
+        self.assertEqual(reminder['user'], 'user@example.com')
+        self.assertEqual(
+            [instrument['tag'] for instrument in reminder['instruments']],
+            ['10-PT-0001'],
+        )
+
+
+@skipUnless(
+    connection.features.has_select_for_update_skip_locked,
+    'needs SELECT ... FOR UPDATE SKIP LOCKED',
+)
+class ConcurrentWorkerTests(TransactionTestCase):
+
+    def test_workers_skip_claimed_rows(self):
+        """Test a worker skips the watermark and the batch of another."""
+        user = create_user()
+        create_instrument(user, NOW + timedelta(days=1))
+        scheduler.queue_due(NOW)
+        create_instrument(user, NOW + timedelta(days=2), tag='second')
+        claimed = threading.Event()
+        release = threading.Event()
+
+        def other_worker():
+            with transaction.atomic():
+                SchedulerWatermark.objects.select_for_update().get()
+                list(DueNotification.objects.select_for_update())
+                claimed.set()
+                release.wait(10)
+            connection.close()
+
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        try:
+            claimed.wait(10)
+            done = scheduler.run_once(NOW, RecordingBackend())
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(
+            done,
+            {'queued': 0, 'sent': 0, 'skipped': 0, 'failed': 0},
+        )
+        self.assertEqual(scheduler.queue_due(NOW), 1)
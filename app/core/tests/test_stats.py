@@ -0,0 +1,181 @@
+"""
+Tests for the maintained instrument statistics.
+"""
+import threading
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from core import stats
+from core.models import Instrument, InstrumentStats
+
+
+LAST_CHECKED = timezone.make_aware(datetime(2021, 1, 1))
+
+
+def build_instrument(user, **params):
+    """Return an unsaved sample instrument."""
+    defaults = {
+        'tag': '11-FV-01',
+        'unit': '1100',
+        'description': 'Sample instrument description.',
+        'type': 'CONTROL VALVE',
+        'manufacturer': 'EMERSON',
+        'serial_no': 'serial123',
+        'interval': 30,
+        'last_checked': LAST_CHECKED,
+    }
+    defaults.update(params)
+    return Instrument(user=user, **defaults)
+
+
+class InstrumentStatsTests(TestCase):
+    """Test InstrumentStats follows the instrument writes."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123',
+        )
+
+    def assertStats(self, expected):
+        """Assert the stats table holds ``{type: (count, earliest)}``."""
+        rows = InstrumentStats.objects.filter(user=self.user)
+        self.assertEqual(
+            {row.type: (row.count, row.earliest_next_check) for row in rows},
+            expected,
+        )
+
+    def test_save_and_delete(self):
+        """Test saving and deleting instruments refreshes their buckets."""
+        with self.captureOnCommitCallbacks(execute=True):
+            first = build_instrument(self.user, interval=30)
+            first.save()
+            build_instrument(self.user, interval=10).save()
+        self.assertStats({
+            'CONTROL VALVE': (2, LAST_CHECKED + timedelta(days=10)),
+        })
+
+        first = Instrument.objects.get(pk=first.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.type = 'ANALYZER'
+            first.save()
+        self.assertStats({
+            'CONTROL VALVE': (1, LAST_CHECKED + timedelta(days=10)),
+            'ANALYZER': (1, LAST_CHECKED + timedelta(days=30)),
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertStats({
+            'CONTROL VALVE': (1, LAST_CHECKED + timedelta(days=10)),
+        })
+
+    def test_refresh_once_per_transaction(self):
+        """Test a bucket marked many times is refreshed once on commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(5):
+                build_instrument(self.user, interval=i + 1).save()
+            with self.assertNumQueries(0):
+                stats.mark_stale({(self.user.pk, 'CONTROL VALVE')})
+
+        self.assertStats({
+            'CONTROL VALVE': (5, LAST_CHECKED + timedelta(days=1)),
+        })
+
+    def test_bulk_writes(self):
+        """Test bulk_create, bulk_update, update and delete refresh stats."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Instrument.objects.bulk_create(
+                build_instrument(self.user, interval=i + 1) for i in range(3)
+            )
+        self.assertStats({
+            'CONTROL VALVE': (3, LAST_CHECKED + timedelta(days=1)),
+        })
+
+        instruments = list(Instrument.objects.order_by('interval'))
+        instruments[0].type = 'ANALYZER'
+        with self.captureOnCommitCallbacks(execute=True):
+            Instrument.objects.bulk_update(instruments[:1], ['type'])
+        self.assertStats({
+            'CONTROL VALVE': (2, LAST_CHECKED + timedelta(days=2)),
+            'ANALYZER': (1, LAST_CHECKED + timedelta(days=1)),
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Instrument.objects.filter(type='CONTROL VALVE').update(
+                interval=100,
+            )
+        self.assertStats({
+            'CONTROL VALVE': (2, LAST_CHECKED + timedelta(days=100)),
+            'ANALYZER': (1, LAST_CHECKED + timedelta(days=1)),
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Instrument.objects.filter(type='ANALYZER').update(
+                type='CONTROL VALVE',
+            )
+        self.assertStats({
+            'CONTROL VALVE': (3, LAST_CHECKED + timedelta(days=1)),
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Instrument.objects.all().delete()
+        self.assertStats({})
+
+    def test_rebuild_command(self):
+        """Test rebuild_instrument_stats recomputes the table."""
+        Instrument.objects.bulk_create([
+            build_instrument(self.user, interval=5),
+            build_instrument(self.user, type='ANALYZER'),
+        ])
+        InstrumentStats.objects.create(
+            user=self.user,
+            type='STALE',
+            count=1,
+            earliest_next_check=LAST_CHECKED,
+        )
+
+        call_command('rebuild_instrument_stats', stdout=StringIO())
+
+        self.assertStats({
+            'CONTROL VALVE': (1, LAST_CHECKED + timedelta(days=5)),
+            'ANALYZER': (1, LAST_CHECKED + timedelta(days=30)),
+        })
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+class ConcurrentRefreshTests(TransactionTestCase):
+    """Test refreshes of one bucket are serialized."""
+
+    def test_refresh_waits_for_bucket_lock(self):
+        """Test a refresh reads the bucket after a concurrent one commits."""
+        user = get_user_model().objects.create_user('test@example.com')
+        bucket = (user.pk, 'CONTROL VALVE')
+
+        def refresh():
+            try:
+                stats.refresh({bucket})
+            finally:
+                connections.close_all()
+
+        with transaction.atomic():
+            stats._lock_buckets(connection, {bucket})
+            build_instrument(user, interval=10).save()
+            thread = threading.Thread(target=refresh)
+            thread.start()
+            thread.join(timeout=0.5)
+            self.assertTrue(thread.is_alive())
+        thread.join()
+
+        row = InstrumentStats.objects.get(user=user)
+        self.assertEqual(
+            (row.count, row.earliest_next_check),
+            (1, LAST_CHECKED + timedelta(days=10)),
+        )
@@ -0,0 +1,56 @@
+"""
+Views for the core app.
+"""
+from django.conf import settings
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions, renderers
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import profiling
+from instrument import cache as list_cache
+from user import hashers
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+    """Render lines of the Prometheus text exposition format."""
+
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = [str(value) for value in data.values()]
+        return '\n'.join([*data, '']).encode(self.charset)
+
+
+class IsStaffOrInternalIP(permissions.BasePermission):
+    """Allow staff users and requests from ``INTERNAL_IPS``."""
+
+    def has_permission(self, request, view):
+        return request.user.is_staff \
+            or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+
+
+@extend_schema(exclude=True)
+class MetricsView(APIView):
+    """Metrics of this process for Prometheus to scrape."""
+
+    permission_classes = [IsStaffOrInternalIP]
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request):
+        return Response([
+            *profiling.render_histograms(),
+            *profiling.render_counters(
+                'instrument_list_cache_events_total',
+                'Instrument list page cache hits, misses and invalidations.',
+                list_cache.stats(),
+            ),
+            *profiling.render_counters(
+                'password_hashing_events_total',
+                'Password hash computations admitted and rejected.',
+                hashers.stats(),
+            ),
+        ])
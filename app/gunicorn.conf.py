@@ -0,0 +1,56 @@
+"""
+Gunicorn configuration for the production server.
+
+Run ``gunicorn`` from this directory. Sizing follows the CPU count unless
+overridden by the environment:
+
+- WSGI (default): ``gthread`` workers, (2 x CPUs) + 1 processes with
+  GUNICORN_THREADS threads each.
+- ASGI (GUNICORN_ASGI=1): one uvicorn worker per CPU serving
+  ``app.asgi``, each with its own ASYNC_DB_POOL connections.
+
+Every WSGI thread keeps its own database connection for CONN_MAX_AGE
+seconds, so workers x threads must stay below the server's
+max_connections, or connections go through PgBouncer (DB_PGBOUNCER=1).
+"""
+import multiprocessing
+import os
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+cpus = multiprocessing.cpu_count()
+asgi = bool(env_int('GUNICORN_ASGI', 0))
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+if asgi:
+    wsgi_app = 'app.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    workers = env_int('GUNICORN_WORKERS', cpus)
+else:
+    wsgi_app = 'app.wsgi:application'
+    worker_class = 'gthread'
+    workers = env_int('GUNICORN_WORKERS', 2 * cpus + 1)
+    threads = env_int('GUNICORN_THREADS', 4)
+
+# Open client connections per worker. gthread workers stop accepting when
+# they reach it, idle keep-alive connections included.
+worker_connections = env_int('GUNICORN_WORKER_CONNECTIONS', 2000)
+keepalive = env_int('GUNICORN_KEEPALIVE', 5)
+timeout = env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+
+# Recycle workers now and then to bound memory growth, staggered so they
+# do not restart together.
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# The heartbeat file lives in memory, a slow disk would get workers killed.
+worker_tmp_dir = '/dev/shm'
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
@@ -0,0 +1,468 @@
+"""
+Drift and calibration interval analytics over instruments and their checks.
+
+Instruments and their calibration events are read with ``values_list``
+straight from the database cursor, no model or datetime is instantiated,
+in chunks of ``CHUNK_SIZE`` instruments walked by id. Each chunk becomes
+two DataFrames with categorical ``type`` and ``manufacturer`` columns and
+is reduced with vectorized operations to a partial aggregate: sums per
+type and manufacturer, so the partials of any split of the instruments
+merge by adding them up. Ratios and interval recommendations are only
+derived from the merged sums.
+
+Memory is bounded by the chunk rather than by the fleet: about 0.4 KiB
+per instrument plus 0.3 KiB per event of a chunk. The default chunk of
+100 000 instruments peaks at about 40 MiB without history and 360 MiB
+with ten checks each, lower ``chunk_size`` for long histories. One
+million instruments with one million events take about 5 seconds on
+PostgreSQL, half of it reading rows.
+
+``analyze_parallel`` splits larger fleets by id range over processes.
+Each worker streams its shards from server-side cursors and returns their
+partial aggregates, see the ``--workers`` option of instrument_analytics
+and bench_analytics to measure the scaling.
+
+Intervals are recommended from the failure rate of the checks of a group,
+in the spirit of the simple response method of ILAC-G24: groups failing
+more than ``SHORTEN_ABOVE`` of their checks get shorter intervals, groups
+failing at most ``EXTEND_BELOW`` longer ones. Groups with fewer than
+``MIN_EVENTS`` checks get no recommendation.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, transaction
+from django.db.models import FloatField, Max, Min
+from django.db.models.functions import Cast
+from django.db.transaction import TransactionManagementError
+from django.utils import timezone
+
+from core.expressions import EpochSeconds
+from core.models import CalibrationEvent, Instrument
+
+
+CHUNK_SIZE = 100000
+# Shards of the id range per worker process of analyze_parallel().
+SHARDS_PER_WORKER = 4
+GROUP_FIELDS = ['type', 'manufacturer']
+INSTRUMENT_DTYPES = {
+    'id': 'int64',
+    'type': 'category',
+    'manufacturer': 'category',
+    'interval': 'int32',
+    'next_check_epoch': 'float64',
+}
+EVENT_DTYPES = {
+    'instrument_id': 'int64',
+    'checked_at_epoch': 'float64',
+    'result': 'category',
+    'found': 'float64',
+    'left': 'float64',
+}
+# Columns of a partial aggregate, merged by summing them.
+SUM_COLUMNS = [
+    'instruments',
+    'overdue',
+    'interval_days',
+    'events',
+    'failed',
+    'checks',
+    'on_time',
+    'drift_sum',
+    'drift_count',
+    'drift_rate_sum',
+    'drift_rate_count',
+]
+COUNT_COLUMNS = [
+    name for name in SUM_COLUMNS
+    if name not in ('interval_days', 'drift_sum', 'drift_rate_sum')
+]
+RESULT_COLUMNS = [
+    'instruments',
+    'overdue',
+    'overdue_ratio',
+    'mean_interval_days',
+    'events',
+    'fail_rate',
+    'interval_compliance',
+    'mean_drift',
+    'drift_per_year',
+    'adjustment',
+    'recommended_interval_days',
+]
+MIN_EVENTS = 20
+SHORTEN_ABOVE = 0.1
+EXTEND_BELOW = 0.02
+SHORTEN_FACTOR = 0.75
+EXTEND_FACTOR = 1.25
+SECONDS_PER_DAY = 86400
+
+
+def empty_partial():
+    """Return a partial aggregate without any group."""
+    index = pd.MultiIndex.from_arrays([[], []], names=GROUP_FIELDS)
+    return pd.DataFrame(0, index=index, columns=SUM_COLUMNS)
+
+
+def select_columns(query):
+    """Return the column names of ``query`` in the order of its SELECT.
+
+    ``values_list()`` puts annotations after fields in the SQL and only
+    restores the requested order in Python.
+    """
+    return [
+        *query.extra_select,
+        *query.values_select,
+        *query.annotation_select,
+    ]
+
+
+def to_frame(rows, columns, dtypes):
+    """Return raw database ``rows`` as a DataFrame of ``dtypes``."""
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    return frame.astype(dtypes)[list(dtypes)]
+
+
+def read_frame(queryset, dtypes):
+    """Return the rows of a values ``queryset`` as a DataFrame of ``dtypes``.
+
+    Rows are read as the database driver returns them, skipping the per
+    row converters of the ORM, and pandas converts whole columns instead.
+    """
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        rows = []
+    else:
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+    return to_frame(rows, select_columns(queryset.query), dtypes)
+
+
+def stream_frames(queryset, dtypes, size):
+    """Yield DataFrames of up to ``size`` rows of a values ``queryset``.
+
+    Rows are streamed from a server-side cursor on PostgreSQL, unless the
+    database sets DISABLE_SERVER_SIDE_CURSORS, e.g. behind a transaction
+    pooler. Call it in a transaction, or the cursor is WITH HOLD and the
+    server copies the whole result before the first row is sent.
+    """
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return
+    connection = connections[queryset.db]
+    if connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        cursor = connection.cursor()
+    else:
+        cursor = connection.chunked_cursor()
+    columns = select_columns(queryset.query)
+    with cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(size)
+            if not rows:
+                return
+            yield to_frame(rows, columns, dtypes)
+
+
+def empty_events():
+    """Return an events DataFrame without rows."""
+    return pd.DataFrame(columns=list(EVENT_DTYPES)).astype(EVENT_DTYPES)
+
+
+def instrument_values(instruments):
+    """Return ``instruments`` as ``INSTRUMENT_DTYPES`` values by id."""
+    return instruments.order_by('id').annotate(
+        next_check_epoch=EpochSeconds('next_check'),
+    ).values_list(*INSTRUMENT_DTYPES)
+
+
+def event_values(events):
+    """Return ``events`` as unordered ``EVENT_DTYPES`` values."""
+    return events.order_by().annotate(
+        checked_at_epoch=EpochSeconds('checked_at'),
+        found=Cast('as_found', FloatField()),
+        left=Cast('as_left', FloatField()),
+    ).values_list(*EVENT_DTYPES)
+
+
+def iter_chunks(instruments, events=None, chunk_size=CHUNK_SIZE):
+    """Yield the instruments and events DataFrames of each chunk.
+
+    ``instruments`` is walked in ``id`` order, ``events`` is limited to the
+    id range of each chunk, events of instruments outside ``instruments``
+    are dropped when they are joined. Times are read as seconds since the
+    epoch, which saves building a datetime per value.
+    """
+    instruments = instrument_values(instruments)
+    if events is not None:
+        events = event_values(events)
+
+    last_id = None
+    while True:
+        chunk = instruments if last_id is None \
+            else instruments.filter(id__gt=last_id)
+        frame = read_frame(chunk[:chunk_size], INSTRUMENT_DTYPES)
+        if frame.empty:
+            return
+        first_id, last_id = frame['id'].iloc[0], frame['id'].iloc[-1]
+        if events is None:
+            event_frame = empty_events()
+        else:
+            event_frame = read_frame(events.filter(
+                instrument_id__gte=first_id,
+                instrument_id__lte=last_id,
+            ), EVENT_DTYPES)
+        yield frame, event_frame
+        if len(frame) < chunk_size:
+            return
+
+
+def stream_chunks(instruments, events=None, chunk_size=CHUNK_SIZE):
+    """Yield the same chunks as ``iter_chunks`` from two cursors.
+
+    Instruments and events are both streamed in instrument id order and
+    merged as they arrive, one query each instead of two per chunk.
+    """
+    instrument_frames = stream_frames(
+        instrument_values(instruments),
+        INSTRUMENT_DTYPES,
+        chunk_size,
+    )
+    event_frames = iter(()) if events is None else stream_frames(
+        event_values(events).order_by('instrument_id'),
+        EVENT_DTYPES,
+        chunk_size,
+    )
+
+    pending = empty_events()
+    for frame in instrument_frames:
+        last_id = frame['id'].iloc[-1]
+        parts = [pending]
+        # Read events until one is past the last instrument of the chunk.
+        while parts[-1].empty or parts[-1]['instrument_id'].iloc[-1] \
+                <= last_id:
+            batch = next(event_frames, None)
+            if batch is None:
+                break
+            parts.append(batch)
+        event_frame = pd.concat(parts, ignore_index=True)
+        in_chunk = event_frame['instrument_id'] <= last_id
+        yield frame, event_frame[in_chunk]
+        pending = event_frame[~in_chunk]
+
+
+def partial_aggregate(instruments, events, now):
+    """Return the sums per type and manufacturer of one chunk."""
+    if instruments.empty:
+        return empty_partial()
+
+    groups = instruments.assign(
+        instruments=1,
+        overdue=instruments['next_check_epoch'] < now.timestamp(),
+    ).groupby(GROUP_FIELDS, observed=True).agg(
+        instruments=('instruments', 'sum'),
+        overdue=('overdue', 'sum'),
+        interval_days=('interval', 'sum'),
+    )
+
+    events = events.merge(
+        instruments[['id', *GROUP_FIELDS, 'interval']],
+        left_on='instrument_id',
+        right_on='id',
+    ).sort_values(['instrument_id', 'checked_at_epoch'], kind='stable')
+    # Pairs of consecutive checks of the same instrument.
+    follows = events['instrument_id'].eq(events['instrument_id'].shift())
+    gap_days = events['checked_at_epoch'].diff().where(
+        follows,
+    ) / SECONDS_PER_DAY
+    drift = (events['found'] - events['left']).abs()
+    # Change from the value left at the previous check to the value found.
+    drift_rate = (
+        (events['found'] - events['left'].shift()).abs() / gap_days * 365
+    ).where(follows & (gap_days > 0))
+    checks = events[GROUP_FIELDS].assign(
+        events=1,
+        failed=events['result'] == CalibrationEvent.FAIL,
+        checks=follows,
+        on_time=follows & (gap_days <= events['interval']),
+        drift_sum=drift,
+        drift_count=drift.notna(),
+        drift_rate_sum=drift_rate,
+        drift_rate_count=drift_rate.notna(),
+    ).groupby(GROUP_FIELDS, observed=True).sum()
+
+    partial = groups.join(checks, how='left')
+    partial.index = partial.index.set_levels(
+        [level.astype(object) for level in partial.index.levels],
+    )
+    return partial.reindex(columns=SUM_COLUMNS).fillna(0)
+
+
+def merge(partials):
+    """Return the sum of ``partials`` per type and manufacturer."""
+    partials = [partial for partial in partials if not partial.empty]
+    if not partials:
+        return empty_partial()
+    return pd.concat(partials).groupby(level=GROUP_FIELDS).sum()
+
+
+def ratio(numerator, denominator):
+    """Divide, with NaN where ``denominator`` is 0."""
+    return numerator / denominator.where(denominator > 0)
+
+
+def finalize(sums):
+    """Return the ratios and recommendations of the merged ``sums``."""
+    sums = sums.astype({name: 'int64' for name in COUNT_COLUMNS})
+    mean_interval = ratio(sums['interval_days'], sums['instruments'])
+    fail_rate = ratio(sums['failed'], sums['events'])
+    enough = sums['events'] >= MIN_EVENTS
+    shorten = enough & (fail_rate > SHORTEN_ABOVE)
+    extend = enough & (fail_rate <= EXTEND_BELOW)
+    factor = np.select([shorten, extend], [SHORTEN_FACTOR, EXTEND_FACTOR], 1)
+    return sums.assign(
+        overdue_ratio=ratio(sums['overdue'], sums['instruments']),
+        mean_interval_days=mean_interval,
+        fail_rate=fail_rate,
+        interval_compliance=ratio(sums['on_time'], sums['checks']),
+        mean_drift=ratio(sums['drift_sum'], sums['drift_count']),
+        drift_per_year=ratio(sums['drift_rate_sum'], sums['drift_rate_count']),
+        adjustment=np.select(
+            [shorten, extend, enough],
+            ['shorten', 'extend', 'keep'],
+            None,
+        ),
+        recommended_interval_days=(mean_interval * factor).round().where(
+            enough,
+        ),
+    )[RESULT_COLUMNS]
+
+
+def records(frame):
+    """Return the rows of ``frame`` as dicts, NaN as None."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict('records')
+
+
+def report(sums, now):
+    """Return the analytics response of the merged ``sums``."""
+    totals = finalize(sums.sum().to_frame().T)
+    results = finalize(sums).reset_index()
+    return {
+        'generated_at': now,
+        'totals': records(totals.drop(columns=[
+            'adjustment',
+            'recommended_interval_days',
+        ]))[0],
+        'results': records(results),
+    }
+
+
+def analyze(instruments, events=None, now=None, chunk_size=CHUNK_SIZE):
+    """Return the analytics of the ``instruments`` queryset.
+
+    ``events`` is the queryset of calibration events to read the history
+    from, the history is left out when it is None.
+    """
+    now = now or timezone.now()
+    partials = (
+        partial_aggregate(instrument_rows, event_rows, now)
+        for instrument_rows, event_rows in iter_chunks(
+            instruments, events, chunk_size,
+        )
+    )
+    return report(merge(partials), now)
+
+
+def shard_bounds(instruments, shards):
+    """Split the ids of ``instruments`` into ``shards`` ranges.
+
+    Ranges are ``(low, high)`` pairs of ids, ``high`` excluded, of equal
+    width rather than equal counts.
+    """
+    bounds = instruments.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return []
+    low, high = bounds['low'], bounds['high'] + 1
+    step = -(-(high - low) // shards)
+    return [
+        (start, min(start + step, high)) for start in range(low, high, step)
+    ]
+
+
+def analyze_shard(instruments_query, events_query, low, high, now,
+                  chunk_size=CHUNK_SIZE):
+    """Return the partial aggregate of the ids from ``low`` to ``high``.
+
+    Takes the queries of the instruments and events querysets, which
+    unlike querysets are pickled without being evaluated.
+    """
+    instruments = Instrument.objects.all()
+    instruments.query = instruments_query
+    instruments = instruments.filter(id__gte=low, id__lt=high)
+    events = None
+    if events_query is not None:
+        events = CalibrationEvent.objects.all()
+        events.query = events_query
+        events = events.filter(instrument_id__gte=low, instrument_id__lt=high)
+
+    # One snapshot for both cursors, which stream without WITH HOLD.
+    with transaction.atomic(using=instruments.db):
+        return merge(
+            partial_aggregate(instrument_rows, event_rows, now)
+            for instrument_rows, event_rows in stream_chunks(
+                instruments, events, chunk_size,
+            )
+        )
+
+
+def _analyze_shard_in_worker(*args):
+    try:
+        return analyze_shard(*args)
+    finally:
+        connections.close_all()
+
+
+def analyze_parallel(instruments, events=None, workers=None, now=None,
+                     chunk_size=CHUNK_SIZE):
+    """Return ``analyze()`` of the querysets computed by ``workers``.
+
+    The id range is split into ``SHARDS_PER_WORKER`` shards per worker
+    process, so one dense shard does not hold up the others, and the
+    partial aggregates of the shards are merged here. Workers are forked,
+    they inherit the configured Django and its database settings. The
+    connections of this process are closed first so that none is shared
+    with a worker, and as workers read in their own transactions it
+    cannot run in an atomic block.
+    """
+    now = now or timezone.now()
+    workers = workers or os.cpu_count()
+    if connections[instruments.db].in_atomic_block:
+        raise TransactionManagementError(
+            'Parallel analytics cannot run in an atomic block.'
+        )
+
+    shards = shard_bounds(instruments, workers * SHARDS_PER_WORKER)
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context('fork'),
+    ) as pool:
+        partials = pool.map(
+            _analyze_shard_in_worker,
+            repeat(instruments.query),
+            repeat(None if events is None else events.query),
+            [low for low, _ in shards],
+            [high for _, high in shards],
+            repeat(now),
+            repeat(chunk_size),
+        )
+        return report(merge(partials), now)
@@ -0,0 +1,27 @@
+"""
+URL mappings for the async instrument views.
+"""
+from django.urls import path
+
+from instrument import async_views
+
+
+app_name = 'instrument-async'
+
+urlpatterns = [
+    path(
+        'instruments/',
+        async_views.instrument_list,
+        name='instrument-list',
+    ),
+    path(
+        'instruments/summary/',
+        async_views.instrument_summary,
+        name='instrument-summary',
+    ),
+    path(
+        'instruments/<int:pk>/',
+        async_views.instrument_detail,
+        name='instrument-detail',
+    ),
+]
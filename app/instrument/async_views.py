@@ -0,0 +1,167 @@
+"""
+Async read-only views for instruments APIs
+
+They serve the same list, detail and summary responses as
+``InstrumentViewSet`` when the project runs under an ASGI server. The
+viewset still builds the querysets, filters, sparse fields and pages, but
+the rows are fetched with ``core.asyncdb`` so a request waiting on the
+database or on a slow client holds no thread. Responses are JSON only.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import get_authorization_header
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from core import asyncdb, routers
+from instrument import cache as list_cache
+from instrument.conditional import make_etag, not_modified, set_validators
+from instrument.summary import due_counts, summarize
+from instrument.views import InstrumentViewSet
+from user.authentication import CachedTokenAuthentication
+
+
+renderer = JSONRenderer()
+
+
+def render(data, status=200):
+    """Return a JSON response of ``data``."""
+    return HttpResponse(
+        renderer.render(data),
+        status=status,
+        content_type=renderer.media_type,
+    )
+
+
+async def authenticate(request):
+    """Return the user of the request's token.
+
+    Tokens in the in-process cache are checked on the event loop, only a
+    miss goes to a thread as it may read the database.
+    """
+    authentication = CachedTokenAuthentication()
+    auth = get_authorization_header(request).split()
+    if len(auth) == 2 and auth[0].lower() == b'token':
+        try:
+            cached = authentication.get_cached_credentials(auth[1].decode())
+        except UnicodeError:
+            cached = None
+        if cached is not None and cached[0].is_active:
+            return cached[0]
+
+    result = await sync_to_async(authentication.authenticate)(request)
+    if result is None:
+        raise exceptions.NotAuthenticated()
+    return result[0]
+
+
+def get_view(request, user, action, kwargs):
+    """Return an ``InstrumentViewSet`` set up as for a DRF request."""
+    drf_request = Request(request, authenticators=())
+    drf_request.user = user
+    drf_request.accepted_media_type = renderer.media_type
+    view = InstrumentViewSet(
+        request=drf_request,
+        action=action,
+        args=(),
+        kwargs=kwargs,
+        format_kwarg=None,
+        headers={},
+    )
+    return view
+
+
+def instrument_view(action):
+    """Turn ``handler(view, **kwargs)`` into an authenticated async view."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return render(
+                    {'detail': f'Method "{request.method}" not allowed.'},
+                    status=405,
+                )
+            try:
+                user = await authenticate(request)
+                with routers.routing():
+                    await sync_to_async(routers.read_from_replica)(user.pk)
+                    view = get_view(request, user, action, kwargs)
+                    return await handler(view, **kwargs)
+            except exceptions.APIException as exc:
+                detail = exc.detail
+                if not isinstance(detail, (list, dict)):
+                    detail = {'detail': detail}
+                response = render(detail, status=exc.status_code)
+                if exc.status_code == 401:
+                    response['WWW-Authenticate'] = 'Token'
+                return response
+
+        return wrapper
+    return decorator
+
+
+def get_cached_page(user_id, etag):
+    """Return the page cache key and the cached page or None."""
+    key = list_cache.page_key(user_id, etag)
+    return key, list_cache.get_page(key)
+
+
+@instrument_view('list')
+async def instrument_list(view):
+    """List instruments like ``InstrumentViewSet.list``."""
+    request = view.request
+    user_id = request.user.pk
+    etag, modified = view.get_list_validators(
+        await asyncdb.fetch(view.get_list_state_queryset()),
+    )
+    response = not_modified(request, etag)
+    if response is not None:
+        return set_validators(response, etag, modified)
+
+    key, page = await sync_to_async(get_cached_page)(user_id, etag)
+    if page is not None:
+        content, content_type = page
+        response = HttpResponse(content, content_type=content_type)
+        return set_validators(response, etag, modified)
+
+    paginator = view.paginator
+    queryset = view.filter_queryset(view.get_queryset())
+    rows = await asyncdb.fetch(
+        paginator.get_page_queryset(queryset, request, view),
+    )
+    serializer = view.get_serializer(paginator.paginate_rows(rows), many=True)
+    response = render(paginator.get_paginated_response(serializer.data).data)
+    await sync_to_async(list_cache.set_page)(key, response)
+    return set_validators(response, etag, modified)
+
+
+@instrument_view('retrieve')
+async def instrument_detail(view, pk):
+    """Retrieve an instrument like ``InstrumentViewSet.retrieve``."""
+    fields = view.get_sparse_fields() or \
+        view.get_serializer_class().Meta.fields
+    rows = await asyncdb.fetch(
+        view.get_queryset().filter(pk=pk).values(*fields, 'updated_at'),
+    )
+    if not rows:
+        raise exceptions.NotFound()
+
+    modified = rows[0]['updated_at']
+    etag = make_etag(view.request, pk, modified)
+    response = not_modified(view.request, etag, modified)
+    if response is None:
+        response = render(view.get_serializer(rows[0]).data)
+    return set_validators(response, etag, modified)
+
+
+@instrument_view('summary')
+async def instrument_summary(view):
+    """Return the due summary like ``InstrumentViewSet.summary``."""
+    now = timezone.now()
+    queryset = view.filter_queryset(view.get_queryset())
+    groups = await asyncdb.fetch(due_counts(queryset, now))
+    return render(summarize(groups, now))
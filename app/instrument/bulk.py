@@ -0,0 +1,214 @@
+"""
+Bulk write operations for instruments APIs
+"""
+from django.db import DatabaseError, transaction
+from rest_framework import serializers
+
+from core.expressions import next_check_for
+from core.models import CalibrationEvent, Instrument
+from instrument.serializers import NEXT_CHECK_OUT_OF_RANGE
+
+
+CHUNK_SIZE = 1000
+MAX_ROWS = 20000
+
+
+def chunked(items, size=CHUNK_SIZE):
+    """Yield successive ``size`` long slices of ``items``."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def is_id(value):
+    """Return whether ``value`` is an integer id, JSON ``true`` is not."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate_rows(serializer):
+    """Validate each row of a ``many=True`` serializer independently.
+
+    ``ListSerializer.is_valid`` discards every row as soon as one fails, so
+    run the child validation per row and return ``(valid, errors)`` where
+    ``valid`` is a list of ``(index, validated_data)``.
+    """
+    valid, errors = [], []
+    for index, row in enumerate(serializer.initial_data):
+        try:
+            valid.append((index, serializer.child.run_validation(row)))
+        except serializers.ValidationError as exc:
+            errors.append({'index': index, 'errors': exc.detail})
+
+    return valid, errors
+
+
+def _write_chunks(rows, write):
+    """Apply ``write`` to each chunk of ``rows`` in its own transaction.
+
+    A database error only fails the rows of the chunk it happened in.
+    """
+    done, errors = [], []
+    for chunk in chunked(rows):
+        try:
+            with transaction.atomic():
+                done += write(chunk)
+        except DatabaseError as exc:
+            errors += [
+                {'index': index, 'errors': {'non_field_errors': [str(exc)]}}
+                for index, _ in chunk
+            ]
+
+    return done, errors
+
+
+def bulk_create(user, serializer):
+    """Create the valid rows of ``serializer`` for ``user``."""
+    valid, errors = validate_rows(serializer)
+
+    def write(chunk):
+        objs = Instrument.objects.bulk_create(
+            Instrument(user=user, **data) for _, data in chunk
+        )
+        return [obj.pk for obj in objs]
+
+    ids, write_errors = _write_chunks(valid, write)
+    return {
+        'succeeded': len(ids),
+        # Only backends that support INSERT ... RETURNING report new ids.
+        'ids': [pk for pk in ids if pk is not None],
+        'errors': sorted(errors + write_errors, key=lambda e: e['index']),
+    }
+
+
+def bulk_update(user, serializer):
+    """Apply the partial updates of ``serializer`` to ``user``'s rows."""
+    rows = serializer.initial_data
+    ids = [row.get('id') for row in rows if isinstance(row, dict)]
+    instances = Instrument.objects.filter(user=user).in_bulk(
+        [pk for pk in ids if is_id(pk)]
+    )
+
+    valid, errors = validate_rows(serializer)
+    changes = []
+    for index, data in valid:
+        pk = rows[index].get('id')
+        instance = instances.get(pk) if is_id(pk) else None
+        if instance is None:
+            errors.append({'index': index, 'errors': {'id': ['Not found.']}})
+            continue
+        # The rows are validated without their instance, so the due date
+        # is only checked against the stored fields here.
+        try:
+            next_check_for(
+                data.get('last_checked', instance.last_checked),
+                data.get('interval', instance.interval),
+            )
+        except OverflowError:
+            errors.append({
+                'index': index,
+                'errors': {'last_checked': [NEXT_CHECK_OUT_OF_RANGE]},
+            })
+            continue
+        for attr, value in data.items():
+            setattr(instance, attr, value)
+        changes.append((index, (instance, list(data))))
+
+    def write(chunk):
+        fields = sorted({field for _, (_, names) in chunk for field in names})
+        objs = [instance for _, (instance, _) in chunk]
+        if fields:
+            Instrument.objects.bulk_update(objs, fields)
+        return [obj.pk for obj in objs]
+
+    ids, write_errors = _write_chunks(changes, write)
+    return {
+        'succeeded': len(ids),
+        'ids': ids,
+        'errors': sorted(errors + write_errors, key=lambda e: e['index']),
+    }
+
+
+def bulk_delete(user, ids):
+    """Delete ``user``'s instruments listed in ``ids``."""
+    errors = [
+        {'index': index, 'errors': {'id': ['A valid integer is required.']}}
+        for index, pk in enumerate(ids) if not is_id(pk)
+    ]
+    wanted = [(index, pk) for index, pk in enumerate(ids) if is_id(pk)]
+    existing = set(
+        Instrument.objects.filter(
+            user=user,
+            id__in=[pk for _, pk in wanted],
+        ).values_list('id', flat=True)
+    )
+    errors += [
+        {'index': index, 'errors': {'id': ['Not found.']}}
+        for index, pk in wanted if pk not in existing
+    ]
+    valid = [(index, pk) for index, pk in wanted if pk in existing]
+
+    def write(chunk):
+        pks = [pk for _, pk in chunk]
+        Instrument.objects.filter(user=user, id__in=pks).delete()
+        return pks
+
+    deleted, write_errors = _write_chunks(valid, write)
+    return {
+        'succeeded': len(deleted),
+        'ids': deleted,
+        'errors': sorted(errors + write_errors, key=lambda e: e['index']),
+    }
+
+
+def record_checks(user, serializer):
+    """Append the valid calibration events of ``serializer`` for ``user``.
+
+    Each chunk moves ``last_checked`` of its instruments forward to their
+    newest event in the transaction that inserts the events, older events
+    leave it as it is.
+    """
+    valid, errors = validate_rows(serializer)
+    owned = set(
+        Instrument.objects.filter(
+            user=user,
+            id__in={data['instrument_id'] for _, data in valid},
+        ).values_list('id', flat=True)
+    )
+    errors += [
+        {'index': index, 'errors': {'instrument': ['Not found.']}}
+        for index, data in valid if data['instrument_id'] not in owned
+    ]
+    valid = [
+        (index, data) for index, data in valid
+        if data['instrument_id'] in owned
+    ]
+
+    def write(chunk):
+        newest = {}
+        for _, data in chunk:
+            pk = data['instrument_id']
+            newest[pk] = max(newest.get(pk, data['checked_at']),
+                             data['checked_at'])
+        # Locked in id order so concurrent batches cannot deadlock.
+        instruments = Instrument.objects.select_for_update().filter(
+            user=user,
+            id__in=newest,
+        ).order_by('id')
+        changed = []
+        for instrument in instruments:
+            if instrument.last_checked < newest[instrument.id]:
+                instrument.last_checked = newest[instrument.id]
+                changed.append(instrument)
+        if changed:
+            Instrument.objects.bulk_update(changed, ['last_checked'])
+
+        objs = CalibrationEvent.objects.bulk_create(
+            CalibrationEvent(user=user, **data) for _, data in chunk
+        )
+        return [obj.pk for obj in objs]
+
+    ids, write_errors = _write_chunks(valid, write)
+    return {
+        'succeeded': len(ids),
+        'ids': [pk for pk in ids if pk is not None],
+        'errors': sorted(errors + write_errors, key=lambda e: e['index']),
+    }
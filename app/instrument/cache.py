@@ -0,0 +1,108 @@
+"""
+Server side cache of rendered instrument list pages
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def get_config():
+    """Return the INSTRUMENT_LIST_CACHE settings merged with the defaults."""
+    return {**DEFAULTS, **getattr(settings, 'INSTRUMENT_LIST_CACHE', {})}
+
+
+def get_cache():
+    """Return the Django cache storing list pages."""
+    return caches[get_config()['ALIAS']]
+
+
+def count(name):
+    """Increment the ``name`` counter."""
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def stats():
+    """Return the hit, miss and invalidation counters of this process."""
+    with _counters_lock:
+        return {
+            name: _counters[name]
+            for name in ('hits', 'misses', 'invalidations')
+        }
+
+
+def reset_stats():
+    """Reset the counters of this process."""
+    with _counters_lock:
+        _counters.clear()
+
+
+def _generation_key(user_id):
+    return f'instrument-list-generation:{user_id}'
+
+
+def get_generation(user_id):
+    """Return the current list generation of ``user_id``.
+
+    A missing counter is seeded from the clock rather than 0 so pages
+    written before it was evicted can never be matched again.
+    """
+    cache = get_cache()
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate(user_id):
+    """Make every cached list page of ``user_id`` stale."""
+    cache = get_cache()
+    key = _generation_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+    count('invalidations')
+
+
+def page_key(user_id, etag):
+    """Return the cache key of a list page.
+
+    ``etag`` identifies the query, the media type and the state of the
+    user's rows. The generation is bumped by every write path on top of
+    that, so a write never has to rely on the aggregate alone.
+    """
+    generation = get_generation(user_id)
+    digest = etag.strip('"')
+    return f'instrument-list:{user_id}:{generation}:{digest}'
+
+
+def get_page(key):
+    """Return ``(content, content_type)`` of a cached page or None."""
+    page = get_cache().get(key)
+    count('hits' if page is not None else 'misses')
+    return page
+
+
+def set_page(key, response):
+    """Store a rendered successful list ``response``."""
+    if response.status_code == 200:
+        get_cache().set(
+            key,
+            (response.content, response['Content-Type']),
+            get_config()['TIMEOUT'],
+        )
@@ -0,0 +1,52 @@
+"""
+Conditional GET support for instruments APIs
+"""
+import hashlib
+
+from django.utils.cache import (
+    get_conditional_response,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+
+# Bump when the representation changes so clients do not keep old bodies.
+REPRESENTATION_VERSION = '1'
+
+
+def make_etag(request, *parts):
+    """Return a strong ETag for ``parts`` and what was asked for.
+
+    The path with its query string and the negotiated media type are part
+    of the hash since they change the body for the same rows.
+    """
+    media_type = getattr(request, 'accepted_media_type', '')
+    key = '|'.join(str(part) for part in (
+        REPRESENTATION_VERSION,
+        request.get_full_path(),
+        media_type,
+        *parts,
+    ))
+    return quote_etag(hashlib.sha256(key.encode()).hexdigest()[:32])
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return a 304 response if the client's copy is current, else None."""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    """Add the ETag and Last-Modified headers to ``response``."""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Bodies differ per user, never share them between credentials.
+    patch_vary_headers(response, ['Authorization'])
+    return response
@@ -0,0 +1,117 @@
+"""
+Filters for instruments APIs
+"""
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import (
+    BaseFilterBackend,
+    OrderingFilter,
+    SearchFilter,
+)
+
+
+def parse_datetime_param(request, name):
+    """Parse a date or datetime query parameter."""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            date = parse_date(value)
+            parsed = date and datetime.combine(date, time.min)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: 'Enter a valid date or datetime.'})
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class InstrumentFilter(BaseFilterBackend):
+    """Filter instruments by query parameters.
+
+    ``type``, ``manufacturer`` and ``unit`` match exactly, ``tag`` matches
+    a prefix, ``due_before`` and ``overdue`` filter on ``next_check``.
+    """
+    exact_params = ['type', 'manufacturer', 'unit']
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        filters = {
+            name: params[name] for name in self.exact_params if name in params
+        }
+        if params.get('tag'):
+            filters['tag__startswith'] = params['tag']
+        queryset = queryset.filter(**filters)
+
+        due_before = parse_datetime_param(request, 'due_before')
+        if due_before:
+            queryset = queryset.filter(next_check__lt=due_before)
+
+        overdue = params.get('overdue')
+        if overdue in ('true', '1'):
+            queryset = queryset.filter(next_check__lt=timezone.now())
+        elif overdue in ('false', '0'):
+            queryset = queryset.filter(next_check__gte=timezone.now())
+
+        return queryset
+
+
+class CalibrationEventFilter(BaseFilterBackend):
+    """Filter calibration events by ``instrument`` id and check time.
+
+    ``since`` and ``until`` bound ``checked_at``, which also limits the
+    partitions PostgreSQL scans.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        instrument = request.query_params.get('instrument')
+        if instrument:
+            try:
+                queryset = queryset.filter(instrument_id=int(instrument))
+            except ValueError:
+                raise ValidationError({
+                    'instrument': 'A valid integer is required.',
+                })
+
+        since = parse_datetime_param(request, 'since')
+        if since:
+            queryset = queryset.filter(checked_at__gte=since)
+        until = parse_datetime_param(request, 'until')
+        if until:
+            queryset = queryset.filter(checked_at__lt=until)
+
+        return queryset
+
+
+class InstrumentSearchFilter(SearchFilter):
+    """Case-insensitive substring search over text fields.
+
+    On PostgreSQL the lookups are served by trigram indexes.
+    """
+    search_fields = ['tag', 'description', 'notes']
+
+    def get_search_fields(self, view, request):
+        return self.search_fields
+
+
+class InstrumentOrderingFilter(OrderingFilter):
+    """Whitelisted ordering that always ends with ``id``.
+
+    The id tie-breaker follows the direction of the first field so
+    ``(field, id)`` is read in one direction of an index, and keeps pages
+    stable for the cursor pagination.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        if not any(field.lstrip('-') == 'id' for field in ordering):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
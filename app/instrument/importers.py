@@ -0,0 +1,237 @@
+"""
+Chunked CSV/XLSX import of instruments
+"""
+import io
+import zipfile
+from itertools import islice
+
+import pandas as pd
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core import stats
+from core.models import MAX_INTERVAL_DAYS, Instrument
+
+
+COLUMNS = [
+    'tag',
+    'unit',
+    'description',
+    'type',
+    'manufacturer',
+    'serial_no',
+    'interval',
+    'last_checked',
+    'notes',
+    'link',
+]
+REQUIRED_COLUMNS = COLUMNS[:8]
+TEXT_COLUMNS = [
+    name for name in COLUMNS if name not in ('interval', 'last_checked')
+]
+CHUNK_SIZE = 5000
+MAX_ERRORS = 100
+# Last due date that both pandas and the database can hold.
+MAX_NEXT_CHECK = pd.Timestamp.max.tz_localize('UTC').floor('D')
+
+
+class ImportFormatError(ValueError):
+    """The uploaded file cannot be read as an instrument register."""
+
+
+def is_excel(name):
+    """Return whether ``name`` looks like an Excel workbook."""
+    return str(name).lower().endswith(('.xlsx', '.xlsm'))
+
+
+def _read_excel_chunks(file, chunksize):
+    """Yield DataFrames of ``chunksize`` rows from the first sheet."""
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:  # pragma: no cover
+        raise ImportFormatError('Reading .xlsx files requires openpyxl.')
+
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as exc:
+        raise ImportFormatError(f'Could not read the workbook: {exc}') \
+            from exc
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [
+            '' if cell is None else str(cell) for cell in next(rows, [])
+        ]
+        while True:
+            chunk = list(islice(rows, chunksize))
+            if not chunk:
+                break
+            frame = pd.DataFrame(chunk, columns=header, dtype=object)
+            yield frame.fillna('').astype(str)
+    finally:
+        workbook.close()
+
+
+def read_chunks(file, name='', chunksize=CHUNK_SIZE):
+    """Yield the rows of a CSV or XLSX ``file`` as string DataFrames."""
+    if is_excel(name):
+        yield from _read_excel_chunks(file, chunksize)
+        return
+
+    if isinstance(file.read(0), bytes):
+        file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from pd.read_csv(
+            file,
+            chunksize=chunksize,
+            dtype=str,
+            keep_default_na=False,
+            skipinitialspace=True,
+        )
+    except pd.errors.EmptyDataError:
+        return
+    except (pd.errors.ParserError, UnicodeDecodeError) as exc:
+        raise ImportFormatError(f'Could not parse the file: {exc}') from exc
+
+
+def clean_chunk(frame, first_row):
+    """Validate ``frame`` and return ``(clean, errors)``.
+
+    All checks are vectorized over the chunk. ``clean`` holds the valid
+    rows with typed ``interval``/``last_checked`` columns and ``errors`` a
+    list of ``{'row', 'errors'}`` using 1-based data row numbers.
+    """
+    frame = frame.rename(columns=lambda name: str(name).strip().lower())
+    missing = [name for name in REQUIRED_COLUMNS if name not in frame]
+    if missing:
+        raise ImportFormatError(
+            'Missing required columns: ' + ', '.join(missing)
+        )
+    for name in COLUMNS:
+        if name not in frame:
+            frame[name] = ''
+    frame = frame[COLUMNS].reset_index(drop=True).astype(str).apply(
+        lambda column: column.str.strip()
+    )
+
+    interval = pd.to_numeric(frame['interval'], errors='coerce')
+    last_checked = pd.to_datetime(
+        frame['last_checked'],
+        errors='coerce',
+        utc=True,
+        format='mixed',
+    )
+    checks = [
+        (name, 'This field may not be blank.', frame[name].eq(''))
+        for name in REQUIRED_COLUMNS
+    ]
+    for name in TEXT_COLUMNS:
+        max_length = Instrument._meta.get_field(name).max_length
+        if max_length:
+            checks.append((
+                name,
+                f'Ensure this field has no more than {max_length} '
+                'characters.',
+                frame[name].str.len().gt(max_length),
+            ))
+    bad_interval = ~(
+        interval.between(1, MAX_INTERVAL_DAYS) & interval.mod(1).eq(0)
+    )
+    latest = MAX_NEXT_CHECK - pd.to_timedelta(
+        interval.where(~bad_interval, 0), unit='D',
+    )
+    checks += [
+        (
+            'interval',
+            'Ensure this value is an integer between 1 and '
+            f'{MAX_INTERVAL_DAYS}.',
+            bad_interval,
+        ),
+        (
+            'last_checked',
+            'Enter a valid date or datetime.',
+            last_checked.isna(),
+        ),
+        (
+            'last_checked',
+            'The next check would be out of range.',
+            last_checked.gt(latest),
+        ),
+    ]
+
+    failed = pd.concat([mask for _, _, mask in checks], axis=1).any(axis=1)
+    errors = {}
+    for name, message, mask in checks:
+        for position in mask[mask].index:
+            row = errors.setdefault(position, {})
+            row.setdefault(name, []).append(message)
+    errors = [
+        {'row': first_row + position, 'errors': errors[position]}
+        for position in sorted(errors)
+    ]
+
+    clean = frame[~failed].copy()
+    clean['interval'] = interval[~failed].astype('int64')
+    clean['last_checked'] = last_checked[~failed]
+    return clean, errors
+
+
+def _insert_copy(user, frame):
+    """Insert ``frame`` with PostgreSQL ``COPY FROM STDIN``."""
+    out = frame.copy()
+    out['next_check'] = out['last_checked'] + pd.to_timedelta(
+        out['interval'], unit='D',
+    )
+    out['created_at'] = out['updated_at'] = timezone.now()
+    out['user_id'] = user.pk
+
+    buffer = io.StringIO()
+    out.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(name) for name in out)
+    text = ', '.join(quote(name) for name in TEXT_COLUMNS)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {Instrument._meta.db_table} ({columns}) '
+            f'FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL ({text}))',
+            buffer,
+        )
+    # COPY bypasses the ORM, so refresh the statistics here.
+    stats.mark_stale((user.pk, type_) for type_ in frame['type'].unique())
+
+
+def _insert_bulk(user, frame):
+    """Insert ``frame`` with ``bulk_create``."""
+    Instrument.objects.bulk_create(
+        Instrument(
+            user=user,
+            last_checked=row.last_checked.to_pydatetime(),
+            **{name: getattr(row, name) for name in COLUMNS
+               if name != 'last_checked'},
+        )
+        for row in frame.itertuples(index=False)
+    )
+
+
+def import_instruments(user, file, name='', chunksize=CHUNK_SIZE):
+    """Import instruments for ``user`` from a CSV or XLSX ``file``.
+
+    The file is read and inserted one chunk at a time so memory use does
+    not depend on its size. Each chunk is written in its own transaction
+    and invalid rows are skipped and reported.
+    """
+    insert = _insert_copy if connection.vendor == 'postgresql' \
+        else _insert_bulk
+    summary = {'rows': 0, 'imported': 0, 'errors': []}
+    for frame in read_chunks(file, name=name, chunksize=chunksize):
+        clean, errors = clean_chunk(frame, first_row=summary['rows'] + 1)
+        if not clean.empty:
+            with transaction.atomic():
+                insert(user, clean)
+        summary['rows'] += len(frame)
+        summary['imported'] += len(clean)
+        room = MAX_ERRORS - len(summary['errors'])
+        summary['errors'] += errors[:max(room, 0)]
+
+    return summary
@@ -0,0 +1,95 @@
+"""
+Django command to benchmark the scaling of the parallel analytics.
+"""
+import os
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmarks
+from core.models import CalibrationEvent, Instrument
+from instrument.analytics import analyze, analyze_parallel
+
+
+class Command(BaseCommand):
+    """Time analyze_parallel() over a range of worker counts."""
+
+    help = (
+        'Benchmark the instrument analytics with 1 to --workers processes '
+        'and report the speedup and the parallel efficiency of each.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--instruments',
+            type=int,
+            default=1000000,
+            help='Instruments to seed, with as many calibration events.',
+        )
+        parser.add_argument(
+            '--user',
+            help='Email of a user whose register is measured instead.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Largest worker count, default one per CPU.',
+        )
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        seeded = options['user'] is None
+        if seeded:
+            user = benchmarks.create_benchmark_user(
+                f'bench-{uuid.uuid4().hex[:12]}@example.com',
+            )
+            self.stdout.write(f"Seeding {options['instruments']} instruments")
+            benchmarks.seed_instruments(user, options['instruments'])
+            benchmarks.seed_calibration_events(user, options['instruments'])
+        else:
+            try:
+                user = get_user_model().objects.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist.")
+
+        instruments = Instrument.objects.filter(user=user)
+        events = CalibrationEvent.objects.filter(user=user)
+        try:
+            self.measure(instruments, events, options)
+        finally:
+            if seeded:
+                events.delete()
+                instruments.delete()
+                user.delete()
+
+    def measure(self, instruments, events, options):
+        """Print the timings of each worker count up to --workers."""
+        expected = analyze(instruments, events)['totals']
+        counts = sorted({
+            *(2 ** n for n in range(options['workers'].bit_length())),
+            options['workers'],
+        })
+        base = None
+        for workers in counts:
+            def run():
+                return analyze_parallel(instruments, events, workers=workers)
+
+            totals = run()['totals']
+            if any(totals[name] != expected[name]
+                   for name in ('instruments', 'overdue', 'events')):
+                raise CommandError(f'Totals differ with {workers} workers.')
+
+            elapsed = benchmarks.median(
+                benchmarks.time_call(run, options['repeat'])
+            )
+            if base is None:
+                base = elapsed
+            speedup = base / elapsed
+            self.stdout.write(
+                f'{workers:>4} workers  {elapsed:10.1f} ms  '
+                f'speedup {speedup:5.2f}x  '
+                f'efficiency {speedup / workers:6.1%}'
+            )
@@ -0,0 +1,73 @@
+"""
+Django command to benchmark the instrument list serializers.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core import benchmarks
+from instrument.serializers import (
+    InstrumentListSerializer,
+    InstrumentSerializer,
+)
+
+
+class Command(BaseCommand):
+    """Compare ModelSerializer and the list fast path on the same rows."""
+
+    help = (
+        'Benchmark rendering instrument list responses with '
+        'InstrumentSerializer and InstrumentListSerializer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            default='1000,10000,100000',
+            help='Comma separated row counts.',
+        )
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        user = get_user_model()(id=1, email='bench@example.com')
+        fields = InstrumentListSerializer.Meta.fields
+        renderer = JSONRenderer()
+
+        for count in [int(n) for n in options['rows'].split(',')]:
+            instruments = []
+            for i in range(count):
+                instrument = benchmarks.build_instrument(user, i)
+                instrument.id = i + 1
+                instrument.created_at = timezone.now()
+                instrument.set_next_check()
+                instruments.append(instrument)
+            rows = [
+                {name: getattr(instrument, name) for name in fields}
+                for instrument in instruments
+            ]
+
+            def model_path():
+                return renderer.render(
+                    InstrumentSerializer(instruments, many=True).data
+                )
+
+            def values_path():
+                return renderer.render(
+                    InstrumentListSerializer(rows, many=True).data
+                )
+
+            if model_path() != values_path():
+                raise CommandError(f'Output differs at {count} rows.')
+
+            slow = benchmarks.median(
+                benchmarks.time_call(model_path, options['repeat'])
+            )
+            fast = benchmarks.median(
+                benchmarks.time_call(values_path, options['repeat'])
+            )
+            self.stdout.write(
+                f'{count:>8} rows  ModelSerializer {slow:9.1f} ms  '
+                f'fast path {fast:9.1f} ms  speedup {slow / fast:5.1f}x'
+            )
@@ -0,0 +1,50 @@
+"""
+Django command to import instruments from a CSV or XLSX file.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from instrument.importers import (
+    CHUNK_SIZE,
+    ImportFormatError,
+    import_instruments,
+)
+
+
+class Command(BaseCommand):
+    """Django command to import an instrument register."""
+
+    help = 'Import instruments for a user from a CSV or XLSX file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Email of the user that will own the instruments.',
+        )
+        parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+
+        try:
+            with open(options['path'], 'rb') as file:
+                summary = import_instruments(
+                    user,
+                    file,
+                    name=options['path'],
+                    chunksize=options['chunksize'],
+                )
+        except (OSError, ImportFormatError) as exc:
+            raise CommandError(str(exc))
+
+        for error in summary['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['imported']} of {summary['rows']} rows."
+        ))
@@ -0,0 +1,91 @@
+"""
+Django command to report the drift and calibration interval analytics.
+"""
+import json
+
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.models import CalibrationEvent, Instrument
+from instrument.analytics import (
+    CHUNK_SIZE,
+    GROUP_FIELDS,
+    analyze,
+    analyze_parallel,
+)
+
+
+FORMATS = ['table', 'csv', 'json']
+
+
+class Command(BaseCommand):
+    """Django command to report analytics per type and manufacturer."""
+
+    help = (
+        'Report overdue ratios, interval compliance, drift and recommended '
+        'intervals per instrument type and manufacturer, for one user or '
+        'for all instruments.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Email of the user to report on, all users by default.',
+        )
+        parser.add_argument('--format', choices=FORMATS, default='table')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes to shard the instruments over, 0 for one per '
+                 'CPU. Each worker opens its own database connection.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        instruments = Instrument.objects.all()
+        events = CalibrationEvent.objects.all()
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist.")
+            instruments = instruments.filter(user=user)
+            events = events.filter(user=user)
+
+        if options['workers'] == 1:
+            report = analyze(
+                instruments,
+                events,
+                chunk_size=options['chunk_size'],
+            )
+        else:
+            report = analyze_parallel(
+                instruments,
+                events,
+                workers=options['workers'] or None,
+                chunk_size=options['chunk_size'],
+            )
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps(report, cls=DjangoJSONEncoder))
+            return
+
+        frame = pd.DataFrame(report['results'])
+        if options['format'] == 'csv':
+            self.stdout.write(frame.to_csv(index=False), ending='')
+            return
+
+        if frame.empty:
+            self.stdout.write('No instruments.')
+            return
+        self.stdout.write(frame.set_index(GROUP_FIELDS).to_string(
+            float_format='{:.3f}'.format,
+        ))
+        totals = report['totals']
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['instruments']} instruments, {totals['events']} "
+            f"checks, {totals['overdue']} overdue."
+        ))
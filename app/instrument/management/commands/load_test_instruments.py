@@ -0,0 +1,105 @@
+"""
+Django command to load test the instrument API servers.
+"""
+import asyncio
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from core import benchmarks
+from core.models import Instrument
+
+
+class Command(BaseCommand):
+    """Compare the throughput and latency of running API servers.
+
+    Start the servers first, e.g. the WSGI viewset under gunicorn and the
+    async views under uvicorn, against the same database::
+
+        gunicorn app.wsgi -b :8000 -w 4 --threads 8
+        uvicorn app.asgi:application --port 8001 --workers 4
+
+        python manage.py load_test_instruments \\
+            wsgi=http://localhost:8000/api/instrument/instruments/ \\
+            asgi=http://localhost:8001/api/async/instrument/instruments/
+    """
+
+    help = 'Load test instrument API URLs with concurrent connections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'targets',
+            nargs='+',
+            help='URLs to test, optionally labelled as label=url.',
+        )
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=10,
+            help='Seconds before a request counts as timed out.',
+        )
+        parser.add_argument(
+            '--token',
+            help='Token to send. By default a user with --rows '
+                 'instruments is created for the run and deleted after.',
+        )
+        parser.add_argument('--rows', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        targets = []
+        for target in options['targets']:
+            label, _, url = target.rpartition('=')
+            if not url.startswith('http://'):
+                raise CommandError(f'Only http:// URLs are supported: {url}')
+            targets.append((label or url, url))
+
+        user = None
+        token = options['token']
+        if token is None:
+            user = benchmarks.create_benchmark_user(
+                f'load-{uuid.uuid4().hex[:8]}@example.com',
+            )
+            benchmarks.seed_instruments(user, options['rows'])
+            token = Token.objects.create(user=user).key
+
+        try:
+            for label, url in targets:
+                self.run(label, url, token, options)
+        finally:
+            if user is not None:
+                Instrument.objects.filter(user=user).delete()
+                user.delete()
+
+    def run(self, label, url, token, options):
+        """Load ``url`` and print its throughput and latency."""
+        self.stdout.write(
+            f"{label}: {options['connections']} connections for "
+            f"{options['duration']:g}s..."
+        )
+        results = asyncio.run(benchmarks.http_load(
+            url,
+            {'Authorization': f'Token {token}', 'Accept': 'application/json'},
+            options['connections'],
+            options['duration'],
+            options['timeout'],
+        ))
+
+        latencies = results['latencies']
+        if not latencies:
+            raise CommandError(f'{label}: no responses.')
+        statuses = ', '.join(
+            f'{status}: {count}'
+            for status, count in sorted(results['statuses'].items())
+        )
+        self.stdout.write(
+            f'{label}: {len(latencies) / options["duration"]:8.1f} req/s  '
+            f'p50 {benchmarks.percentile(latencies, 50):7.1f} ms  '
+            f'p95 {benchmarks.percentile(latencies, 95):7.1f} ms  '
+            f'p99 {benchmarks.percentile(latencies, 99):7.1f} ms  '
+            f'[{statuses}; timeouts: {results["timeouts"]}, '
+            f'errors: {results["errors"]}]'
+        )
@@ -0,0 +1,158 @@
+"""
+Pagination for instruments APIs
+"""
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class InstrumentCursorPagination(CursorPagination):
+    """Keyset pagination over a user's instruments.
+
+    The queryset is already scoped to ``request.user`` so pages are read
+    with ``WHERE user_id = %s AND id < %s ORDER BY id DESC LIMIT n``,
+    which costs the same for every page instead of growing with OFFSET.
+
+    ``CursorPagination.paginate_queryset`` is split in two so callers that
+    cannot evaluate querysets, such as the async views, can fetch the page
+    themselves: ``get_page_queryset`` builds the query and
+    ``paginate_rows`` turns its rows into the page.
+
+    Other orderings than ``id`` repeat values, ``next_check`` and
+    ``updated_at`` are shared by whole bulk writes, so they are read with
+    ``id`` as tie-breaker and the cursor keeps the ``(value, id)`` pair.
+    Pages then stay keyset reads where DRF would fall back to OFFSET.
+    """
+    ordering = '-id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self.paginate_rows(list(page_queryset))
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """Return the page of ``queryset`` plus one row, or None."""
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        # Cursor pagination always enforces an ordering.
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        # If we have a cursor with a fixed position then filter by that.
+        if current_position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(current_position),
+            )
+
+        self._offset = offset
+        self._reverse = reverse
+        self._current_position = current_position
+        # Fetch an extra item to know if there is a following page.
+        return queryset[offset:offset + self.page_size + 1]
+
+    def get_ordering(self, request, queryset, view):
+        """Return the first ordering field and its ``id`` tie-breaker."""
+        ordering = super().get_ordering(request, queryset, view)
+        order = ordering[0]
+        if order.lstrip('-') == 'id':
+            return (order,)
+        return (order, '-id' if order.startswith('-') else 'id')
+
+    def get_position_filter(self, position):
+        """Return the filter of the rows following ``position``."""
+        order = self.ordering[0]
+        is_reversed = order.startswith('-')
+        order_attr = order.lstrip('-')
+
+        # Test for: (cursor reversed) XOR (queryset reversed)
+        lookup = 'lt' if self.cursor.reverse != is_reversed else 'gt'
+        if len(self.ordering) == 1:
+            return Q(**{f'{order_attr}__{lookup}': position})
+
+        try:
+            value, pk = json.loads(position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        # The bound on the first field alone lets the index seek to the
+        # position, the tie-breaker only skips rows sharing its value.
+        return Q(**{f'{order_attr}__{lookup}e': value}) & (
+            Q(**{f'{order_attr}__{lookup}': value})
+            | Q(**{f'id__{lookup}': pk})
+        )
+
+    def _get_position_from_instance(self, instance, ordering):
+        if len(ordering) == 1:
+            return super()._get_position_from_instance(instance, ordering)
+        attr = ordering[0].lstrip('-')
+        if isinstance(instance, dict):
+            value, pk = instance[attr], instance['id']
+        else:
+            value, pk = getattr(instance, attr), instance.id
+        return json.dumps([str(value), pk])
+
+    def paginate_rows(self, results):
+        """Return the page from the rows of ``get_page_queryset``."""
+        offset = self._offset
+        reverse = self._reverse
+        current_position = self._current_position
+        self.page = list(results[:self.page_size])
+
+        # Determine the position of the final item following the page.
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1],
+                self.ordering,
+            )
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            # The query ran in reverse, put the items back in order.
+            self.page = list(reversed(self.page))
+
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        # Display page controls in the browsable API if there is more
+        # than one page.
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+
+class CalibrationEventCursorPagination(InstrumentCursorPagination):
+    """Keyset pagination over events, most recent check first."""
+    ordering = '-checked_at'
@@ -1,12 +1,80 @@
 """
 Serializers for instruments APIs
 """
-from rest_framework import serializers
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
-from core.models import Instrument
+from core.expressions import next_check_for
+from core.models import CalibrationEvent, Instrument
 
 
-class InstrumentSerializer(serializers.ModelSerializer):
+# Field types whose ``to_representation`` returns database values unchanged.
+PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField)
+
+NEXT_CHECK_OUT_OF_RANGE = 'The next check would be out of range.'
+
+
+def datetime_formatter(field):
+    """Return a fast equivalent of ``DateTimeField.to_representation``."""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = getattr(field, 'timezone', field.default_timezone())
+    if output_format is None or output_format.lower() != ISO_8601 \
+            or field_timezone is None:
+        return field.to_representation
+
+    def format_datetime(value):
+        if timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return format_datetime
+
+
+def build_row_formatter(fields):
+    """Return a function rendering a ``.values()`` row like ``fields``.
+
+    The per-field dispatch DRF does for every row is resolved once here.
+    """
+    formatters = []
+    for field in fields.values():
+        if field.write_only:
+            continue
+        if type(field) in PASSTHROUGH_FIELDS:
+            format_value = None
+        elif isinstance(field, serializers.DateTimeField):
+            format_value = datetime_formatter(field)
+        else:
+            format_value = field.to_representation
+        formatters.append((field.field_name, field.source, format_value))
+
+    def format_row(row):
+        ret = {}
+        for name, source, format_value in formatters:
+            value = row[source]
+            if value is not None and format_value is not None:
+                value = format_value(value)
+            ret[name] = value
+        return ret
+
+    return format_row
+
+
+class SparseFieldsMixin:
+    """Serializer mixin that renders only the ``fields`` it is given."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class InstrumentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for instruments."""
     # last_checked = serializers.DateTimeField(format="%Y-%m-%dT%H:%M:%S%z",
     # input_formats=["%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%d"])
@@ -24,8 +92,28 @@ class InstrumentSerializer(serializers.ModelSerializer):
                   'created_at',
                   'last_checked',
                   'notes',
-                  'link']
-        read_only_fields = ['id']
+                  'link',
+                  'next_check']
+        read_only_fields = ['id', 'next_check']
+
+    def validate(self, attrs):
+        """Check the next check after ``last_checked`` is a valid date."""
+        last_checked = attrs.get(
+            'last_checked',
+            getattr(self.instance, 'last_checked', None),
+        )
+        interval = attrs.get(
+            'interval',
+            getattr(self.instance, 'interval', None),
+        )
+        if last_checked is not None and interval is not None:
+            try:
+                next_check_for(last_checked, interval)
+            except OverflowError:
+                raise serializers.ValidationError(
+                    {'last_checked': [NEXT_CHECK_OUT_OF_RANGE]},
+                )
+        return attrs
 
 
 class InstrumentDetailSerializer(InstrumentSerializer):
@@ -34,3 +122,56 @@ class InstrumentDetailSerializer(InstrumentSerializer):
     class Meta(InstrumentSerializer.Meta):
         # fields = InstrumentSerializer.Meta.fields + ['description_2']
         pass
+
+
+class InstrumentValuesListSerializer(serializers.ListSerializer):
+    """List serializer that formats rows without per-field dispatch."""
+
+    def to_representation(self, data):
+        format_row = self.child.format_row
+        return [format_row(row) for row in data]
+
+
+class InstrumentListSerializer(InstrumentSerializer):
+    """Read-only serializer for list responses over ``.values()`` rows.
+
+    Produces the same output as ``InstrumentSerializer`` for rows fetched
+    with ``queryset.values(*InstrumentListSerializer.Meta.fields)``.
+    """
+
+    class Meta(InstrumentSerializer.Meta):
+        list_serializer_class = InstrumentValuesListSerializer
+
+    @cached_property
+    def format_row(self):
+        return build_row_formatter(self.fields)
+
+    def to_representation(self, instance):
+        return self.format_row(instance)
+
+
+class CalibrationEventSerializer(serializers.ModelSerializer):
+    """Serializer for calibration events.
+
+    The instrument is read and written as its id, ownership is checked
+    for the whole batch at once, see ``instrument.bulk.record_checks``.
+    """
+    instrument = serializers.IntegerField(source='instrument_id')
+
+    class Meta:
+        model = CalibrationEvent
+        fields = ['id',
+                  'instrument',
+                  'checked_at',
+                  'result',
+                  'as_found',
+                  'as_left',
+                  'technician',
+                  'notes',
+                  'created_at']
+        read_only_fields = ['id', 'created_at']
+
+    def validate_checked_at(self, value):
+        if value > timezone.now():
+            raise serializers.ValidationError('Cannot be in the future.')
+        return value
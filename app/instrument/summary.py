@@ -0,0 +1,55 @@
+"""
+Calibration due summary for instruments APIs
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+# Windows are counted from now, so due_30_days includes due_7_days.
+DUE_WINDOWS = {
+    'due_7_days': timedelta(days=7),
+    'due_30_days': timedelta(days=30),
+}
+GROUP_FIELDS = ('type', 'manufacturer')
+COUNT_FIELDS = ('total', 'overdue', *DUE_WINDOWS)
+
+
+def due_counts(queryset, now):
+    """Return ``queryset`` grouped by type and manufacturer with counts.
+
+    Every bucket is a filtered count over the stored ``next_check``
+    column, so the whole summary is a single grouped query.
+    """
+    counts = {
+        'total': Count('id'),
+        'overdue': Count('id', filter=Q(next_check__lt=now)),
+    }
+    for name, window in DUE_WINDOWS.items():
+        counts[name] = Count('id', filter=Q(
+            next_check__gte=now,
+            next_check__lt=now + window,
+        ))
+
+    return (
+        queryset.order_by()
+        .values(*GROUP_FIELDS)
+        .annotate(**counts)
+        .order_by(*GROUP_FIELDS)
+    )
+
+
+def due_summary(queryset, now=None):
+    """Return the due summary of ``queryset`` with overall totals."""
+    now = now or timezone.now()
+    return summarize(list(due_counts(queryset, now)), now)
+
+
+def summarize(groups, now):
+    """Return the summary response for the rows of ``due_counts``."""
+    totals = {
+        name: sum(group[name] for group in groups)
+        for name in COUNT_FIELDS
+    }
+    return {'generated_at': now, 'totals': totals, 'results': groups}
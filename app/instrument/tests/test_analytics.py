@@ -0,0 +1,223 @@
+"""
+Tests for the drift and calibration interval analytics.
+"""
+import io
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.transaction import TransactionManagementError
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import CalibrationEvent, Instrument
+from instrument.analytics import (
+    analyze,
+    analyze_parallel,
+    analyze_shard,
+    merge,
+    report,
+    shard_bounds,
+)
+
+
+ANALYTICS_URL = reverse('instrument:instrument-analytics')
+NOW = timezone.make_aware(datetime(2024, 3, 1))
+
+
+def create_instrument(user, interval=30, type='CONTROL VALVE', **params):
+    """Create an instrument last checked ``interval`` days before NOW."""
+    defaults = {
+        'tag': '11-FV-01',
+        'manufacturer': 'EMERSON',
+        'last_checked': NOW - timedelta(days=interval),
+    }
+    defaults.update(params)
+    return Instrument.objects.create(
+        user=user,
+        type=type,
+        interval=interval,
+        **defaults,
+    )
+
+
+def create_event(instrument, days, found, left='10', result='pass'):
+    """Record a check ``days`` after 2024-01-01."""
+    return CalibrationEvent.objects.create(
+        user=instrument.user,
+        instrument=instrument,
+        checked_at=timezone.make_aware(datetime(2024, 1, 1)) + timedelta(
+            days=days,
+        ),
+        result=result,
+        as_found=Decimal(found),
+        as_left=Decimal(left),
+        technician='J. Smith',
+    )
+
+
+class AnalyticsFixtureMixin:
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+        )
+        valve = create_instrument(self.user)
+        create_event(valve, 0, '10.5')
+        create_event(valve, 20, '10.2')
+        create_event(valve, 65, '10.9', result=CalibrationEvent.FAIL)
+        # Last checked 60 days before NOW, so overdue.
+        create_instrument(
+            self.user,
+            tag='11-FV-02',
+            last_checked=NOW - timedelta(days=60),
+        )
+        create_instrument(self.user, interval=365, type='ANALYZER')
+        self.instruments = Instrument.objects.filter(user=self.user)
+        self.events = CalibrationEvent.objects.filter(user=self.user)
+
+    def analyze(self, **kwargs):
+        return analyze(self.instruments, self.events, now=NOW, **kwargs)
+
+
+class AnalyticsTests(AnalyticsFixtureMixin, TestCase):
+
+    def test_group_metrics(self):
+        """Test ratios, compliance and drift per type and manufacturer."""
+        report = self.analyze()
+
+        analyzer, valves = report['results']
+        self.assertEqual(
+            (analyzer['type'], analyzer['instruments'], analyzer['events']),
+            ('ANALYZER', 1, 0),
+        )
+        self.assertIsNone(analyzer['interval_compliance'])
+        self.assertEqual(valves['type'], 'CONTROL VALVE')
+        self.assertEqual(valves['manufacturer'], 'EMERSON')
+        self.assertEqual(valves['instruments'], 2)
+        self.assertEqual(valves['overdue'], 1)
+        self.assertEqual(valves['overdue_ratio'], 0.5)
+        self.assertEqual(valves['events'], 3)
+        self.assertAlmostEqual(valves['fail_rate'], 1 / 3)
+        # Checked after 20 days then after 45 days, the interval is 30.
+        self.assertEqual(valves['interval_compliance'], 0.5)
+        self.assertAlmostEqual(valves['mean_drift'], 1.6 / 3)
+        self.assertAlmostEqual(
+            valves['drift_per_year'],
+            (0.2 / 20 + 0.9 / 45) * 365 / 2,
+        )
+        self.assertIsNone(valves['adjustment'])
+        self.assertEqual(report['totals']['instruments'], 3)
+        self.assertEqual(report['totals']['overdue'], 1)
+
+    def test_chunks_merge_to_same_result(self):
+        """Test partial aggregates of single instruments add up."""
+        self.assertEqual(self.analyze(chunk_size=1), self.analyze())
+
+    @patch('instrument.analytics.MIN_EVENTS', 3)
+    def test_recommended_intervals(self):
+        """Test failing groups get shorter intervals."""
+        report = self.analyze()
+
+        analyzer, valves = report['results']
+        self.assertIsNone(analyzer['recommended_interval_days'])
+        self.assertEqual(valves['adjustment'], 'shorten')
+        self.assertEqual(valves['recommended_interval_days'], 22)
+
+    def test_without_history(self):
+        """Test instruments are analyzed without calibration events."""
+        report = analyze(Instrument.objects.filter(user=self.user), now=NOW)
+
+        self.assertEqual(report['totals']['events'], 0)
+        self.assertEqual(report['totals']['instruments'], 3)
+        self.assertIsNone(report['totals']['fail_rate'])
+
+    def test_no_instruments(self):
+        """Test an empty register gives an empty report."""
+        report = analyze(Instrument.objects.none(), now=NOW)
+
+        self.assertEqual(report['results'], [])
+        self.assertEqual(report['totals']['instruments'], 0)
+
+    def test_api_action(self):
+        """Test the analytics action honours the list filters."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+        )
+        create_instrument(other)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(ANALYTICS_URL, {'type': 'CONTROL VALVE'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        [valves] = res.data['results']
+        self.assertEqual(valves['instruments'], 2)
+        self.assertEqual(valves['events'], 3)
+
+    def test_command(self):
+        """Test instrument_analytics reports one user as JSON."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+        )
+        create_instrument(other)
+        out = io.StringIO()
+
+        call_command(
+            'instrument_analytics',
+            '--user', self.user.email,
+            '--format', 'json',
+            stdout=out,
+        )
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['totals']['instruments'], 3)
+        self.assertEqual(report['totals']['events'], 3)
+
+    def test_streamed_shards_match(self):
+        """Test shards streamed in small chunks add up to the same."""
+        partials = [
+            analyze_shard(
+                self.instruments.query,
+                self.events.query,
+                low,
+                high,
+                NOW,
+                chunk_size=1,
+            )
+            for low, high in shard_bounds(self.instruments, 2)
+        ]
+
+        self.assertEqual(len(partials), 2)
+        self.assertEqual(
+            report(merge(partials), NOW),
+            self.analyze(),
+        )
+
+    def test_parallel_refuses_atomic_block(self):
+        """Test workers cannot be started inside a transaction."""
+        with self.assertRaises(TransactionManagementError):
+            analyze_parallel(self.instruments, self.events, workers=2)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+class ParallelAnalyticsTests(AnalyticsFixtureMixin, TransactionTestCase):
+
+    def test_parallel_matches_serial(self):
+        """Test worker processes compute the single process analytics."""
+        report = analyze_parallel(
+            self.instruments,
+            self.events,
+            workers=2,
+            now=NOW,
+        )
+
+        self.assertEqual(report, self.analyze())
@@ -0,0 +1,146 @@
+"""
+Tests for the async instrument views.
+"""
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Instrument
+from user.authentication import clear_token_cache
+
+
+ASYNC_LIST_URL = reverse('instrument-async:instrument-list')
+ASYNC_SUMMARY_URL = reverse('instrument-async:instrument-summary')
+LIST_URL = reverse('instrument:instrument-list')
+SUMMARY_URL = reverse('instrument:instrument-summary')
+
+
+def async_detail_url(instrument_id):
+    """Return the async instrument detail URL."""
+    return reverse('instrument-async:instrument-detail', args=[instrument_id])
+
+
+def create_instrument(user, **params):
+    """Create and return a sample instrument."""
+    defaults = {
+        'tag': '11-FV-01',
+        'unit': '1100',
+        'description': 'GO FLOW',
+        'type': 'CONTROL VALVE',
+        'manufacturer': 'EMERSON',
+        'serial_no': '123456EU',
+        'interval': 100,
+        'last_checked': timezone.make_aware(datetime(2021, 1, 1)),
+        'notes': 'Created',
+    }
+    defaults.update(params)
+    return Instrument.objects.create(user=user, **defaults)
+
+
+class AsyncInstrumentViewTests(TransactionTestCase):
+    """Test the async views against the synchronous viewset.
+
+    Rows are committed since on PostgreSQL the async views read them over
+    their own connections.
+    """
+
+    def setUp(self):
+        cache.clear()
+        clear_token_cache()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'test123',
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_auth_required(self):
+        """Test requests without a valid token are rejected."""
+        res = APIClient().get(ASYNC_LIST_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        res = client.get(ASYNC_LIST_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_list_matches_viewset(self):
+        """Test the async list pages like the viewset list."""
+        for i in range(5):
+            create_instrument(user=self.user, tag=f'11-FV-0{i}')
+        other = get_user_model().objects.create_user('other@example.com')
+        create_instrument(user=other)
+        params = {'page_size': 2, 'ordering': 'tag', 'fields': 'id,tag'}
+
+        pages = []
+        for url in (ASYNC_LIST_URL, LIST_URL):
+            res = self.client.get(url, params)
+            results = res.json()['results']
+            while res.json()['next']:
+                res = self.client.get(res.json()['next'])
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                results += res.json()['results']
+            pages.append(results)
+
+        self.assertEqual(len(pages[0]), 5)
+        self.assertEqual(pages[0], pages[1])
+
+    def test_list_conditional_get(self):
+        """Test an unchanged async list is answered with 304."""
+        create_instrument(user=self.user)
+
+        res = self.client.get(ASYNC_LIST_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(ASYNC_LIST_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_invalid_params(self):
+        """Test invalid query parameters are reported with 400."""
+        res = self.client.get(ASYNC_LIST_URL, {'fields': 'secret'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', res.json())
+
+    def test_detail(self):
+        """Test the async detail matches the viewset detail."""
+        instrument = create_instrument(user=self.user)
+        other = get_user_model().objects.create_user('other@example.com')
+        other_instrument = create_instrument(user=other)
+
+        res = self.client.get(async_detail_url(instrument.id))
+        expected = self.client.get(
+            reverse('instrument:instrument-detail', args=[instrument.id]),
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), expected.json())
+
+        res = self.client.get(async_detail_url(other_instrument.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_summary(self):
+        """Test the async summary matches the viewset summary."""
+        create_instrument(user=self.user)
+        create_instrument(user=self.user, manufacturer='ABB')
+
+        res = self.client.get(ASYNC_SUMMARY_URL)
+        expected = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for key in ('totals', 'results'):
+            self.assertEqual(res.json()[key], expected.json()[key])
+
+    def test_read_only(self):
+        """Test the async views reject writes."""
+        res = self.client.post(ASYNC_LIST_URL, {})
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -0,0 +1,207 @@
+"""
+Tests for the calibration history API.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import CalibrationEvent, Instrument
+
+
+CALIBRATIONS_URL = reverse('instrument:calibration-list')
+LAST_CHECKED = timezone.make_aware(datetime(2024, 1, 1))
+
+
+def create_instrument(user, tag='11-FV-01'):
+    """Create and return an instrument last checked on LAST_CHECKED."""
+    return Instrument.objects.create(
+        user=user,
+        tag=tag,
+        unit='1100',
+        description='GO FLOW',
+        type='CONTROL VALVE',
+        manufacturer='EMERSON',
+        serial_no='123456EU',
+        interval=30,
+        last_checked=LAST_CHECKED,
+    )
+
+
+def event_payload(instrument, checked_at, **params):
+    """Return a calibration event payload."""
+    payload = {
+        'instrument': instrument.id,
+        'checked_at': checked_at.isoformat(),
+        'result': 'adjusted',
+        'as_found': '10.250000',
+        'as_left': '10.000000',
+        'technician': 'J. Smith',
+    }
+    payload.update(params)
+    return payload
+
+
+class PublicCalibrationApiTests(TestCase):
+    """Test unauthenticated API requests."""
+
+    def test_auth_required(self):
+        """Test auth is required to call API."""
+        res = APIClient().get(CALIBRATIONS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateCalibrationApiTests(TestCase):
+    """Test authenticated API requests."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.instrument = create_instrument(self.user)
+
+    def test_record_checks(self):
+        """Test events are stored and move last_checked forward."""
+        other = create_instrument(self.user, tag='11-FV-02')
+        first = LAST_CHECKED + timedelta(days=10)
+        newest = LAST_CHECKED + timedelta(days=20)
+        payload = [
+            event_payload(self.instrument, newest),
+            event_payload(self.instrument, first, result='fail'),
+            event_payload(other, first, as_found=None, as_left=None),
+        ]
+
+        res = self.client.post(CALIBRATIONS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['succeeded'], 3)
+        self.assertEqual(res.data['errors'], [])
+        self.instrument.refresh_from_db()
+        self.assertEqual(self.instrument.last_checked, newest)
+        self.assertEqual(self.instrument.next_check, newest + timedelta(30))
+        other.refresh_from_db()
+        self.assertEqual(other.last_checked, first)
+        event = CalibrationEvent.objects.get(result='fail')
+        self.assertEqual(event.user, self.user)
+        self.assertEqual(event.instrument, self.instrument)
+        self.assertEqual(event.as_found, Decimal('10.25'))
+
+    def test_older_check_keeps_last_checked(self):
+        """Test backfilling an older event leaves last_checked alone."""
+        older = LAST_CHECKED - timedelta(days=30)
+
+        res = self.client.post(
+            CALIBRATIONS_URL,
+            [event_payload(self.instrument, older)],
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.instrument.refresh_from_db()
+        self.assertEqual(self.instrument.last_checked, LAST_CHECKED)
+        self.assertEqual(CalibrationEvent.objects.count(), 1)
+
+    def test_record_checks_reports_row_errors(self):
+        """Test invalid rows and other users' instruments are reported."""
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+        )
+        foreign = create_instrument(other_user)
+        checked_at = LAST_CHECKED + timedelta(days=1)
+        payload = [
+            event_payload(self.instrument, checked_at),
+            event_payload(foreign, checked_at),
+            event_payload(self.instrument, timezone.now() + timedelta(1)),
+            event_payload(self.instrument, checked_at, result='unknown'),
+        ]
+
+        res = self.client.post(CALIBRATIONS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['succeeded'], 1)
+        self.assertEqual(
+            [(error['index'], list(error['errors']))
+             for error in res.data['errors']],
+            [(1, ['instrument']), (2, ['checked_at']), (3, ['result'])],
+        )
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.last_checked, LAST_CHECKED)
+        self.assertFalse(
+            CalibrationEvent.objects.filter(instrument=foreign).exists(),
+        )
+
+    def test_record_checks_all_invalid(self):
+        """Test a batch without any valid row fails with 400."""
+        res = self.client.post(
+            CALIBRATIONS_URL,
+            [event_payload(self.instrument, LAST_CHECKED, result='')],
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['succeeded'], 0)
+
+    def test_record_checks_requires_list(self):
+        """Test a single event must still be sent as a list."""
+        res = self.client.post(
+            CALIBRATIONS_URL,
+            event_payload(self.instrument, LAST_CHECKED),
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_checks(self):
+        """Test listing the user's events, most recent check first."""
+        other = create_instrument(self.user, tag='11-FV-02')
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+        )
+        for days, instrument in [(1, self.instrument), (3, other),
+                                 (2, self.instrument)]:
+            CalibrationEvent.objects.create(
+                user=self.user,
+                instrument=instrument,
+                checked_at=LAST_CHECKED + timedelta(days),
+                result=CalibrationEvent.PASS,
+                technician='J. Smith',
+            )
+        CalibrationEvent.objects.create(
+            user=other_user,
+            instrument=create_instrument(other_user),
+            checked_at=LAST_CHECKED,
+            result=CalibrationEvent.PASS,
+            technician='J. Smith',
+        )
+
+        res = self.client.get(CALIBRATIONS_URL)
+        filtered = self.client.get(CALIBRATIONS_URL, {
+            'instrument': self.instrument.id,
+            'since': (LAST_CHECKED + timedelta(days=2)).isoformat(),
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(event['instrument'], event['checked_at'][:10])
+             for event in res.data['results']],
+            [(other.id, '2024-01-04'), (self.instrument.id, '2024-01-03'),
+             (self.instrument.id, '2024-01-02')],
+        )
+        self.assertEqual(
+            [event['checked_at'][:10] for event in filtered.data['results']],
+            ['2024-01-03'],
+        )
+
+    def test_list_rejects_invalid_instrument(self):
+        """Test a non integer instrument filter is a 400."""
+        res = self.client.get(CALIBRATIONS_URL, {'instrument': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
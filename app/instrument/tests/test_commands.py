@@ -0,0 +1,58 @@
+"""
+Test instrument management commands.
+"""
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import Instrument
+
+
+class ImportInstrumentsCommandTests(TestCase):
+    """Test the import_instruments command."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+
+    def write_csv(self, rows):
+        """Write a register with ``rows`` and return its path."""
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as file:
+            file.write(
+                'tag,unit,description,type,manufacturer,serial_no,'
+                'interval,last_checked\n'
+            )
+            for i in range(rows):
+                file.write(
+                    f'11-FV-{i:03d},1100,GO FLOW,CONTROL VALVE,EMERSON,'
+                    f'SN{i},90,2021-01-01\n'
+                )
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_in_chunks(self):
+        """Test the command imports every chunk of the file."""
+        path = self.write_csv(25)
+
+        call_command(
+            'import_instruments',
+            path,
+            user=self.user.email,
+            chunksize=10,
+        )
+
+        self.assertEqual(Instrument.objects.filter(user=self.user).count(), 25)
+
+    def test_import_unknown_user(self):
+        """Test the command fails for an unknown user."""
+        path = self.write_csv(1)
+
+        with self.assertRaises(CommandError):
+            call_command('import_instruments', path, user='no@example.com')
@@ -1,22 +1,38 @@
 """
 Tests for instrument APIs.
 """
+import csv
+import json
+import threading
+from base64 import b64decode
 from decimal import Decimal  # noqa
-from datetime import datetime
+from unittest import skipUnless
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+from datetime import datetime, timedelta
 from django.utils import timezone
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
-from core.models import Instrument
+from core import stats
+from core.models import Instrument, InstrumentStats
 
+from instrument import cache as list_cache
+from instrument.pagination import InstrumentCursorPagination
 from instrument.serializers import (
     InstrumentSerializer,
     InstrumentDetailSerializer,
+    InstrumentListSerializer,
 )
 
 from rest_framework.test import APITestCase  # noqa
@@ -24,8 +40,15 @@ from django.core.files.uploadedfile import SimpleUploadedFile  # noqa
 import io  # noqa
 
 INSTRUMENTS_URL = reverse('instrument:instrument-list')
+BULK_URL = reverse('instrument:instrument-bulk')
+IMPORT_URL = reverse('instrument:instrument-import-file')
+EXPORT_URL = reverse('instrument:instrument-export')
+SUMMARY_URL = reverse('instrument:instrument-summary')
 # BULK_UPLOAD_URL = reverse('instrument:bulk-upload')
 
+CSV_HEADER = 'tag,unit,description,type,manufacturer,serial_no,interval,' \
+    'last_checked,notes,link\n'
+
 
 def detail_url(instrument_id):
     """Create and return a instrument detail URL."""
@@ -53,6 +76,25 @@ def create_instrument(user, **params):
     return instrument
 
 
+def instrument_payload(**params):
+    """Return a sample instrument payload for the write APIs."""
+    payload = {
+        'tag': "11-FV-01",
+        'unit': "1100",
+        'description': "GO FLOW",
+        'type': "CONTROL VALVE",
+        'manufacturer': "EMERSON",
+        'serial_no': "123456EU",
+        'interval': 100,
+        'created_at': timezone.now(),
+        'last_checked': timezone.make_aware(datetime(2021, 1, 1)),
+        'notes': "01/01/2020: Created",
+        'link': "http://example.com/instrument.pdf",
+    }
+    payload.update(params)
+    return payload
+
+
 def create_user(**params):
     """Create and return a new user."""
     return get_user_model().objects.create_user(**params)
@@ -82,6 +124,8 @@ class PrivateInstrumentApiTests(TestCase):
         # )
         self.user = create_user(email='user@example.com', password='test123')
         self.client.force_authenticate(self.user)
+        cache.clear()
+        list_cache.reset_stats()
 
     def test_retrieve_instruments(self):
         """Test retrieving a list of instruments."""
@@ -93,7 +137,7 @@ class PrivateInstrumentApiTests(TestCase):
         instruments = Instrument.objects.all().order_by('-id')
         serializer = InstrumentSerializer(instruments, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_instrument_list_limited_to_user(self):
         """Test list of instruments is limited to authenticated user."""
@@ -110,7 +154,304 @@ class PrivateInstrumentApiTests(TestCase):
         instruments = Instrument.objects.filter(user=self.user)
         serializer = InstrumentSerializer(instruments, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_list_is_cursor_paginated(self):
+        """Test the list is split into pages linked by opaque cursors."""
+        for i in range(5):
+            create_instrument(user=self.user, tag=f'11-FV-0{i}')
+
+        res = self.client.get(INSTRUMENTS_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNone(res.data['previous'])
+        self.assertIn('cursor=', res.data['next'])
+
+        seen = [item['id'] for item in res.data['results']]
+        next_url = res.data['next']
+        while next_url:
+            res = self.client.get(next_url)
+            seen += [item['id'] for item in res.data['results']]
+            next_url = res.data['next']
+
+        expected = Instrument.objects.filter(
+            user=self.user,
+        ).order_by('-id').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_list_page_size_is_bounded(self):
+        """Test clients cannot request more than the maximum page size."""
+        for i in range(3):
+            create_instrument(user=self.user)
+
+        with patch.object(InstrumentCursorPagination, 'max_page_size', 2):
+            res = self.client.get(INSTRUMENTS_URL, {'page_size': 10 ** 6})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_list_serializer_matches_model_serializer(self):
+        """Test the list fast path renders byte-identical JSON."""
+        create_instrument(user=self.user)
+        create_instrument(
+            user=self.user,
+            last_checked=timezone.make_aware(
+                datetime(2021, 6, 1, 10, 30, 15, 123456),
+            ),
+            notes='',
+            link='',
+        )
+        instruments = Instrument.objects.filter(
+            user=self.user,
+        ).order_by('-id')
+        rows = instruments.values(*InstrumentListSerializer.Meta.fields)
+
+        for zone in ('UTC', 'Europe/Athens'):
+            with timezone.override(zone):
+                expected = JSONRenderer().render(
+                    InstrumentSerializer(instruments, many=True).data
+                )
+                rendered = JSONRenderer().render(
+                    InstrumentListSerializer(rows, many=True).data
+                )
+            self.assertEqual(rendered, expected)
+
+    def test_filter_due_before(self):
+        """Test filtering instruments due before a date."""
+        due = create_instrument(
+            user=self.user,
+            last_checked=timezone.make_aware(datetime(2021, 1, 1)),
+            interval=30,
+        )
+        create_instrument(
+            user=self.user,
+            last_checked=timezone.make_aware(datetime(2021, 1, 1)),
+            interval=60,
+        )
+
+        res = self.client.get(INSTRUMENTS_URL, {'due_before': '2021-02-15'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [due.id],
+        )
+
+    def test_filter_due_before_invalid(self):
+        """Test an invalid due_before value returns an error."""
+        res = self.client.get(INSTRUMENTS_URL, {'due_before': 'soon'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_overdue(self):
+        """Test filtering overdue and not overdue instruments."""
+        overdue = create_instrument(user=self.user)
+        current = create_instrument(
+            user=self.user,
+            last_checked=timezone.now(),
+        )
+
+        res = self.client.get(INSTRUMENTS_URL, {'overdue': 'true'})
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [overdue.id],
+        )
+
+        res = self.client.get(INSTRUMENTS_URL, {'overdue': 'false'})
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [current.id],
+        )
+
+    def test_filter_exact_fields(self):
+        """Test filtering by type, manufacturer and unit."""
+        match = create_instrument(user=self.user, type='ANALYZER', unit='1200')
+        create_instrument(user=self.user, type='ANALYZER', unit='1300')
+        create_instrument(user=self.user, unit='1200')
+
+        res = self.client.get(
+            INSTRUMENTS_URL,
+            {'type': 'ANALYZER', 'manufacturer': 'EMERSON', 'unit': '1200'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [match.id],
+        )
+
+    def test_filter_tag_prefix(self):
+        """Test the tag filter matches the start of the tag."""
+        match = create_instrument(user=self.user, tag='11-PT-01')
+        create_instrument(user=self.user, tag='12-PT-01')
+        create_instrument(user=self.user, tag='11-FT-01')
+
+        res = self.client.get(INSTRUMENTS_URL, {'tag': '11-PT'})
+
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [match.id],
+        )
+
+    def test_search(self):
+        """Test searching tags, descriptions and notes."""
+        by_tag = create_instrument(user=self.user, tag='11-XV-01')
+        by_notes = create_instrument(user=self.user, notes='Replaced xv seal')
+        create_instrument(user=self.user)
+        other_user = create_user(email='other@example.com', password='test123')
+        create_instrument(user=other_user, tag='11-XV-02')
+
+        res = self.client.get(INSTRUMENTS_URL, {'search': 'xv'})
+
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [by_notes.id, by_tag.id],
+        )
+
+    def test_ordering(self):
+        """Test ordering by an allowed field pages in a stable order."""
+        for tag in ['11-FV-03', '11-FV-01', '11-FV-02', '11-FV-01']:
+            create_instrument(user=self.user, tag=tag)
+
+        seen = []
+        next_url = INSTRUMENTS_URL + '?ordering=tag&page_size=1'
+        while next_url:
+            res = self.client.get(next_url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen += [item['id'] for item in res.data['results']]
+            next_url = res.data['next']
+
+        expected = Instrument.objects.filter(
+            user=self.user,
+        ).order_by('tag', 'id').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_ordering_pages_through_equal_values(self):
+        """Test rows sharing updated_at are paged by (updated_at, id)."""
+        for _ in range(5):
+            create_instrument(user=self.user)
+        Instrument.objects.filter(user=self.user).update(
+            updated_at=timezone.now(),
+        )
+
+        seen = []
+        next_url = INSTRUMENTS_URL + '?ordering=-updated_at&page_size=2'
+        while next_url:
+            res = self.client.get(next_url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen += [item['id'] for item in res.data['results']]
+            next_url = res.data['next']
+            if next_url:
+                # The position is unique so no OFFSET is needed.
+                cursor = parse_qs(urlparse(next_url).query)['cursor'][0]
+                self.assertNotIn('o', parse_qs(b64decode(cursor).decode()))
+
+        expected = Instrument.objects.filter(
+            user=self.user,
+        ).order_by('-updated_at', '-id').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
+
+        res = self.client.get(res.data['previous'])
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            list(expected)[2:4],
+        )
+
+    def test_ordering_unknown_field_ignored(self):
+        """Test ordering by a field that is not allowed falls back to -id."""
+        instruments = [create_instrument(user=self.user) for _ in range(3)]
+
+        res = self.client.get(INSTRUMENTS_URL, {'ordering': 'notes'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [instrument.id for instrument in reversed(instruments)],
+        )
+
+    def test_list_sparse_fields(self):
+        """Test ?fields= limits the list output and the selected columns."""
+        instrument = create_instrument(user=self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                INSTRUMENTS_URL,
+                {'fields': 'id,tag,last_checked'},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        expected = InstrumentSerializer(instrument).data
+        self.assertEqual(res.data['results'], [{
+            'id': expected['id'],
+            'tag': expected['tag'],
+            'last_checked': expected['last_checked'],
+        }])
+        select = [
+            query['sql'] for query in queries.captured_queries
+            if '"core_instrument"."tag"' in query['sql']
+        ]
+        self.assertEqual(len(select), 1)
+        self.assertNotIn('"notes"', select[0])
+
+    def test_list_sparse_fields_exclude(self):
+        """Test ?exclude= drops fields from the list output."""
+        create_instrument(user=self.user)
+
+        res = self.client.get(INSTRUMENTS_URL, {'exclude': 'notes,link'})
+
+        self.assertEqual(
+            list(res.data['results'][0]),
+            [
+                field for field in InstrumentSerializer.Meta.fields
+                if field not in ('notes', 'link')
+            ],
+        )
+
+    def test_list_sparse_fields_with_ordering(self):
+        """Test cursor pages work when the ordering field is not selected."""
+        for i in range(3):
+            create_instrument(user=self.user, serial_no=f'SN{i}')
+
+        seen = []
+        next_url = INSTRUMENTS_URL + \
+            '?fields=tag&ordering=-updated_at&page_size=2'
+        while next_url:
+            res = self.client.get(next_url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                {key for item in res.data['results'] for key in item},
+                {'tag'},
+            )
+            seen += res.data['results']
+            next_url = res.data['next']
+
+        self.assertEqual(len(seen), 3)
+
+    def test_sparse_fields_unknown(self):
+        """Test unknown field names are rejected."""
+        res = self.client.get(INSTRUMENTS_URL, {'fields': 'id,secret'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', res.data)
+
+        res = self.client.get(INSTRUMENTS_URL, {'exclude': ','.join(
+            InstrumentSerializer.Meta.fields,
+        )})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_detail_sparse_fields(self):
+        """Test ?fields= limits the detail output."""
+        instrument = create_instrument(user=self.user)
+
+        res = self.client.get(
+            detail_url(instrument.id),
+            {'fields': 'id,tag,last_checked'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(res.data), ['id', 'tag', 'last_checked'])
 
     def test_get_instrument_detail(self):
         """Test get instrument detail."""
@@ -155,6 +496,63 @@ class PrivateInstrumentApiTests(TestCase):
             else:
                 self.assertEqual(getattr(instrument, k), v)
 
+    def test_create_instrument_interval_out_of_range(self):
+        """Test intervals outside 1 to 100 years are rejected."""
+        payload = {
+            'tag': '11-FV-01',
+            'type': 'CONTROL VALVE',
+            'last_checked': '2021-01-01T00:00:00Z',
+        }
+
+        for interval in (0, 36501, 10000000):
+            res = self.client.post(
+                INSTRUMENTS_URL,
+                {**payload, 'interval': interval},
+                format='json',
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('interval', res.data)
+        self.assertFalse(Instrument.objects.filter(user=self.user).exists())
+
+    def test_create_instrument_queries(self):
+        """Test a create is one write query, plus auth on a cache miss."""
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        payload = {
+            'tag': '11-FV-01',
+            'unit': '1100',
+            'description': 'GO FLOW',
+            'type': 'CONTROL VALVE',
+            'manufacturer': 'EMERSON',
+            'serial_no': '123456EU',
+            'interval': 30,
+            'last_checked': '2021-01-01T00:00:00Z',
+        }
+
+        with self.assertNumQueries(2):
+            res = client.post(INSTRUMENTS_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(1):
+            res = client.post(INSTRUMENTS_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        instrument = Instrument.objects.get(id=res.data['id'])
+        self.assertEqual(instrument.user, self.user)
+        self.assertEqual(
+            res.data,
+            InstrumentDetailSerializer(instrument).data,
+        )
+        if connection.vendor == 'postgresql':
+            # Counted by the INSERT itself rather than after the commit.
+            stats = InstrumentStats.objects.get(
+                user=self.user,
+                type='CONTROL VALVE',
+            )
+            self.assertEqual(stats.count, 2)
+            self.assertEqual(stats.earliest_next_check, instrument.next_check)
+
     def test_partial_update(self):
         """Test partial update of a instrument."""
         original_link = 'https://example.com/instrument.pdf'
@@ -264,3 +662,512 @@ class PrivateInstrumentApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
         self.assertTrue(Instrument.objects.filter(id=instrument.id).exists())
+
+    def test_summary(self):
+        """Test the due summary counts per type and manufacturer."""
+        now = timezone.now()
+
+        def due_in(days, **params):
+            return create_instrument(
+                user=self.user,
+                last_checked=now - timedelta(days=10),
+                interval=10 + days,
+                **params,
+            )
+
+        due_in(-1)
+        due_in(3)
+        due_in(20)
+        due_in(90)
+        due_in(3, manufacturer='ABB')
+        other_user = create_user(email='other@example.com', password='test123')
+        create_instrument(user=other_user)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            {
+                'type': 'CONTROL VALVE',
+                'manufacturer': 'ABB',
+                'total': 1,
+                'overdue': 0,
+                'due_7_days': 1,
+                'due_30_days': 1,
+            },
+            {
+                'type': 'CONTROL VALVE',
+                'manufacturer': 'EMERSON',
+                'total': 4,
+                'overdue': 1,
+                'due_7_days': 1,
+                'due_30_days': 2,
+            },
+        ])
+        self.assertEqual(res.data['totals'], {
+            'total': 5,
+            'overdue': 1,
+            'due_7_days': 2,
+            'due_30_days': 3,
+        })
+
+    def test_summary_uses_filters(self):
+        """Test the due summary honours the list filters."""
+        create_instrument(user=self.user)
+        create_instrument(user=self.user, manufacturer='ABB')
+
+        res = self.client.get(SUMMARY_URL, {'manufacturer': 'ABB'})
+
+        self.assertEqual(
+            [group['manufacturer'] for group in res.data['results']],
+            ['ABB'],
+        )
+
+    def test_bulk_create(self):
+        """Test creating a list of instruments in one request."""
+        payload = [instrument_payload(tag=f'11-FV-0{i}') for i in range(3)]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['succeeded'], 3)
+        self.assertEqual(res.data['errors'], [])
+        tags = Instrument.objects.filter(
+            user=self.user,
+        ).values_list('tag', flat=True)
+        self.assertEqual(sorted(tags), ['11-FV-00', '11-FV-01', '11-FV-02'])
+
+    def test_bulk_create_reports_row_errors(self):
+        """Test invalid rows are reported without failing the batch."""
+        payload = [
+            instrument_payload(tag='11-FV-01'),
+            instrument_payload(tag='11-FV-02', interval='often'),
+            instrument_payload(tag='11-FV-03', unit='X' * 11),
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['succeeded'], 1)
+        self.assertEqual(
+            [(e['index'], list(e['errors'])) for e in res.data['errors']],
+            [(1, ['interval']), (2, ['unit'])],
+        )
+        self.assertEqual(Instrument.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_create_reports_out_of_range_dates(self):
+        """Test rows whose next check overflows are row errors."""
+        payload = [
+            instrument_payload(tag='11-FV-01'),
+            instrument_payload(tag='11-FV-02', interval=10000000),
+            instrument_payload(
+                tag='11-FV-03',
+                last_checked='9999-12-01T00:00:00Z',
+            ),
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['succeeded'], 1)
+        self.assertEqual(
+            [(e['index'], list(e['errors'])) for e in res.data['errors']],
+            [(1, ['interval']), (2, ['last_checked'])],
+        )
+
+    def test_bulk_create_all_invalid(self):
+        """Test a batch without any valid row returns an error."""
+        res = self.client.post(BULK_URL, [{'tag': 'x'}], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Instrument.objects.exists())
+
+    def test_bulk_requires_list(self):
+        """Test the bulk endpoint rejects a non-list body."""
+        res = self.client.post(BULK_URL, instrument_payload(), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        """Test partially updating a list of instruments."""
+        instruments = [create_instrument(user=self.user) for _ in range(2)]
+        other = create_instrument(
+            user=create_user(email='other@example.com', password='test123'),
+        )
+        payload = [
+            {'id': instruments[0].id, 'tag': 'NEW-01'},
+            {'id': instruments[1].id, 'interval': 10},
+            {'id': other.id, 'tag': 'STOLEN'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['succeeded'], 2)
+        self.assertEqual(res.data['errors'][0]['index'], 2)
+        for instrument in instruments + [other]:
+            instrument.refresh_from_db()
+        self.assertEqual(instruments[0].tag, 'NEW-01')
+        self.assertEqual(instruments[1].interval, 10)
+        self.assertEqual(
+            instruments[1].next_check,
+            instruments[1].last_checked + timedelta(days=10),
+        )
+        self.assertEqual(other.tag, '11-FV-01')
+
+    def test_bulk_update_rejects_overflow_and_boolean_ids(self):
+        """Test an overflowing date or an id of true is a row error."""
+        instrument = create_instrument(user=self.user)
+        payload = [
+            {'id': instrument.id, 'last_checked': '9999-12-01T00:00:00Z'},
+            {'id': True, 'tag': 'NEW-01'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [(e['index'], list(e['errors'])) for e in res.data['errors']],
+            [(0, ['last_checked']), (1, ['id'])],
+        )
+        instrument.refresh_from_db()
+        self.assertEqual(instrument.tag, '11-FV-01')
+        self.assertEqual(instrument.last_checked.year, 2021)
+
+    def test_bulk_delete(self):
+        """Test deleting a list of instruments by id."""
+        instruments = [create_instrument(user=self.user) for _ in range(2)]
+        other = create_instrument(
+            user=create_user(email='other@example.com', password='test123'),
+        )
+        payload = [instruments[0].id, other.id]
+
+        res = self.client.delete(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['ids'], [instruments[0].id])
+        self.assertEqual(res.data['errors'][0]['index'], 1)
+        self.assertFalse(
+            Instrument.objects.filter(id=instruments[0].id).exists()
+        )
+        self.assertTrue(Instrument.objects.filter(id=other.id).exists())
+
+    def test_bulk_delete_rejects_boolean_ids(self):
+        """Test JSON true is not taken for the id 1."""
+        instrument = create_instrument(user=self.user)
+
+        res = self.client.delete(BULK_URL, [True], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(res.data['errors'][0]['errors']), ['id'])
+        self.assertTrue(Instrument.objects.filter(id=instrument.id).exists())
+
+    def test_import_csv(self):
+        """Test importing instruments from an uploaded CSV file."""
+        content = CSV_HEADER + (
+            '11-FV-01,1100,GO FLOW,CONTROL VALVE,EMERSON,A1,100,'
+            '2021-01-01,,\n'
+            '11-FV-02,1100,GO FLOW,CONTROL VALVE,EMERSON,A2,never,'
+            '2021-01-01,,\n'
+            '11-FV-03,1100,GO FLOW,CONTROL VALVE,EMERSON,A3,30,'
+            '2021-01-01T10:00:00Z,"Line 1\nLine 2",http://x.com\n'
+        )
+        upload = SimpleUploadedFile(
+            'register.csv',
+            content.encode(),
+            content_type='text/csv',
+        )
+
+        res = self.client.post(IMPORT_URL, {'file': upload})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['rows'], 3)
+        self.assertEqual(res.data['imported'], 2)
+        self.assertEqual(res.data['errors'][0]['row'], 2)
+        self.assertIn('interval', res.data['errors'][0]['errors'])
+        instrument = Instrument.objects.get(user=self.user, tag='11-FV-03')
+        self.assertEqual(instrument.notes, 'Line 1\nLine 2')
+        self.assertEqual(
+            instrument.next_check,
+            instrument.last_checked + timedelta(days=30),
+        )
+
+    def test_import_xlsx(self):
+        """Test importing instruments from an uploaded XLSX file."""
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(CSV_HEADER.strip().split(','))
+        sheet.append([
+            '11-FV-01', 1100, 'GO FLOW', 'CONTROL VALVE', 'EMERSON', 'A1',
+            100, datetime(2021, 1, 1), None, None,
+        ])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        upload = SimpleUploadedFile('register.xlsx', buffer.getvalue())
+
+        res = self.client.post(IMPORT_URL, {'file': upload})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['imported'], 1)
+        instrument = Instrument.objects.get(user=self.user)
+        self.assertEqual(instrument.unit, '1100')
+        self.assertEqual(instrument.notes, '')
+
+    def test_import_corrupt_xlsx(self):
+        """Test a file that is not a workbook is rejected."""
+        upload = SimpleUploadedFile('register.xlsx', b'not a zip file')
+
+        res = self.client.post(IMPORT_URL, {'file': upload})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Instrument.objects.exists())
+
+    def test_import_out_of_range_rows(self):
+        """Test rows whose next check overflows are reported."""
+        content = CSV_HEADER + (
+            '11-FV-01,1100,GO FLOW,CONTROL VALVE,EMERSON,A1,10000000,'
+            '2021-01-01,,\n'
+            '11-FV-02,1100,GO FLOW,CONTROL VALVE,EMERSON,A2,36500,'
+            '2250-01-01,,\n'
+            '11-FV-03,1100,GO FLOW,CONTROL VALVE,EMERSON,A3,36500,'
+            '2021-01-01,,\n'
+        )
+        upload = SimpleUploadedFile('register.csv', content.encode())
+
+        res = self.client.post(IMPORT_URL, {'file': upload})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['imported'], 1)
+        self.assertEqual(
+            [(e['row'], list(e['errors'])) for e in res.data['errors']],
+            [(1, ['interval']), (2, ['last_checked'])],
+        )
+        instrument = Instrument.objects.get(user=self.user)
+        self.assertEqual(instrument.next_check.year, 2120)
+
+    def test_import_missing_columns(self):
+        """Test a file without the required columns is rejected."""
+        upload = SimpleUploadedFile('register.csv', b'tag,unit\nA,B\n')
+
+        res = self.client.post(IMPORT_URL, {'file': upload})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Instrument.objects.exists())
+
+    def test_export_csv(self):
+        """Test streaming the register of the user as CSV."""
+        instrument = create_instrument(user=self.user, notes='a, "b"\nc')
+        create_instrument(
+            user=create_user(email='other@example.com', password='test123'),
+        )
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        content = b''.join(res.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], str(instrument.id))
+        self.assertEqual(rows[0]['notes'], instrument.notes)
+        self.assertEqual(rows[0]['next_check'], '2021-04-11T00:00:00Z')
+
+    def test_export_ndjson(self):
+        """Test streaming the register of the user as NDJSON."""
+        instruments = [create_instrument(user=self.user) for _ in range(3)]
+
+        res = self.client.get(EXPORT_URL, {'file_format': 'ndjson'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [instrument.id for instrument in reversed(instruments)],
+        )
+        self.assertEqual(rows[0]['next_check'], '2021-04-11T00:00:00Z')
+
+    def test_export_unknown_format(self):
+        """Test an unknown export format returns an error."""
+        res = self.client.get(EXPORT_URL, {'file_format': 'pdf'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_conditional_get(self):
+        """Test an unchanged list is answered with 304 Not Modified."""
+        instrument = create_instrument(user=self.user)
+
+        res = self.client.get(INSTRUMENTS_URL)
+        etag = res['ETag']
+        self.assertIn('Last-Modified', res)
+
+        res = self.client.get(INSTRUMENTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(res.content, b'')
+
+        res = self.client.get(
+            INSTRUMENTS_URL,
+            {'page_size': 1},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        instrument.tag = 'NEW'
+        instrument.save()
+        res = self.client.get(INSTRUMENTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_list_etag_changes_on_delete(self):
+        """Test deleting an instrument invalidates the list ETag."""
+        first = create_instrument(user=self.user)
+        create_instrument(user=self.user)
+        etag = self.client.get(INSTRUMENTS_URL)['ETag']
+
+        first.delete()
+        res = self.client.get(INSTRUMENTS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_list_etag_per_user(self):
+        """Test ETags of different users never match."""
+        other = create_user(email='other@example.com', password='test123')
+        etag = self.client.get(INSTRUMENTS_URL)['ETag']
+
+        self.client.force_authenticate(other)
+        res = self.client.get(INSTRUMENTS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_detail_conditional_get(self):
+        """Test an unchanged instrument is answered with 304."""
+        instrument = create_instrument(user=self.user)
+        url = detail_url(instrument.id)
+
+        res = self.client.get(url)
+        etag, last_modified = res['ETag'], res['Last-Modified']
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(url, {'interval': 5})
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['interval'], 5)
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list request is served from the page cache."""
+        create_instrument(user=self.user)
+
+        first = self.client.get(INSTRUMENTS_URL)
+        second = self.client.get(INSTRUMENTS_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(list_cache.stats()['misses'], 1)
+        self.assertEqual(list_cache.stats()['hits'], 1)
+
+    def test_write_invalidates_cached_list(self):
+        """Test create, update and delete never leave a stale page."""
+        instrument = create_instrument(user=self.user)
+        self.client.get(INSTRUMENTS_URL)
+
+        self.client.post(INSTRUMENTS_URL, instrument_payload(tag='NEW-01'))
+        res = self.client.get(INSTRUMENTS_URL)
+        self.assertEqual(len(res.data['results']), 2)
+
+        self.client.patch(detail_url(instrument.id), {'tag': 'NEW-02'})
+        res = self.client.get(INSTRUMENTS_URL)
+        self.assertEqual(res.data['results'][1]['tag'], 'NEW-02')
+
+        self.client.delete(detail_url(instrument.id))
+        res = self.client.get(INSTRUMENTS_URL)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(list_cache.stats()['hits'], 0)
+        self.assertEqual(list_cache.stats()['invalidations'], 3)
+
+    def test_invalidate_drops_cached_pages(self):
+        """Test bumping the generation drops pages the ETag cannot see."""
+        instrument = create_instrument(user=self.user)
+        self.client.get(INSTRUMENTS_URL)
+        # A write that leaves the count, max id and updated_at untouched.
+        Instrument.objects.filter(id=instrument.id).update(
+            tag='SILENT',
+            updated_at=instrument.updated_at,
+        )
+
+        list_cache.invalidate(self.user.id)
+        res = self.client.get(INSTRUMENTS_URL)
+
+        self.assertEqual(res.data['results'][0]['tag'], 'SILENT')
+        self.assertEqual(list_cache.stats()['hits'], 0)
+
+
+class InstrumentCreateStatsTests(TransactionTestCase):
+    """Test the counting create API against committed statistics."""
+
+    def setUp(self):
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertCount(self, count):
+        """Assert the CONTROL VALVE bucket of the user counts ``count``."""
+        row = InstrumentStats.objects.filter(
+            user=self.user,
+            type='CONTROL VALVE',
+        ).first()
+        self.assertEqual(row and row.count, count)
+
+    def test_create_agrees_with_refresh(self):
+        """Test API creates add up with the refreshes after commit."""
+        self.client.post(INSTRUMENTS_URL, instrument_payload(tag='A'))
+        self.assertCount(1)
+        # A model create refreshes the bucket when it commits.
+        create_instrument(user=self.user, tag='B')
+        self.assertCount(2)
+        self.client.post(INSTRUMENTS_URL, instrument_payload(tag='C'))
+        self.assertCount(3)
+
+        stats.refresh({(self.user.pk, 'CONTROL VALVE')})
+        self.assertCount(3)
+
+    def test_model_create_sends_post_save(self):
+        """Test Instrument.objects.create() keeps save() and its signals."""
+        with patch('core.signals.stats.mark_stale') as mark_stale:
+            create_instrument(user=self.user)
+
+        mark_stale.assert_called_once()
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+    def test_refresh_waits_for_counted_create(self):
+        """Test a refresh during a create sees the committed instrument."""
+        bucket = (self.user.pk, 'CONTROL VALVE')
+
+        def refresh():
+            try:
+                stats.refresh({bucket})
+            finally:
+                connections.close_all()
+
+        with transaction.atomic():
+            Instrument.objects.create_counted(
+                user=self.user,
+                **instrument_payload(),
+            )
+            thread = threading.Thread(target=refresh)
+            thread.start()
+            thread.join(timeout=0.5)
+            self.assertTrue(thread.is_alive())
+        thread.join()
+
+        self.assertCount(1)
@@ -13,6 +13,11 @@ from instrument import views
 
 router = DefaultRouter()
 router.register('instruments', views.InstrumentViewSet)
+router.register(
+    'calibrations',
+    views.CalibrationEventViewSet,
+    basename='calibration',
+)
 
 app_name = 'instrument'
 
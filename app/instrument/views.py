@@ -1,38 +1,412 @@
 """
 Views for the instrument APIs
 """
-from rest_framework import viewsets
-from rest_framework.authentication import TokenAuthentication
+import csv
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import mixins, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Instrument
+from core.mixins import ReadReplicaMixin
+from core.models import CalibrationEvent, Instrument
+from instrument import cache as list_cache
+from instrument.analytics import analyze
 from instrument import serializers
+from instrument.conditional import make_etag, not_modified, set_validators
+from instrument.bulk import (
+    MAX_ROWS,
+    bulk_create,
+    bulk_delete,
+    bulk_update,
+    record_checks,
+)
+from instrument.filters import (
+    CalibrationEventFilter,
+    InstrumentFilter,
+    InstrumentOrderingFilter,
+    InstrumentSearchFilter,
+)
+from instrument.importers import ImportFormatError, import_instruments
+from instrument.pagination import (
+    CalibrationEventCursorPagination,
+    InstrumentCursorPagination,
+)
+from instrument.summary import due_summary
+from user.authentication import CachedTokenAuthentication
 
-import pandas as pd  # noqa
 from rest_framework.views import APIView  # noqa
 from rest_framework.response import Response  # noqa
 from rest_framework import status  # noqa
 
 
-class InstrumentViewSet(viewsets.ModelViewSet):
+EXPORT_FIELDS = serializers.InstrumentSerializer.Meta.fields
+EXPORT_CHUNK_SIZE = 2000
+SPARSE_FIELDS_PARAMS = ('fields', 'exclude')
+
+
+class Echo:
+    """File-like object that returns what is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv_rows(rows):
+    """Yield a CSV header and one CSV line per row."""
+    writer = csv.writer(Echo())
+    encoder = DjangoJSONEncoder()
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(
+            encoder.default(value) if isinstance(value, datetime) else value
+            for value in row
+        )
+
+
+def export_ndjson_rows(rows):
+    """Yield one JSON object per line for each row."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(EXPORT_FIELDS, row))) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', export_csv_rows),
+    'ndjson': ('application/x-ndjson', export_ndjson_rows),
+}
+
+
+def validate_batch(rows):
+    """Return ``rows`` if it is a list of at most MAX_ROWS items."""
+    if not isinstance(rows, list):
+        raise ValidationError({
+            'non_field_errors': ['Expected a list of items.'],
+        })
+    if len(rows) > MAX_ROWS:
+        raise ValidationError({'non_field_errors': [
+            f'Ensure this list has at most {MAX_ROWS} items.',
+        ]})
+    return rows
+
+
+class InstrumentViewSet(ReadReplicaMixin, viewsets.ModelViewSet):
     """View for manage instrument APIs."""
     # serializer_class = serializers.InstrumentSerializer
     serializer_class = serializers.InstrumentDetailSerializer
     queryset = Instrument.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = InstrumentCursorPagination
+    filter_backends = [
+        InstrumentFilter,
+        InstrumentSearchFilter,
+        InstrumentOrderingFilter,
+    ]
+    # Indexed columns, read by (field, id) keyset cursor pages.
+    ordering_fields = ['id', 'tag', 'serial_no', 'next_check', 'updated_at']
+    ordering = ['-id']
+
+    def get_sparse_fields(self):
+        """Return the fields picked with ?fields= and ?exclude= or None.
+
+        Both take comma separated field names. Unknown names are errors
+        rather than ignored so typos do not silently return everything.
+        """
+        params = self.request.query_params
+        if 'fields' not in params and 'exclude' not in params:
+            return None
+
+        available = serializers.InstrumentSerializer.Meta.fields
+        picked = {}
+        for name in SPARSE_FIELDS_PARAMS:
+            value = params.get(name)
+            if value is None:
+                continue
+            picked[name] = {field for field in value.split(',') if field}
+            unknown = picked[name] - set(available)
+            if unknown:
+                raise ValidationError({name: [
+                    'Unknown fields: ' + ', '.join(sorted(unknown)),
+                ]})
+
+        fields = [
+            field for field in available
+            if field in picked.get('fields', available)
+            and field not in picked.get('exclude', ())
+        ]
+        if not fields:
+            raise ValidationError({'fields': ['Select at least one field.']})
+        return fields
 
     def get_queryset(self):
         """Retrieve instruments for authenticated user."""
-        return self.queryset.filter(user=self.request.user).order_by('-id')
+        queryset = self.queryset.filter(
+            user=self.request.user,
+        ).order_by('-id')
+        if self.action == 'list':
+            fields = self.get_sparse_fields() or \
+                serializers.InstrumentListSerializer.Meta.fields
+            # The cursor pagination reads the ordering columns of each row.
+            ordering = InstrumentOrderingFilter().get_ordering(
+                self.request, queryset, self,
+            )
+            queryset = queryset.values(*dict.fromkeys([
+                *fields,
+                *(name.lstrip('-') for name in ordering),
+            ]))
+        elif self.action == 'retrieve':
+            fields = self.get_sparse_fields()
+            if fields:
+                queryset = queryset.only(*fields)
+        return queryset
 
     def get_serializer_class(self):
         """Return the serializer class for request."""
         if self.action == 'list':
-            return serializers.InstrumentSerializer
+            return serializers.InstrumentListSerializer
 
         return self.serializer_class
 
+    def get_serializer(self, *args, **kwargs):
+        """Return the serializer, limited to the sparse fields if any."""
+        if self.action in ('list', 'retrieve'):
+            kwargs.setdefault('fields', self.get_sparse_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_list_state_queryset(self):
+        """Return the aggregate the list validators are computed from.
+
+        It is one row per user that changes on every insert, update and
+        delete, or no row when the user has no instruments.
+        """
+        aggregates = {
+            'count': Count('id'),
+            'max_id': Max('id'),
+            'modified': Max('updated_at'),
+        }
+        if 'overdue' in self.request.query_params:
+            # Rows only ever become overdue, so their count pins the set.
+            aggregates['overdue'] = Count(
+                'id',
+                filter=Q(next_check__lt=timezone.now()),
+            )
+        return Instrument.objects.filter(
+            user=self.request.user,
+        ).order_by().values('user').annotate(**aggregates)
+
+    def get_list_validators(self, rows):
+        """Return the ETag and Last-Modified of the list state ``rows``."""
+        state = rows[0] if rows else {}
+        etag = make_etag(self.request, self.request.user.pk, *state.values())
+        return etag, state.get('modified')
+
+    def list(self, request, *args, **kwargs):
+        """List instruments, answering unchanged polls with 304.
+
+        Last-Modified is sent for information only: deletions do not move
+        max(updated_at), so If-Modified-Since is not trusted for lists.
+        """
+        etag, modified = self.get_list_validators(
+            list(self.get_list_state_queryset()),
+        )
+
+        response = not_modified(request, etag)
+        if response is None:
+            key = list_cache.page_key(request.user.pk, etag)
+            page = list_cache.get_page(key)
+            if page is not None:
+                content, content_type = page
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = super().list(request, *args, **kwargs)
+                response.add_post_render_callback(
+                    lambda rendered: list_cache.set_page(key, rendered)
+                )
+        return set_validators(response, etag, modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve an instrument, answering unchanged polls with 304."""
+        try:
+            modified = self.get_queryset().filter(
+                pk=kwargs[self.lookup_field],
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            modified = None
+        if modified is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = make_etag(request, kwargs[self.lookup_field], modified)
+        response = not_modified(request, etag, modified)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return set_validators(response, etag, modified)
+
     def perform_create(self, serializer):
-        """Create a new instrument."""
-        serializer.save(user=self.request.user)
+        """Create a new instrument, counted in its statistics by the INSERT."""
+        serializer.instance = Instrument.objects.create_counted(
+            user=self.request.user,
+            **serializer.validated_data,
+        )
+        list_cache.invalidate(self.request.user.pk)
+
+    def perform_update(self, serializer):
+        """Update an instrument."""
+        serializer.save()
+        list_cache.invalidate(self.request.user.pk)
+
+    def perform_destroy(self, instance):
+        """Delete an instrument."""
+        instance.delete()
+        list_cache.invalidate(self.request.user.pk)
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Count overdue and soon due instruments per type and manufacturer.
+
+        Honours the list filters, e.g. ``?manufacturer=`` or ``?search=``.
+        The counts depend on the current time, so there is no ETag.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(due_summary(queryset))
+
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """Overdue ratio, interval compliance and interval recommendations.
+
+        Grouped per type and manufacturer from the calibration history,
+        see instrument.analytics. Honours the list filters like summary.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        events = CalibrationEvent.objects.filter(user=request.user)
+        return Response(analyze(queryset, events))
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        """Create, update or delete a list of instruments at once.
+
+        POST takes a list of instruments, PATCH a list of partial
+        instruments with their ``id`` and DELETE a list of ids. Rows are
+        written in chunked transactions and each failing row is reported
+        with its index instead of failing the whole batch.
+        """
+        rows = validate_batch(request.data)
+        if request.method == 'DELETE':
+            result = bulk_delete(request.user, rows)
+        else:
+            serializer = serializers.InstrumentSerializer(
+                data=rows,
+                many=True,
+                partial=request.method == 'PATCH',
+                context=self.get_serializer_context(),
+            )
+            if request.method == 'POST':
+                result = bulk_create(request.user, serializer)
+            else:
+                result = bulk_update(request.user, serializer)
+        if result['succeeded']:
+            list_cache.invalidate(request.user.pk)
+
+        if result['errors'] and not result['succeeded']:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        if request.method == 'POST':
+            return Response(result, status=status.HTTP_201_CREATED)
+        return Response(result)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        parser_classes=[MultiPartParser],
+    )
+    def import_file(self, request):
+        """Import instruments from an uploaded CSV or XLSX ``file``."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': ['No file was submitted.']})
+
+        try:
+            summary = import_instruments(
+                request.user,
+                upload,
+                name=upload.name,
+            )
+        except ImportFormatError as exc:
+            raise ValidationError({'file': [str(exc)]})
+        finally:
+            # Chunks committed before an error are visible already.
+            list_cache.invalidate(request.user.pk)
+
+        return Response(summary, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the user's instrument register as CSV or NDJSON.
+
+        Rows are read with a server side cursor and written as they
+        arrive, so memory use does not grow with the size of the register.
+        Choose the format with ``?file_format=csv|ndjson``.
+        """
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            raise ValidationError({'file_format': [
+                'Choose one of: ' + ', '.join(EXPORT_FORMATS),
+            ]})
+
+        content_type, render_rows = EXPORT_FORMATS[file_format]
+        queryset = self.filter_queryset(self.get_queryset())
+        # Rows are read after the view returned, pick the database now.
+        rows = queryset.using(queryset.db).values_list(
+            *EXPORT_FIELDS,
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(
+            render_rows(rows),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="instruments.{file_format}"'
+        )
+        return response
+
+
+class CalibrationEventViewSet(
+    ReadReplicaMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    """List and record the calibration history of the user's instruments.
+
+    Events are append-only. POST takes a list of events, written like
+    ``InstrumentViewSet.bulk``, and moves ``last_checked`` of their
+    instruments in the same transactions.
+    """
+    serializer_class = serializers.CalibrationEventSerializer
+    queryset = CalibrationEvent.objects.all()
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = CalibrationEventCursorPagination
+    filter_backends = [CalibrationEventFilter]
+
+    def get_queryset(self):
+        """Retrieve calibration events for authenticated user."""
+        return self.queryset.filter(user=self.request.user)
+
+    def create(self, request):
+        """Record a list of calibration events."""
+        serializer = self.get_serializer(
+            data=validate_batch(request.data),
+            many=True,
+        )
+        result = record_checks(request.user, serializer)
+        if result['succeeded']:
+            list_cache.invalidate(request.user.pk)
+
+        if result['errors'] and not result['succeeded']:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
@@ -0,0 +1,155 @@
+"""
+Authentication for the APIs.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+
+DEFAULTS = {
+    # Seconds a token stays cached. This also bounds how long another
+    # process can keep accepting a token after it was revoked.
+    'TIMEOUT': 30,
+    # Maximum number of tokens kept in the in-process cache.
+    'MAX_SIZE': 10000,
+    # Optional Django cache alias shared between processes.
+    'CACHE_ALIAS': None,
+}
+
+
+def get_config():
+    """Return the TOKEN_AUTH_CACHE settings merged with the defaults."""
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ``timeout``."""
+
+    def __init__(self, max_size, timeout, clock=time.monotonic):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value for ``key`` or None if missing or expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= self.clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Store ``value`` and evict the least recently used entries."""
+        with self._lock:
+            self._data[key] = (self.clock() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """Remove ``key`` if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_local_cache = None
+_local_cache_lock = threading.Lock()
+
+
+def get_local_cache():
+    """Return the process wide token cache, creating it on first use."""
+    global _local_cache
+    if _local_cache is None:
+        with _local_cache_lock:
+            if _local_cache is None:
+                config = get_config()
+                _local_cache = TTLCache(config['MAX_SIZE'], config['TIMEOUT'])
+    return _local_cache
+
+
+def get_shared_cache():
+    """Return the configured Django cache or None."""
+    alias = get_config()['CACHE_ALIAS']
+    return caches[alias] if alias else None
+
+
+def cache_key(key):
+    """Return the cache key for a token without storing the token."""
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_token(key):
+    """Forget the cached user of token ``key``."""
+    name = cache_key(key)
+    get_local_cache().delete(name)
+    shared = get_shared_cache()
+    if shared is not None:
+        shared.delete(name)
+
+
+def clear_token_cache():
+    """Forget every token cached in this process."""
+    get_local_cache().clear()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the token's user.
+
+    Lookups go to a bounded in-process LRU cache first, then to the
+    optional shared Django cache and only then to the database. Entries
+    are removed when the token is deleted or its user changes.
+    """
+
+    def get_cached_credentials(self, key):
+        """Return ``(user, token)`` from the in-process cache or None.
+
+        Never touches the database or a shared cache, so async code can
+        call it without leaving the event loop.
+        """
+        cached = get_local_cache().get(cache_key(key))
+        if cached is None:
+            return None
+        user, token = cached
+        return copy.copy(user), token
+
+    def authenticate_credentials(self, key):
+        name = cache_key(key)
+        local = get_local_cache()
+        cached = local.get(name)
+
+        shared = get_shared_cache()
+        if cached is None and shared is not None:
+            cached = shared.get(name)
+            if cached is not None:
+                local.set(name, cached)
+
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            local.set(name, cached)
+            if shared is not None:
+                shared.set(name, cached, get_config()['TIMEOUT'])
+
+        user, token = cached
+        # Requests may modify their user, keep the cached one pristine.
+        return copy.copy(user), token
@@ -0,0 +1,162 @@
+"""
+Password hashers and admission of password hash computations.
+
+Logins, sign ups and password changes each compute a deliberately slow
+hash. ``hashing_slot`` caps how many run at once in a process so a login
+storm queues for a few seconds, then gets 429 responses, instead of
+taking every worker thread away from the other requests.
+"""
+import base64
+import hashlib
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_noop as _
+from rest_framework.exceptions import Throttled
+
+
+DEFAULTS = {
+    # Password hashes computed at once per process.
+    'MAX_CONCURRENT': 2,
+    # Seconds a request waits for a slot before it is turned away.
+    'TIMEOUT': 5,
+}
+
+_semaphores = {}
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def get_config():
+    """Return the PASSWORD_HASHING settings merged with the defaults."""
+    return {**DEFAULTS, **getattr(settings, 'PASSWORD_HASHING', {})}
+
+
+def _get_semaphore(size):
+    with _lock:
+        if size not in _semaphores:
+            _semaphores[size] = threading.BoundedSemaphore(size)
+        return _semaphores[size]
+
+
+def _count(name):
+    with _lock:
+        _counters[name] += 1
+
+
+def stats():
+    """Return the admitted and rejected counters of this process."""
+    with _lock:
+        return {name: _counters[name] for name in ('admitted', 'rejected')}
+
+
+@contextmanager
+def hashing_slot():
+    """Hold one of the process's password hashing slots.
+
+    Raises ``Throttled`` when no slot frees up within the timeout.
+    """
+    config = get_config()
+    semaphore = _get_semaphore(config['MAX_CONCURRENT'])
+    if not semaphore.acquire(timeout=config['TIMEOUT']):
+        _count('rejected')
+        raise Throttled(wait=max(config['TIMEOUT'], 1))
+    _count('admitted')
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2id with the parameters recommended by OWASP.
+
+    Django 3.2 defaults to 100 MiB of memory over 8 lanes, several times
+    the CPU time per login. Hashes made with other parameters are upgraded
+    on the next login.
+    """
+    time_cost = 2
+    memory_cost = 19456
+    parallelism = 1
+
+
+class ScryptPasswordHasher(hashers.BasePasswordHasher):
+    """Secure password hashing using the scrypt algorithm.
+
+    Backport of the Django 4.0 hasher, its hashes stay valid after
+    upgrading.
+    """
+    algorithm = 'scrypt'
+    block_size = 8
+    maximum_memory = 0
+    parallelism = 1
+    work_factor = 2 ** 14
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        assert password is not None
+        assert salt and '$' not in salt
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=n,
+            r=r,
+            p=p,
+            maxmem=self.maximum_memory,
+            dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
+
+    def decode(self, encoded):
+        algorithm, work_factor, salt, block_size, parallelism, hash_ = \
+            encoded.split('$', 6)
+        assert algorithm == self.algorithm
+        return {
+            'algorithm': algorithm,
+            'work_factor': int(work_factor),
+            'salt': salt,
+            'block_size': int(block_size),
+            'parallelism': int(parallelism),
+            'hash': hash_,
+        }
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = self.encode(
+            password,
+            decoded['salt'],
+            decoded['work_factor'],
+            decoded['block_size'],
+            decoded['parallelism'],
+        )
+        return constant_time_compare(encoded, encoded_2)
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return {
+            _('algorithm'): decoded['algorithm'],
+            _('work factor'): decoded['work_factor'],
+            _('block size'): decoded['block_size'],
+            _('parallelism'): decoded['parallelism'],
+            _('salt'): hashers.mask_hash(decoded['salt'], show=2),
+            _('hash'): hashers.mask_hash(decoded['hash']),
+        }
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return (
+            decoded['work_factor'] != self.work_factor or
+            decoded['block_size'] != self.block_size or
+            decoded['parallelism'] != self.parallelism
+        )
+
+    def harden_runtime(self, password, encoded):
+        # The runtime for scrypt is too long to be hardened.
+        pass
@@ -0,0 +1,100 @@
+"""
+Django command to benchmark token logins with each password hasher.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+
+from core import benchmarks
+from user.serializers import AuthTokenSerializer
+
+
+PASSWORD = 'bench-password-123'
+BASELINE = 'pbkdf2_sha256'
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark user at the end of a run."""
+
+
+class Command(BaseCommand):
+    """Time ``AuthTokenSerializer`` validation, the login path."""
+
+    help = (
+        'Measure logins per second per core with each password hasher, '
+        f'compared to Django\'s default {BASELINE}.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hashers',
+            help='Comma separated hasher paths, default PASSWORD_HASHERS.',
+        )
+        parser.add_argument('--logins', type=int, default=20)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        paths = settings.PASSWORD_HASHERS
+        if options['hashers']:
+            paths = options['hashers'].split(',')
+
+        try:
+            with transaction.atomic():
+                user = benchmarks.create_benchmark_user(
+                    f'bench-{uuid.uuid4().hex}@example.com',
+                )
+                results = {}
+                for path in paths:
+                    hasher = import_string(path)()
+                    if hasher.library:
+                        try:
+                            hasher._load_library()
+                        except ValueError as exc:
+                            self.stdout.write(f'{path}: {exc}')
+                            continue
+                    results[path] = hasher.algorithm, self.time_logins(
+                        user,
+                        path,
+                        options['logins'],
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+
+        baseline = next((
+            cpu_ms for algorithm, (_, cpu_ms) in results.values()
+            if algorithm == BASELINE
+        ), None)
+        for path, (algorithm, (wall_ms, cpu_ms)) in results.items():
+            line = (
+                f'{path}\n    median {wall_ms:7.1f} ms  '
+                f'{1000 / cpu_ms:7.1f} logins/s/core'
+            )
+            if baseline:
+                line += f'  {baseline / cpu_ms:5.1f}x {BASELINE}'
+            self.stdout.write(line)
+
+    def time_logins(self, user, path, logins):
+        """Return the median wall time and mean CPU time of a login."""
+        with override_settings(PASSWORD_HASHERS=[path]):
+            user.set_password(PASSWORD)
+            user.save(update_fields=['password'])
+
+            def login():
+                serializer = AuthTokenSerializer(data={
+                    'email': user.email,
+                    'password': PASSWORD,
+                })
+                serializer.is_valid(raise_exception=True)
+
+            login()
+            start = time.process_time()
+            timings = benchmarks.time_call(login, logins)
+            cpu_ms = (time.process_time() - start) * 1000 / logins
+
+        return benchmarks.median(timings), cpu_ms
@@ -0,0 +1,28 @@
+"""
+Signal handlers for the user app.
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_token
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    """Drop a cached token when it is replaced or revoked."""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def forget_user_tokens(sender, instance, created, **kwargs):
+    """Drop cached tokens of a user that changed, e.g. was deactivated."""
+    if created:
+        return
+    for key in Token.objects.filter(user=instance).values_list(
+        'key',
+        flat=True,
+    ):
+        invalidate_token(key)
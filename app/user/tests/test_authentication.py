@@ -0,0 +1,103 @@
+"""
+Tests for the cached token authentication.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import TTLCache, clear_token_cache
+
+
+ME_URL = reverse('user:me')
+
+
+class TTLCacheTests(SimpleTestCase):
+    """Test the bounded in-process cache."""
+
+    def setUp(self):
+        self.now = 0
+        self.cache = TTLCache(max_size=2, timeout=10, clock=lambda: self.now)
+
+    def test_entries_expire(self):
+        """Test entries are dropped after the timeout."""
+        self.cache.set('a', 1)
+        self.now = 9
+        self.assertEqual(self.cache.get('a'), 1)
+
+        self.now = 10
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_least_recently_used_evicted(self):
+        """Test the cache never holds more than max_size entries."""
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.get('c'), 3)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token authentication through the cache."""
+
+    def setUp(self):
+        clear_token_cache()
+        self.addCleanup(clear_token_cache)
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_token_skips_database(self):
+        """Test repeated requests do not query the token table."""
+        # The view reads the user itself.
+        with self.assertNumQueries(2):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn(Token._meta.db_table, queries[0]['sql'])
+
+    def test_deleted_token_rejected(self):
+        """Test a revoked token stops working immediately."""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a deactivated user is rejected despite a cached token."""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_visible(self):
+        """Test an update of the user is seen by the next request."""
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'name': 'Updated name'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Updated name')
@@ -0,0 +1,111 @@
+"""
+Tests for password hashing and its admission control.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    check_password,
+    identify_hasher,
+    make_password,
+)
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import Throttled
+from rest_framework.test import APIClient
+
+from user import hashers
+
+
+TOKEN_URL = reverse('user:token')
+CREATE_USER_URL = reverse('user:create')
+
+SCRYPT = 'user.hashers.ScryptPasswordHasher'
+
+
+class ScryptPasswordHasherTests(SimpleTestCase):
+
+    def test_roundtrip(self):
+        """Test scrypt hashes verify and use Django 4.0's format."""
+        encoded = make_password('secret', 'seasalt', hasher='scrypt')
+
+        self.assertRegex(encoded, r'^scrypt\$16384\$seasalt\$8\$1\$')
+        self.assertTrue(check_password('secret', encoded))
+        self.assertFalse(check_password('wrong', encoded))
+
+    def test_must_update_on_new_parameters(self):
+        """Test hashes with an older work factor are upgraded."""
+        hasher = hashers.ScryptPasswordHasher()
+        encoded = hasher.encode('secret', 'seasalt', n=2 ** 10)
+
+        self.assertTrue(check_password('secret', encoded))
+        self.assertTrue(hasher.must_update(encoded))
+        self.assertFalse(hasher.must_update(
+            make_password('secret', hasher='scrypt'),
+        ))
+
+
+class PasswordHashingApiTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.payload = {
+            'email': 'test@example.com',
+            'password': 'testpass123',
+            'name': 'Test Name',
+        }
+
+    def test_new_passwords_use_argon2(self):
+        """Test new users get the preferred hasher."""
+        res = self.client.post(CREATE_USER_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        user = get_user_model().objects.get(email=self.payload['email'])
+        self.assertEqual(identify_hasher(user.password).algorithm, 'argon2')
+
+    def test_login_rehashes_password(self):
+        """Test a login upgrades a PBKDF2 hash to the preferred hasher."""
+        user = get_user_model().objects.create_user(**self.payload)
+        user.password = make_password(
+            self.payload['password'],
+            hasher='pbkdf2_sha256',
+        )
+        user.save()
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertEqual(identify_hasher(user.password).algorithm, 'argon2')
+        self.assertTrue(user.check_password(self.payload['password']))
+
+    @override_settings(PASSWORD_HASHING={'MAX_CONCURRENT': 1, 'TIMEOUT': 0})
+    def test_login_rejected_without_free_slot(self):
+        """Test logins are turned away while every slot is busy."""
+        get_user_model().objects.create_user(**self.payload)
+
+        with hashers.hashing_slot():
+            res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+        res = self.client.post(TOKEN_URL, self.payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class HashingSlotTests(SimpleTestCase):
+
+    @override_settings(PASSWORD_HASHING={'MAX_CONCURRENT': 2, 'TIMEOUT': 0})
+    def test_concurrency_capped(self):
+        """Test only MAX_CONCURRENT slots are handed out."""
+        before = hashers.stats()
+
+        with hashers.hashing_slot(), hashers.hashing_slot():
+            with self.assertRaises(Throttled):
+                with hashers.hashing_slot():
+                    pass
+        with hashers.hashing_slot():
+            pass
+
+        after = hashers.stats()
+        self.assertEqual(after['admitted'] - before['admitted'], 3)
+        self.assertEqual(after['rejected'] - before['rejected'], 1)
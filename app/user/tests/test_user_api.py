@@ -5,9 +5,12 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from user.authentication import clear_token_cache
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
@@ -155,3 +158,24 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_ignores_cached_user(self):
+        """Test a write on a cached user keeps changes made since."""
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.addCleanup(clear_token_cache)
+        client.get(ME_URL)
+        # As if changed through another worker, whose invalidation does
+        # not reach this process's cache.
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            name='Changed name',
+        )
+
+        res = client.patch(ME_URL, {'password': 'newpassword123'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['name'], 'Changed name')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Changed name')
+        self.assertTrue(self.user.check_password('newpassword123'))